@@ -1,9 +1,14 @@
 from .objects.breakout_player import BreakoutPlayer
 from .objects.breakout_ball import BreakoutBall
+from .objects.ball_store import BallStore
+from .objects.entity_list import EntityList
 from .objects.breakout_block import BreakoutBlock
 from .objects.breakout_rectangle import BreakoutRectangle
 from .objects.collision import CollisionManager
-from .breakout import BreakoutGame
+from .objects.static_level import StaticLevel
+from .objects.broadphase import BROADPHASES
+from .breakout import BreakoutGame, GameState, StepResults
+from .level_generator import Level, LevelGenerator
 
 from .constants import SCREEN_WIDTH, SCREEN_HEIGHT
 from .breakout import main
\ No newline at end of file
@@ -1,26 +1,134 @@
-import pygame
+import numpy as np
 import math
+import struct
 from .objects.breakout_block import BreakoutBlock
 from .objects.breakout_player import BreakoutPlayer
 from .objects.breakout_ball import BreakoutBall
+from .objects.ball_store import BallStore
 from .objects.collision import CollisionManager
 from .constants import SCREEN_WIDTH, SCREEN_HEIGHT
 
+class StepResults:
+    __slots__ = ("block_counts", "paddle_hits", "steps", "terminated_step")
+
+    def __init__(self, capacity: int):
+        """Per step outputs of BreakoutGame.run_steps, preallocated so the same
+        object can be reused for every batch
+
+        Arguments:
+            capacity {int} -- Maximum number of steps per batch
+        """
+        # Blocks left after each step
+        self.block_counts = np.zeros(capacity, dtype=np.int32)
+        # Times the ball hit the paddle during each step
+        self.paddle_hits = np.zeros(capacity, dtype=np.int32)
+        # Number of steps that were run
+        self.steps = 0
+        # Index of the step the game ended on, -1 if it didn't end
+        self.terminated_step = -1
+
+class GameState:
+    # Magic, version, number of blocks, number of balls, whether there are
+    # ball alive flags, game step, game over, game win, last steps block count
+    _HEADER = struct.Struct("<4sHII?q??q")
+    _MAGIC = b"BKGS"
+    _VERSION = 1
+
+    __slots__ = ("block_alive", "balls", "ball_alive", "player", "game_step",
+                 "game_over", "game_win", "last_steps_block_count")
+
+    def __init__(self, block_alive: np.ndarray, balls: np.ndarray, ball_alive: np.ndarray,
+                 player: np.ndarray, game_step: int, game_over: bool, game_win: bool,
+                 last_steps_block_count: int):
+        """Everything about a BreakoutGame that changes while it runs. The
+        layout itself, the blocks, paddle size and broadphase, is left out, so
+        a state can only be put back into a game with the same layout
+
+        Arguments:
+            block_alive {np.ndarray} -- Alive flag of every block, by block id
+            balls {np.ndarray} -- One row of attributes per ball, see
+            BallStore.get_state
+            ball_alive {np.ndarray} -- Alive flag of every ball by ball id for
+            a list of balls, None for a BallStore
+            player {np.ndarray} -- Left, top, collisions, last step
+            collisions, last left collision and last top collision of the player
+            game_step {int} -- Number of steps run
+            game_over {bool} -- Whether the game was lost
+            game_win {bool} -- Whether the game was won
+            last_steps_block_count {int} -- Blocks left before the last step
+        """
+        self.block_alive = block_alive
+        self.balls = balls
+        self.ball_alive = ball_alive
+        self.player = player
+        self.game_step = game_step
+        self.game_over = game_over
+        self.game_win = game_win
+        self.last_steps_block_count = last_steps_block_count
+
+    def to_bytes(self) -> bytes:
+        """Serializes the state into a compact little endian byte string
+
+        Returns:
+            bytes -- Header followed by the block flags, ball rows, ball flags
+            and player values
+        """
+        has_ball_alive = self.ball_alive is not None
+        header = self._HEADER.pack(self._MAGIC, self._VERSION, len(self.block_alive), len(self.balls),
+                                   has_ball_alive, self.game_step, self.game_over, self.game_win,
+                                   self.last_steps_block_count)
+        parts = [header, self.block_alive.astype(np.uint8).tobytes(),
+                 self.balls.astype("<f8").tobytes()]
+        if has_ball_alive:
+            parts.append(self.ball_alive.astype(np.uint8).tobytes())
+        parts.append(self.player.astype("<f8").tobytes())
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "GameState":
+        """Reads a state written by to_bytes
+
+        Arguments:
+            data {bytes} -- Serialized state
+
+        Returns:
+            GameState -- State
+        """
+        (magic, version, num_blocks, num_balls, has_ball_alive, game_step,
+         game_over, game_win, last_steps_block_count) = cls._HEADER.unpack_from(data)
+        if magic != cls._MAGIC or version != cls._VERSION:
+            raise Exception("Not a serialized game state or an unsupported version")
+        offset = cls._HEADER.size
+        block_alive = np.frombuffer(data, np.uint8, num_blocks, offset).astype(bool)
+        offset += num_blocks
+        balls = np.frombuffer(data, "<f8", num_balls * 10, offset).astype(float).reshape(num_balls, 10)
+        offset += num_balls * 80
+        ball_alive = None
+        if has_ball_alive:
+            ball_alive = np.frombuffer(data, np.uint8, num_balls, offset).astype(bool)
+            offset += num_balls
+        player = np.frombuffer(data, "<f8", 6, offset).astype(float)
+        return cls(block_alive, balls, ball_alive, player, game_step, game_over, game_win,
+                   last_steps_block_count)
+
 class BreakoutGame:
     def __init__(self,
                  display_graphics: bool,
                  blocks: list[BreakoutBlock],
-                 balls: list[BreakoutBall],
+                 balls: list[BreakoutBall] | BallStore,
                  player: BreakoutPlayer,
                  collision_manager: CollisionManager,
                  max_dt: float = None,
                  set_dt: float = None,
                  fps_limit: int = None,
-                 print_fps: bool = False
+                 print_fps: bool = False,
+                 broadphase: str = None
                  ):
         self._display_graphics = display_graphics
-        self.blocks = blocks
-        self.balls = balls
+        # The game shares the collision manager's live block and ball
+        # containers, which are what blocks and balls get removed from
+        self.blocks = collision_manager.blocks
+        self.balls = collision_manager.balls
         self.player = player
         self.collision_manager = collision_manager
         self.max_dt = max_dt
@@ -31,19 +139,32 @@ class BreakoutGame:
         self.game_over = False
         self.game_win = False
         self.last_steps_block_count = len(blocks)
+        # Lets each game pick the broadphase backend that suits its level
+        if broadphase is not None:
+            collision_manager.set_broadphase(broadphase)
 
-        pygame.init()
+        # pygame is only imported, through the rendering module, by games that
+        # draw or limit their frame rate
+        self._uses_pygame = False
         if self._fps_limit is not None:
-            self.clock = pygame.time.Clock()
+            self.fps_limit = self._fps_limit
 
-        if display_graphics:
-            self.run_step: function = self.run_step_with_graphics
-            # pygame setup
-            self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        self.display_graphics = display_graphics
+
+        # A BallStore is updated with vectorized array operations instead of
+        # looping over individual ball objects
+        if isinstance(balls, BallStore):
+            self._update_balls: function = self._update_ball_store
+            self._enforce_min_velocity: function = balls.enforce_min_velocity
+            self._remove_dead_balls: function = balls.remove_dead
         else:
-            self.run_step: function = self.run_step_no_graphics
+            self._update_balls: function = self._update_ball_list
+            self._enforce_min_velocity: function = self._enforce_min_velocity_list
+            self._remove_dead_balls: function = self._remove_dead_ball_list
 
         self.running = True
+        # What reset puts the game back to
+        self._start_state = self.snapshot()
 
     @property
     def display_graphics(self) -> bool:
@@ -52,8 +173,11 @@ class BreakoutGame:
     @display_graphics.setter
     def display_graphics(self, value: bool):
         if value:
+            from .rendering import init_display, read_keyboard_action
             self.run_step: function = self.run_step_with_graphics
-            self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+            self.screen = init_display()
+            self.player.input_source = read_keyboard_action
+            self._uses_pygame = True
         else:
             self.run_step: function = self.run_step_no_graphics
         self._display_graphics = value
@@ -65,29 +189,28 @@ class BreakoutGame:
     @fps_limit.setter
     def fps_limit(self, value: int):
         if value is not None:
-            self.clock = pygame.time.Clock()
+            from .rendering import make_clock
+            self.clock = make_clock()
+            self._uses_pygame = True
         self._fps_limit = value
 
-    def draw_objects(self):
-        # fill the screen with a color to wipe away anything from last frame
-        self.screen.fill("white")
-
-        for block in self.blocks:
-            block.draw(self.screen)
-
-        self.player.draw(self.screen)
+    def get_broadphase_stats(self) -> dict:
+        """Gets the build and query costs of the collision broadphase
 
-        for ball in self.balls:
-            ball.draw(self.screen)
+        Returns:
+            dict -- See Broadphase.get_stats
+        """
+        return self.collision_manager.broadphase.get_stats()
 
-        # flip() the display to put your work on screen
-        pygame.display.flip()
+    def draw_objects(self):
+        from .rendering import draw_game
+        draw_game(self.screen, self)
 
     def handle_quit(self):
-        # poll for events
-        # pygame.QUIT event means the user clicked X to close your window
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
+        # poll for events, only a window can be closed by the user
+        if self._display_graphics:
+            from .rendering import quit_requested
+            if quit_requested():
                 self.running = False
 
         if self.game_over:
@@ -102,7 +225,7 @@ class BreakoutGame:
         if self._fps_limit is not None:
             dt = self.clock.tick(self._fps_limit) / 1000
         if self.set_dt is not None:
-            dt = 0.008
+            dt = self.set_dt
         if self.print_fps:
             if self.game_step % 10 == 0:
                 print(f"FPS: {dt**-1}", end="\r")
@@ -112,9 +235,92 @@ class BreakoutGame:
 
         return dt
 
-    def run_updates(self, dt: float, override_player_action: int = None):
-        self.player.update(dt, override_player_action)
-        ball_deletion_list = []
+    def snapshot(self) -> GameState:
+        """Copies out the parts of the game that change while it runs, enough
+        to continue the game bit for bit from this point after a restore.
+        Planners can branch a game by restoring snapshots instead of copying it
+
+        Returns:
+            GameState -- Current state
+        """
+        player = self.player
+        player_state = np.array([player.left, player.top, player.collisions, player.last_step_collisions,
+                                 player.last_left_collision, player.last_top_collision], dtype=float)
+        balls = self.balls
+        if isinstance(balls, BallStore):
+            ball_state = balls.get_state()
+            ball_alive = None
+        else:
+            # Removed balls are kept too, so they can come back under their ids
+            ball_state = np.array([[ball.x, ball.y, ball.x0, ball.y0, ball.dx, ball.dy, ball.radius, ball.dead,
+                                    ball.last_collision_point[0], ball.last_collision_point[1]]
+                                   for ball in balls.entities], dtype=float).reshape(-1, 10)
+            ball_alive = balls.alive[:len(balls.entities)].copy()
+        return GameState(self.blocks.alive[:len(self.blocks.entities)].copy(), ball_state, ball_alive,
+                         player_state, self.game_step, self.game_over, self.game_win,
+                         self.last_steps_block_count)
+
+    def restore(self, state: GameState):
+        """Puts the game back into a snapshot in place. Blocks and balls are
+        restored by flipping their alive flags and copying attributes, so
+        nothing gets rebuilt. The state is only read, so it can be restored
+        any number of times
+
+        Arguments:
+            state {GameState} -- Snapshot of this game, or of a game with the
+            same layout
+        """
+        self.collision_manager.set_blocks_alive(state.block_alive)
+
+        balls = self.balls
+        if isinstance(balls, BallStore):
+            balls.set_state(state.balls)
+        else:
+            for ball_id in range(len(balls.entities)):
+                ball = balls.entities[ball_id]
+                if ball_id >= len(state.ball_alive):
+                    # Added after the snapshot was taken
+                    if balls.get(ball_id) is not None:
+                        balls.remove(ball)
+                    continue
+                # Removed balls get their attributes back too, so that the
+                # game snapshots the same again
+                x, y, x0, y0, dx, dy, radius, dead, last_x, last_y = state.balls[ball_id].tolist()
+                ball.x = x
+                ball.y = y
+                ball.x0 = x0
+                ball.y0 = y0
+                ball.dx = dx
+                ball.dy = dy
+                ball.radius = radius
+                ball.dead = bool(dead)
+                ball.last_collision_point = [last_x, last_y]
+                if state.ball_alive[ball_id]:
+                    balls.restore(ball_id)
+                elif balls.get(ball_id) is not None:
+                    balls.remove(ball)
+
+        # The collision manager notices the paddle moved on its next update
+        player = self.player
+        left, top, collisions, last_step_collisions, last_left, last_top = state.player.tolist()
+        player.left = left
+        player.top = top
+        player.collisions = int(collisions)
+        player.last_step_collisions = int(last_step_collisions)
+        player.last_left_collision = last_left
+        player.last_top_collision = last_top
+
+        self.game_step = state.game_step
+        self.game_over = state.game_over
+        self.game_win = state.game_win
+        self.last_steps_block_count = state.last_steps_block_count
+        self.running = True
+
+    def reset(self):
+        """Puts the game back to how it was when it was created, in place"""
+        self.restore(self._start_state)
+
+    def _enforce_min_velocity_list(self):
         for ball in self.balls:
             # The ball can't move only up/down or left/right
             if math.isclose(ball.dx, 0, abs_tol=1):
@@ -127,11 +333,31 @@ class BreakoutGame:
                     ball.dy = 2
                 else:
                     ball.dy = -2
-            if ball.update(dt):
-                ball_deletion_list.append(ball)
 
-        for ball in ball_deletion_list:
-            self.balls.remove(ball)
+    def _remove_dead_ball_list(self):
+        balls = self.balls
+        for ball in balls:
+            if ball.dead:
+                balls.remove(ball)
+
+    def _update_ball_list(self, dt: float):
+        self._enforce_min_velocity_list()
+        for ball in self.balls:
+            ball.update(dt)
+        self._remove_dead_ball_list()
+
+    def _update_ball_store(self, dt: float):
+        self.balls.enforce_min_velocity()
+        self.balls.update(dt)
+        self.balls.remove_dead()
+
+    def run_updates(self, dt: float, override_player_action: int = None):
+        self.player.update(dt, override_player_action)
+        if self.collision_manager.continuous:
+            self._run_continuous_updates(dt)
+            return
+
+        self._update_balls(dt)
 
         if len(self.balls) == 0:
             self.game_over = True
@@ -144,6 +370,113 @@ class BreakoutGame:
         # Checks for collisions between objects
         self.collision_manager.update(dt)
 
+    def _run_continuous_updates(self, dt: float):
+        # The collision manager moves the balls itself, stepping each one from
+        # impact to impact, so nothing tunnels through at a large dt
+        self.last_steps_block_count = len(self.blocks)
+        self.player.last_step_collisions = self.player.collisions
+        self._enforce_min_velocity()
+        self.collision_manager.update(dt)
+        self._remove_dead_balls()
+
+        if len(self.balls) == 0:
+            self.game_over = True
+
+        if len(self.blocks) == 0:
+            self.game_win = True
+
+    def time_until_band(self, band_top: float) -> float:
+        """Gets a lower bound on the time until any ball reaches the band
+        between band_top and the bottom of the screen. A ball that is moving
+        down gets there at an exact time unless it hits something on the way,
+        any other ball can't get there faster than travelling straight down at
+        its full speed
+
+        Arguments:
+            band_top {float} -- Top of the band
+
+        Returns:
+            float -- Time until a ball could be in the band, 0 if one already
+            is and inf if there are no balls
+        """
+        balls = self.balls
+        if isinstance(balls, BallStore):
+            n = len(balls)
+            y = balls.y[:n]
+            dx = balls.dx[:n]
+            dy = balls.dy[:n]
+            radius = balls.radius[:n]
+        else:
+            y = np.array([ball.y for ball in balls], dtype=float)
+            dx = np.array([ball.dx for ball in balls], dtype=float)
+            dy = np.array([ball.dy for ball in balls], dtype=float)
+            radius = np.array([ball.radius for ball in balls], dtype=float)
+        if y.size == 0:
+            return math.inf
+        distance = band_top - (y + radius)
+        if (distance <= 0).any():
+            return 0.0
+        speed = np.where(dy > 0, dy, np.hypot(dx, dy))
+        with np.errstate(divide="ignore"):
+            return float(np.min(distance / speed))
+
+    def fast_forward(self, max_steps: int, decision_height: float, chunk_steps: int = 64) -> int:
+        """Skips ahead, with the player standing still, until the player's
+        input can matter again. That is when a ball is within decision_height
+        of the top of the player, or the game ends. Between decisions the ball
+        paths are piecewise linear, so rather than running every step the game
+        jumps straight to the steps where something can happen, using the
+        continuous collision manager to resolve every bounce on the way exactly
+
+        The number of skipped steps is always a whole number and the last one
+        is run on its own, so the game ends up as it would running one step
+        at a time without any player input: the same blocks are broken, and
+        the positions, velocities and the positions the balls started the
+        last step from agree up to rounding
+
+        Arguments:
+            max_steps {int} -- Maximum number of steps to skip
+            decision_height {float} -- Height of the band above the player in
+            which balls need the player's attention
+
+        Keyword Arguments:
+            chunk_steps {int} -- Maximum number of steps advanced at once, which
+            bounds the number of bounces each collision update has to resolve
+            (default: {64})
+
+        Returns:
+            int -- Number of steps skipped
+        """
+        if not self.collision_manager.continuous:
+            raise Exception("Fast forwarding needs a continuous collision manager")
+        if self.set_dt is None:
+            raise Exception("Fast forwarding needs a static change in time (dt)")
+        dt = self.set_dt
+        block_count = len(self.blocks)
+        collisions = self.player.collisions
+        band_top = self.player.top - decision_height
+        steps = 0
+        while steps < max_steps and not (self.game_over or self.game_win):
+            t = self.time_until_band(band_top)
+            if t <= 0:
+                break
+            n = min(math.ceil(t / dt), chunk_steps, max_steps - steps)
+            if n > 1 and (n * dt >= t or n == max_steps - steps):
+                # Likely the last chunk, its last step is run on its own so
+                # that the balls' previous positions are one step back
+                self.run_updates((n - 1) * dt, 0)
+                self.run_updates(dt, 0)
+            else:
+                self.run_updates(n * dt, 0)
+            steps += n
+
+        self.game_step += steps
+        # The skipped steps count as a single step for anything that looks at
+        # what changed during the last one
+        self.last_steps_block_count = block_count
+        self.player.last_step_collisions = collisions
+        return steps
+
     def run_step_with_graphics(self, override_player_action: int = None):
         self.handle_quit()
         self.draw_objects()
@@ -158,13 +491,75 @@ class BreakoutGame:
         self.game_step += 1
 
 
+    def run_steps(self, n: int, actions=None, out: StepResults = None,
+                  poll_interval: int = 10) -> StepResults:
+        """Runs up to n steps in a tight loop, stopping early if the game
+        ends. The change in time is only looked up once when it is static.
+        Without a window there are no events to poll, so polling is skipped
+        entirely, otherwise it only happens every poll_interval steps
+
+        Arguments:
+            n {int} -- Number of steps to run
+
+        Keyword Arguments:
+            actions {int or array-like} -- Player action for every step, a
+            single action for all of them, or None to use the player's input
+            source (default: {None})
+            out {StepResults} -- Results to reuse, it needs room for n steps
+            (default: {None})
+            poll_interval {int} -- Steps between window event polls when
+            displaying graphics (default: {10})
+
+        Returns:
+            StepResults -- Outputs of every step that was run
+        """
+        if out is None:
+            out = StepResults(n)
+        out.steps = 0
+        out.terminated_step = -1
+        if actions is None or np.ndim(actions) == 0:
+            actions = [actions] * n
+        elif isinstance(actions, np.ndarray):
+            actions = actions.tolist()
+        block_counts = out.block_counts
+        paddle_hits = out.paddle_hits
+        player = self.player
+        blocks = self.blocks
+        graphics = self._display_graphics
+        static_dt = self._fps_limit is None
+        if static_dt:
+            dt = self.get_dt()
+
+        for i in range(n):
+            if graphics:
+                if i % poll_interval == 0:
+                    self.handle_quit()
+                    if not self.running:
+                        break
+                self.draw_objects()
+            if not static_dt:
+                dt = self.get_dt()
+            collisions = player.collisions
+            self.run_updates(dt, actions[i])
+            self.game_step += 1
+            block_counts[i] = len(blocks)
+            paddle_hits[i] = player.collisions - collisions
+            out.steps = i + 1
+            if self.game_over or self.game_win:
+                out.terminated_step = i
+                self.running = False
+                break
+        return out
+
     def run_till_close(self):
         while self.running:
             self.run_step()
         self.close()
 
     def close(self):
-        pygame.quit()
+        if self._uses_pygame:
+            from .rendering import close
+            close()
 
 
 def main():
@@ -200,7 +595,8 @@ def main():
     ball_dx = 0
     ball_dy = 100
     num_balls = 10000
-    balls = [BreakoutBall(ball_x, ball_y, ball_dx + 0.1 * i, ball_dy, ball_radius) for i in range(-num_balls // 2, num_balls // 2, 1)]
+    balls = BallStore.from_arrays(ball_x, ball_y, [ball_dx + 0.1 * i for i in range(-num_balls // 2, num_balls // 2, 1)], ball_dy, ball_radius)
+    # balls = [BreakoutBall(ball_x, ball_y, ball_dx + 0.1 * i, ball_dy, ball_radius) for i in range(-num_balls // 2, num_balls // 2, 1)]
     # balls = [BreakoutBall(550, 500, 50, 50, ball_radius)]
     # ball = BreakoutBall()
 
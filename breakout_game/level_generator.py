@@ -0,0 +1,167 @@
+import math
+import queue
+import threading
+import numpy as np
+from .breakout import BreakoutGame, GameState
+
+class Level:
+    __slots__ = ("index", "block_alive", "ball_speed", "ball_angle", "state")
+
+    def __init__(self, index: int, block_alive: np.ndarray, ball_speed: float, ball_angle: float,
+                 state: GameState):
+        """A generated level, ready to be put into the game it was generated
+        for with BreakoutGame.restore(level.state)
+
+        Arguments:
+            index {int} -- Position of the level in its seed's sequence
+            block_alive {np.ndarray} -- Which of the game's blocks are in the level
+            ball_speed {float} -- Starting speed of the balls
+            ball_angle {float} -- Starting angle of the balls away from
+            straight down, in radians
+            state {GameState} -- Starting state of the level
+        """
+        self.index = index
+        self.block_alive = block_alive
+        self.ball_speed = ball_speed
+        self.ball_angle = ball_angle
+        self.state = state
+
+class LevelGenerator:
+    def __init__(self, game: BreakoutGame, seed: int = None, prefetch: int = 8,
+                 fill_range: tuple[float, float] = (0.3, 1.0),
+                 speed_range: tuple[float, float] = (150, 300),
+                 max_angle: float = math.pi / 4):
+        """Generates random levels for a game from a seed. A level keeps a
+        random subset of the game's blocks and serves the balls at a random
+        speed and angle, so every level fits the game's existing broadphase
+        and is put in place by flipping alive flags, the broadphase is never
+        rebuilt. A background thread keeps up to prefetch levels ready, so
+        getting a level costs no more than resetting the game.
+
+        The n-th level after seeding only depends on the seed and n, so runs
+        are reproducible however far ahead the thread got
+
+        Arguments:
+            game {BreakoutGame} -- Game to generate levels for, its blocks are
+            the slots levels pick from and its current state is the template
+
+        Keyword Arguments:
+            seed {int} -- Seed of the level sequence, None for a random one
+            (default: {None})
+            prefetch {int} -- Number of levels kept ready (default: {8})
+            fill_range {tuple[float, float]} -- Range of the fraction of blocks
+            kept (default: {(0.3, 1.0)})
+            speed_range {tuple[float, float]} -- Range of the starting ball
+            speed (default: {(150, 300)})
+            max_angle {float} -- Largest starting angle of the balls away from
+            straight down, in radians (default: {math.pi / 4})
+        """
+        self.fill_range = fill_range
+        self.speed_range = speed_range
+        self.max_angle = max_angle
+        self._template = game.snapshot()
+        self._queue = queue.Queue(prefetch)
+        self._lock = threading.Lock()
+        self._epoch = 0
+        self._closed = False
+        self.seed(seed)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def seed(self, seed: int = None):
+        """Restarts the level sequence from a seed, dropping prefetched levels
+
+        Keyword Arguments:
+            seed {int} -- Seed of the level sequence, None for a random one
+            (default: {None})
+        """
+        if seed is None:
+            seed = np.random.SeedSequence().entropy
+        with self._lock:
+            # Levels of an old epoch still in the queue are skipped by get
+            self._epoch += 1
+            self._seed = seed
+            self._next_index = 0
+        try:
+            while True:
+                self._queue.get_nowait()
+        except queue.Empty:
+            pass
+
+    def generate(self, seed: int, index: int) -> Level:
+        """Generates the index-th level of a seed's sequence
+
+        Arguments:
+            seed {int} -- Seed of the level sequence
+            index {int} -- Position in the sequence
+
+        Returns:
+            Level -- Level
+        """
+        return self._generate(self._level_rng(seed, index), index)
+
+    def _level_rng(self, seed: int, index: int) -> np.random.Generator:
+        # Every level takes the same number of draws from its seed's stream,
+        # so the stream can jump straight to any level, and the thread keeps
+        # drawing from one stream instead of seeding a generator per level
+        bit_generator = np.random.PCG64(seed)
+        bit_generator.advance(index * (len(self._template.block_alive) + 4))
+        return np.random.Generator(bit_generator)
+
+    def _generate(self, rng: np.random.Generator, index: int) -> Level:
+        template = self._template
+        num_blocks = len(template.block_alive)
+        fill = rng.uniform(*self.fill_range)
+        block_alive = rng.random(num_blocks) < fill
+        # Drawn even when unused, to keep the number of draws fixed
+        fallback = min(int(rng.random() * num_blocks), num_blocks - 1)
+        if not block_alive.any():
+            block_alive[fallback] = True
+        speed = rng.uniform(*self.speed_range)
+        angle = rng.uniform(-self.max_angle, self.max_angle)
+
+        balls = template.balls.copy()
+        # Served downwards, at the angle away from straight down
+        balls[:, 4] = speed * math.sin(angle)
+        balls[:, 5] = speed * math.cos(angle)
+        state = GameState(block_alive, balls, template.ball_alive, template.player,
+                          template.game_step, template.game_over, template.game_win,
+                          int(np.count_nonzero(block_alive)))
+        return Level(index, block_alive, speed, angle, state)
+
+    def get(self) -> Level:
+        """Gets the next level of the sequence, waiting for the thread if none
+        is ready
+
+        Returns:
+            Level -- Level
+        """
+        while True:
+            epoch, level = self._queue.get()
+            if epoch == self._epoch:
+                return level
+
+    def _run(self):
+        rng_epoch = None
+        while not self._closed:
+            with self._lock:
+                epoch = self._epoch
+                seed = self._seed
+                index = self._next_index
+                self._next_index += 1
+            # Levels of an epoch are made in order, so its stream only needs
+            # to be set up once
+            if epoch != rng_epoch:
+                rng = self._level_rng(seed, index)
+                rng_epoch = epoch
+            level = self._generate(rng, index)
+            while not self._closed and epoch == self._epoch:
+                try:
+                    self._queue.put((epoch, level), timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+
+    def close(self):
+        self._closed = True
+        self._thread.join()
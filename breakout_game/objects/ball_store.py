@@ -0,0 +1,374 @@
+import numpy as np
+import math
+from typing import TYPE_CHECKING
+from ..constants import SCREEN_WIDTH, SCREEN_HEIGHT
+
+if TYPE_CHECKING:
+    import pygame
+
+class BallStore:
+    def __init__(self, capacity: int = 16):
+        """Structure-of-arrays container for many balls. Each ball attribute is
+        kept in its own contiguous numpy array so that whole-population updates
+        can be done in a handful of vectorized operations instead of a python
+        loop over BreakoutBall objects. Only the first len(store) entries of
+        every array are live
+
+        Keyword Arguments:
+            capacity {int} -- Number of balls to preallocate room for (default: {16})
+        """
+        capacity = max(capacity, 1)
+        self.count = 0
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.x0 = np.zeros(capacity)
+        self.y0 = np.zeros(capacity)
+        self.dx = np.zeros(capacity)
+        self.dy = np.zeros(capacity)
+        self.radius = np.zeros(capacity)
+        self.dead = np.zeros(capacity, dtype=bool)
+        # Last corner each ball collided with, (-1, -1) when there is none
+        self.last_collision_x = np.full(capacity, -1.0)
+        self.last_collision_y = np.full(capacity, -1.0)
+
+    @classmethod
+    def from_arrays(cls, x, y, dx, dy, radius=7) -> "BallStore":
+        """Builds a store from array-likes of ball attributes
+
+        Arguments:
+            x {array-like} -- X positions
+            y {array-like} -- Y positions
+            dx {array-like} -- Velocities in x direction
+            dy {array-like} -- Velocities in y direction
+
+        Keyword Arguments:
+            radius {float or array-like} -- Ball radii (default: {7})
+
+        Returns:
+            BallStore -- Store holding the given balls
+        """
+        x, y, dx, dy, radius = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (x, y, dx, dy, radius)))
+        store = cls(x.size)
+        store.add_many(x, y, dx, dy, radius)
+        return store
+
+    @classmethod
+    def from_balls(cls, balls: list) -> "BallStore":
+        """Builds a store from a list of BreakoutBall objects
+
+        Arguments:
+            balls {list[BreakoutBall]} -- Balls to copy into the store
+
+        Returns:
+            BallStore -- Store holding the given balls
+        """
+        return cls.from_arrays([b.x for b in balls], [b.y for b in balls],
+                               [b.dx for b in balls], [b.dy for b in balls],
+                               [b.radius for b in balls])
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: int) -> "BallView":
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("ball index out of range")
+        return BallView(self, index)
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield BallView(self, i)
+
+    def _arrays(self) -> tuple:
+        return (self.x, self.y, self.x0, self.y0, self.dx, self.dy,
+                self.radius, self.dead, self.last_collision_x, self.last_collision_y)
+
+    def _reserve(self, capacity: int):
+        """Grows every array so that it can hold at least the given number of balls
+
+        Arguments:
+            capacity {int} -- Required capacity
+        """
+        if capacity <= self.x.size:
+            return
+        new_capacity = max(capacity, self.x.size * 2)
+        for name in ("x", "y", "x0", "y0", "dx", "dy", "radius", "dead",
+                     "last_collision_x", "last_collision_y"):
+            old = getattr(self, name)
+            fill = -1.0 if name.startswith("last_collision") else 0
+            new = np.full(new_capacity, fill, dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def add(self, x: float, y: float, dx: float, dy: float, radius: float = 7) -> int:
+        """Adds a single ball to the store
+
+        Arguments:
+            x {float} -- X pos
+            y {float} -- Y pos
+            dx {float} -- Velocity in x direction
+            dy {float} -- Velocity in y direction
+
+        Keyword Arguments:
+            radius {float} -- Radius of the ball (default: {7})
+
+        Returns:
+            int -- Index of the new ball
+        """
+        return self.add_many([x], [y], [dx], [dy], [radius])
+
+    def add_many(self, x, y, dx, dy, radius) -> int:
+        """Adds several balls to the store at once
+
+        Arguments:
+            x {array-like} -- X positions
+            y {array-like} -- Y positions
+            dx {array-like} -- Velocities in x direction
+            dy {array-like} -- Velocities in y direction
+            radius {array-like} -- Ball radii
+
+        Returns:
+            int -- Index of the first added ball
+        """
+        n = len(x)
+        start = self.count
+        self._reserve(start + n)
+        end = start + n
+        self.x[start:end] = x
+        self.y[start:end] = y
+        self.x0[start:end] = x
+        self.y0[start:end] = y
+        self.dx[start:end] = dx
+        self.dy[start:end] = dy
+        self.radius[start:end] = radius
+        self.dead[start:end] = False
+        self.last_collision_x[start:end] = -1
+        self.last_collision_y[start:end] = -1
+        self.count = end
+        return start
+
+    def enforce_min_velocity(self):
+        """Vectorized version of the rule that a ball can't move only up/down
+        or left/right. Any velocity component within 1 of zero is pushed out to
+        +/-2, keeping its sign
+        """
+        n = self.count
+        for v in (self.dx[:n], self.dy[:n]):
+            small = np.abs(v) <= 1
+            v[small] = np.where(v[small] >= 0, 2.0, -2.0)
+
+    def update(self, dt: float):
+        """Vectorized BreakoutBall.update over every live ball. Moves the balls,
+        bounces them off the side and top walls and flags any that fall out the
+        bottom as dead
+
+        Arguments:
+            dt {float} -- Change in time
+        """
+        n = self.count
+        self._update_slice(slice(0, n), dt)
+
+    def _update_slice(self, idx, dt):
+        """Integrates and handles the screen bounds for the balls selected by
+        idx, which can be a slice, index array or boolean mask
+
+        Arguments:
+            idx {slice or np.ndarray} -- Balls to update
+            dt {float or np.ndarray} -- Change in time, per ball if an array
+        """
+        # For slices these are views and the updates below happen in place,
+        # for index arrays they are copies that get written back at the end
+        x = self.x[idx]
+        y = self.y[idx]
+        dx = self.dx[idx]
+        dy = self.dy[idx]
+        r = self.radius[idx]
+        self.x0[idx] = x
+        self.y0[idx] = y
+        x += dx * dt
+        y += dy * dt
+
+        # Wall hits are rare, so only the offending balls are touched
+        left = np.flatnonzero(x - r < 0)
+        x[left] = r[left]
+        dx[left] = np.abs(dx[left])
+        right = np.flatnonzero(x + r > SCREEN_WIDTH)
+        x[right] = SCREEN_WIDTH - r[right]
+        dx[right] = -np.abs(dx[right])
+
+        top = np.flatnonzero(y - r < 0)
+        y[top] = r[top]
+        dy[top] = np.abs(dy[top])
+
+        self.x[idx] = x
+        self.y[idx] = y
+        self.dx[idx] = dx
+        self.dy[idx] = dy
+        self.dead[idx] |= y + r > SCREEN_HEIGHT
+
+    def remove_dead(self) -> int:
+        """Compacts the store so that only balls that are not dead remain
+
+        Returns:
+            int -- Number of balls removed
+        """
+        n = self.count
+        alive = ~self.dead[:n]
+        kept = int(np.count_nonzero(alive))
+        if kept == n:
+            return 0
+        for arr in self._arrays():
+            arr[:kept] = arr[:n][alive]
+        self.dead[:kept] = False
+        self.count = kept
+        return n - kept
+
+    def get_state(self) -> np.ndarray:
+        """Copies the live balls out of the store
+
+        Returns:
+            np.ndarray -- One row per ball, holding x, y, x0, y0, dx, dy,
+            radius, dead, last_collision_x and last_collision_y
+        """
+        n = self.count
+        return np.stack([arr[:n] for arr in self._arrays()], axis=1).astype(float)
+
+    def set_state(self, state: np.ndarray):
+        """Replaces the balls in the store with ones copied out by get_state
+
+        Arguments:
+            state {np.ndarray} -- Rows of ball attributes, see get_state
+        """
+        n = len(state)
+        self._reserve(n)
+        for arr, column in zip(self._arrays(), state.T):
+            arr[:n] = column
+        self.count = n
+
+    def draw(self, surface: "pygame.Surface"):
+        """Draws every ball to the pygame surface
+
+        Arguments:
+            surface {pygame.Surface} -- Surface to draw to
+        """
+        from ..rendering import draw_ball
+        for x, y, r in zip(self.x[:self.count].tolist(), self.y[:self.count].tolist(),
+                           self.radius[:self.count].tolist()):
+            draw_ball(surface, x, y, r)
+
+class BallView:
+    __slots__ = ("_store", "_index")
+
+    def __init__(self, store: BallStore, index: int):
+        """Lightweight handle that exposes a single ball in a BallStore through
+        the same interface as BreakoutBall, so scalar code such as the
+        collision manager can work on stored balls unchanged
+
+        Arguments:
+            store {BallStore} -- Store that holds the ball
+            index {int} -- Index of the ball in the store
+        """
+        self._store = store
+        self._index = index
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, BallView) and other._store is self._store and other._index == self._index
+
+    def __hash__(self) -> int:
+        return hash((id(self._store), self._index))
+
+    @property
+    def x(self):
+        return float(self._store.x[self._index])
+    @x.setter
+    def x(self, value: float):
+        self._store.x[self._index] = value
+
+    @property
+    def y(self):
+        return float(self._store.y[self._index])
+    @y.setter
+    def y(self, value: float):
+        self._store.y[self._index] = value
+
+    @property
+    def x0(self):
+        return float(self._store.x0[self._index])
+    @x0.setter
+    def x0(self, value: float):
+        self._store.x0[self._index] = value
+
+    @property
+    def y0(self):
+        return float(self._store.y0[self._index])
+    @y0.setter
+    def y0(self, value: float):
+        self._store.y0[self._index] = value
+
+    @property
+    def dx(self):
+        return float(self._store.dx[self._index])
+    @dx.setter
+    def dx(self, value: float):
+        self._store.dx[self._index] = value
+
+    @property
+    def dy(self):
+        return float(self._store.dy[self._index])
+    @dy.setter
+    def dy(self, value: float):
+        self._store.dy[self._index] = value
+
+    @property
+    def radius(self):
+        return float(self._store.radius[self._index])
+    @radius.setter
+    def radius(self, value: float):
+        self._store.radius[self._index] = value
+
+    @property
+    def dead(self):
+        return bool(self._store.dead[self._index])
+    @dead.setter
+    def dead(self, value: bool):
+        self._store.dead[self._index] = value
+
+    @property
+    def last_collision_point(self):
+        return [float(self._store.last_collision_x[self._index]),
+                float(self._store.last_collision_y[self._index])]
+    @last_collision_point.setter
+    def last_collision_point(self, value: list[float]):
+        self._store.last_collision_x[self._index] = value[0]
+        self._store.last_collision_y[self._index] = value[1]
+
+    def draw(self, surface: "pygame.Surface"):
+        """Draws the ball to the pygame surface
+
+        Arguments:
+            surface {pygame.Surface} -- Surface to draw to
+        """
+        from ..rendering import draw_ball
+        draw_ball(surface, self.x, self.y, self.radius)
+
+    def update(self, dt: float) -> bool:
+        """Updates the balls position and handles collision outside of bounds
+
+        Arguments:
+            dt {float} -- Change in time
+
+        Returns:
+            bool -- Whether the ball is dead
+        """
+        i = self._index
+        self._store._update_slice(slice(i, i + 1), dt)
+        return self.dead
+
+    def get_speed(self) -> float:
+        """Gets the speed of the ball
+
+        Returns:
+            float -- Speed of the ball
+        """
+        return math.hypot(self.dx, self.dy)
@@ -1,8 +1,14 @@
-import pygame
 from ..constants import SCREEN_WIDTH, SCREEN_HEIGHT
+from typing import TYPE_CHECKING
 import math
 
+if TYPE_CHECKING:
+    import pygame
+
 class BreakoutBall:
+    __slots__ = ("radius", "x", "y", "x0", "y0", "dx", "init_dx", "dy",
+                 "last_collision_point", "dead")
+
     def __init__(self, x: float, y: float, dx: float, dy: float, radius: float = 7):
         """Initializes a breakout ball
 
@@ -26,13 +32,14 @@ class BreakoutBall:
         self.last_collision_point = [-1, -1]
         self.dead = False
 
-    def draw(self, surface: pygame.Surface):
+    def draw(self, surface: "pygame.Surface"):
         """Draws the ball to the pygame surface
 
         Arguments:
             surface {pygame.Surface} -- Surface to draw to
         """
-        pygame.draw.circle(surface, pygame.Color(0, 255, 0), (self.x, self.y), self.radius)
+        from ..rendering import draw_ball
+        draw_ball(surface, self.x, self.y, self.radius)
 
     def update(self, dt: float):
         """Updates the balls position and handles collision outside of bounds
@@ -67,4 +74,4 @@ class BreakoutBall:
         Returns:
             float -- Speed of the ball
         """
-        return math.dist((self.dx, self.dy), (0, 0))
\ No newline at end of file
+        return math.hypot(self.dx, self.dy)
\ No newline at end of file
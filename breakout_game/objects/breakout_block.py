@@ -1,4 +1,4 @@
 from .breakout_rectangle import BreakoutRectangle
 
 class BreakoutBlock(BreakoutRectangle):
-    pass
\ No newline at end of file
+    __slots__ = ()
\ No newline at end of file
@@ -1,8 +1,14 @@
-import pygame
 from ..constants import SCREEN_WIDTH
 from .breakout_rectangle import BreakoutRectangle
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pygame
 
 class BreakoutPlayer(BreakoutRectangle):
+    __slots__ = ("speed", "last_step_collisions", "collisions",
+                 "last_left_collision", "last_top_collision", "input_source")
+
     def __init__(self, top: float, left: float, width: int = 100, height: int = 5, speed: float = 500):
         """Constructs a player object
 
@@ -15,23 +21,25 @@ class BreakoutPlayer(BreakoutRectangle):
             height {int} -- Height of player (default: {5})
             speed {float} -- Horizontal speed of player (default: {500})
         """
+        super().__init__(top, left, width, height)
         self.speed = speed
 
-        self._top = top
-        self._left = left
-        self._rect = pygame.Rect(left, top, width, height)
         self.last_step_collisions = 0
         self.collisions = 0
-        self.last_left_collision = self._left
-        self.last_top_collision = self._top
+        self.last_left_collision = self.left
+        self.last_top_collision = self.top
+        # Called for an action when update isn't given one, such as
+        # rendering.read_keyboard_action. Without it the player stays put
+        self.input_source = None
 
-    def draw(self, surface: pygame.Surface):
+    def draw(self, surface: "pygame.Surface"):
         """Draws the player to the surface
 
         Arguments:
             surface {pygame.Surface} -- Surface to draw to
         """
-        pygame.draw.rect(surface, pygame.Color(0, 0, 255), self._rect)
+        from ..rendering import draw_rectangle, PLAYER_COLOR
+        draw_rectangle(surface, self.left, self.top, self.width, self.height, PLAYER_COLOR)
 
     def update(self, dt: float, override_player_action: int = None):
         """Updates the player position
@@ -39,18 +47,13 @@ class BreakoutPlayer(BreakoutRectangle):
         Arguments:
             dt {float} -- Change in time
         """
+        if override_player_action is None and self.input_source is not None:
+            override_player_action = self.input_source()
         direction = None
-        if override_player_action is not None:
-            if override_player_action == 1:
-                direction = -1
-            elif override_player_action == 2:
-                direction = 1
-        else:
-            keys = pygame.key.get_pressed()
-            if keys[pygame.K_a] or keys[pygame.K_LEFT]:
-                direction = -1
-            elif keys[pygame.K_d] or keys[pygame.K_RIGHT]:
-                direction = 1
+        if override_player_action == 1:
+            direction = -1
+        elif override_player_action == 2:
+            direction = 1
 
         if direction is not None:
             self.left += self.speed * direction * dt
@@ -58,33 +61,3 @@ class BreakoutPlayer(BreakoutRectangle):
                 self.left = 0
             elif self.left >= SCREEN_WIDTH - self.width:
                 self.left = SCREEN_WIDTH - self.width
-
-    @property
-    def top(self):
-        return self._top
-    @top.setter
-    def top(self, value: float):
-        self._top = value
-        self._rect.top = self._top
-
-    @property
-    def left(self):
-        return self._left
-    @left.setter
-    def left(self, value: float):
-        self._left = value
-        self._rect.left = self._left
-
-    @property
-    def width(self):
-        return self._rect.width
-    @width.setter
-    def width(self, value: int):
-        self._rect.width = value
-
-    @property
-    def height(self):
-        return self._rect.height
-    @height.setter
-    def height(self, value: int):
-        self._rect.height = value
\ No newline at end of file
@@ -0,0 +1,992 @@
+from .breakout_ball import BreakoutBall
+from .breakout_rectangle import BreakoutRectangle
+import numpy as np
+import bisect
+import copy
+import math
+import time
+
+class Broadphase:
+    # Name used to select the backend, see make_broadphase
+    name = None
+
+    def __init__(self):
+        """Base class for broadphase backends. A broadphase finds the
+        rectangles a ball could be colliding with so that the narrowphase only
+        has to check those.
+
+        Every object added gets a stable integer id, its index in objects.
+        Static objects are expected to never move, dynamic objects have to be
+        marked dirty after they move. Removing an object only clears its alive
+        flag. Backends implement _build, _query_box and _query_boxes
+        """
+        self.objects = []
+        self.obj_ids = {}
+        self.is_static = np.zeros(0, dtype=bool)
+        self.alive = np.zeros(0, dtype=bool)
+        # Static objects that were alive the last time the static layer was
+        # built, the only ones it knows about
+        self.in_build = np.zeros(0, dtype=bool)
+        # Left, top, right and bottom of every object
+        self.aabbs = np.zeros((0, 4))
+        # List copy of aabbs for scalar code
+        self._aabb_list = []
+        self.dynamic_ids = []
+        self.dirty = set()
+        self._needs_build = False
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Clears the build and query cost counters"""
+        self.build_count = 0
+        self.build_time = 0.0
+        self.query_count = 0
+        self.query_time = 0.0
+        self.pair_count = 0
+
+    def get_stats(self) -> dict:
+        """Gets the build and query costs collected since the last reset
+
+        Returns:
+            dict -- Backend name, number of builds, total build time, number of
+            queries, total query time, mean query time and candidate pairs found
+        """
+        return {
+            "backend": self.name,
+            "builds": self.build_count,
+            "build_time": self.build_time,
+            "queries": self.query_count,
+            "query_time": self.query_time,
+            "mean_query_time": self.query_time / self.query_count if self.query_count else 0.0,
+            "pairs": self.pair_count,
+        }
+
+    def _get_aabb(self, rectangle: BreakoutRectangle) -> tuple[float, float, float, float]:
+        return (rectangle.left, rectangle.top,
+                rectangle.left + rectangle.width, rectangle.top + rectangle.height)
+
+    def _add(self, rectangle: BreakoutRectangle, is_static: bool) -> int:
+        obj_id = len(self.objects)
+        self.objects.append(rectangle)
+        self.obj_ids[rectangle] = obj_id
+        self.is_static = np.append(self.is_static, is_static)
+        self.alive = np.append(self.alive, True)
+        self.in_build = np.append(self.in_build, False)
+        aabb = self._get_aabb(rectangle)
+        self.aabbs = np.vstack((self.aabbs, aabb))
+        self._aabb_list.append(list(aabb))
+        return obj_id
+
+    def add_static(self, rectangle: BreakoutRectangle) -> int:
+        """Adds a rectangle that never moves to the static layer. It stays
+        there until it is removed
+
+        Arguments:
+            rectangle {BreakoutRectangle} -- Rectangle to add
+
+        Returns:
+            int -- Id of the rectangle
+        """
+        obj_id = self._add(rectangle, True)
+        self._needs_build = True
+        return obj_id
+
+    def add_dynamic(self, rectangle: BreakoutRectangle) -> int:
+        """Adds a rectangle that moves to the dynamic layer. Call mark_dirty
+        whenever it moves so its bounds get recomputed by update_dynamic
+
+        Arguments:
+            rectangle {BreakoutRectangle} -- Rectangle to add
+
+        Returns:
+            int -- Id of the rectangle
+        """
+        obj_id = self._add(rectangle, False)
+        self.dynamic_ids.append(obj_id)
+        return obj_id
+
+    def remove(self, rectangle: BreakoutRectangle):
+        """Removes a given rectangle from the broadphase
+
+        Arguments:
+            rectangle {BreakoutRectangle} -- Rectangle to remove
+        """
+        obj_id = self.obj_ids.get(rectangle)
+        if obj_id is None or not self.alive[obj_id]:
+            return
+        self.alive[obj_id] = False
+        if not self.is_static[obj_id]:
+            self.dynamic_ids.remove(obj_id)
+            self.dirty.discard(rectangle)
+
+    def restore(self, rectangle: BreakoutRectangle):
+        """Adds a removed rectangle back under its old id, to the layer it was
+        in before. A static rectangle only makes the static layer rebuild if
+        it was already removed the last time it was built
+
+        Arguments:
+            rectangle {BreakoutRectangle} -- Rectangle to restore
+        """
+        obj_id = self.obj_ids.get(rectangle)
+        if obj_id is None or self.alive[obj_id]:
+            return
+        self.alive[obj_id] = True
+        if self.is_static[obj_id]:
+            if not self.in_build[obj_id]:
+                self._needs_build = True
+        else:
+            self.dynamic_ids.append(obj_id)
+            self.mark_dirty(rectangle)
+
+    def set_static_alive(self, alive: np.ndarray):
+        """Removes and restores static objects in bulk so that exactly the ones
+        flagged in alive are live. Dynamic objects are left alone
+
+        Arguments:
+            alive {np.ndarray} -- Alive flag of every object, by id
+        """
+        changed = np.flatnonzero(self.is_static & (self.alive != alive))
+        self.switch_static(changed, alive[changed])
+
+    def switch_static(self, ids: np.ndarray, alive: np.ndarray):
+        """Sets the alive flags of the given static objects in bulk, for
+        callers that already know which ones change
+
+        Arguments:
+            ids {np.ndarray} -- Ids of static objects
+            alive {np.ndarray} -- Alive flag of each of them
+        """
+        if (alive & ~self.in_build[ids]).any():
+            self._needs_build = True
+        self.alive[ids] = alive
+
+    def share_static(self) -> "Broadphase":
+        """Creates a broadphase of the same backend on top of this one's static
+        layer. The static objects, their bound arrays and the built index are
+        shared read only instead of copied. The new broadphase gets its own
+        alive flags, an empty dynamic layer and shallow copies of the lists
+        and maps that adding objects appends to, so any number of games
+        playing the same level cost little more than one. Removing or
+        restoring objects in either one doesn't affect the other, and a
+        rebuild replaces the shared index with a private one
+
+        Returns:
+            Broadphase -- Broadphase sharing the static layer
+        """
+        if not self.is_static.all():
+            raise Exception("Only a broadphase without dynamic objects can be shared")
+        if self._needs_build:
+            self.build()
+        shared = copy.copy(self)
+        shared._own_state()
+        return shared
+
+    def _own_state(self):
+        # Everything that gets changed in place. The bound arrays are only
+        # written in place for dynamic objects, which are added by replacing
+        # the arrays, so those stay shared along with the static objects
+        self.objects = list(self.objects)
+        self.obj_ids = dict(self.obj_ids)
+        self.alive = self.alive.copy()
+        self._aabb_list = list(self._aabb_list)
+        self.dynamic_ids = []
+        self.dirty = set()
+        self.reset_stats()
+
+    def mark_dirty(self, rectangle: BreakoutRectangle):
+        """Flags a dynamic rectangle as moved
+
+        Arguments:
+            rectangle {BreakoutRectangle} -- Rectangle that moved
+        """
+        self.dirty.add(rectangle)
+
+    def update_dynamic(self):
+        """Recomputes the bounds of every dynamic rectangle that was marked
+        dirty since the last call
+        """
+        for rectangle in self.dirty:
+            self._moved(self.obj_ids[rectangle], rectangle)
+        self.dirty.clear()
+
+    def _moved(self, obj_id: int, rectangle: BreakoutRectangle):
+        aabb = self._get_aabb(rectangle)
+        self.aabbs[obj_id] = aabb
+        self._aabb_list[obj_id][:] = aabb
+
+    def build(self):
+        """(Re)builds the static layer. This happens automatically on the first
+        query after static objects were added
+        """
+        start = time.perf_counter()
+        self.in_build = self.is_static & self.alive
+        self._build(np.flatnonzero(self.in_build))
+        self.build_time += time.perf_counter() - start
+        self.build_count += 1
+        self._needs_build = False
+
+    def get_possible_collisions(self, ball: BreakoutBall, manhat_dist: int = 1, out: list = None) -> list:
+        """Gets the objects that the given ball could collide with
+
+        Arguments:
+            ball {BreakoutBall} -- Object to check for
+
+        Keyword Arguments:
+            manhat_dist {int} -- Grid cells to search around the ball, only
+            used by the grid backend (default: {1})
+            out {list} -- List to reuse for the result, it gets cleared first
+            (default: {None})
+
+        Returns:
+            list -- Possible collision objects
+        """
+        start = time.perf_counter()
+        if self._needs_build:
+            self.build()
+        if out is None:
+            out = []
+        else:
+            out.clear()
+        self._query_ball(ball, manhat_dist, out)
+        self.query_time += time.perf_counter() - start
+        self.query_count += 1
+        self.pair_count += len(out)
+        return out
+
+    def get_candidate_pairs(self, x: np.ndarray, y: np.ndarray, radius: np.ndarray,
+                            manhat_dist: int = 1) -> tuple[np.ndarray, np.ndarray]:
+        """Batched version of get_possible_collisions
+
+        Arguments:
+            x {np.ndarray} -- X positions of the balls
+            y {np.ndarray} -- Y positions of the balls
+            radius {np.ndarray} -- Radii of the balls
+
+        Keyword Arguments:
+            manhat_dist {int} -- Grid cells to search around the ball, only
+            used by the grid backend (default: {1})
+
+        Returns:
+            tuple[np.ndarray, np.ndarray] -- Ball index and object id of every
+            candidate pair
+        """
+        start = time.perf_counter()
+        if self._needs_build:
+            self.build()
+        ball_idx, obj_idx = self._query_pairs(x, y, radius, manhat_dist)
+        self.query_time += time.perf_counter() - start
+        self.query_count += 1
+        self.pair_count += ball_idx.size
+        return ball_idx, obj_idx
+
+    def get_swept_collisions(self, ball: BreakoutBall, t: float, out: list = None) -> list:
+        """Gets the objects that the given ball could collide with while moving
+        for the given time, by searching the whole box its path sweeps through
+        instead of just the area around its position
+
+        Arguments:
+            ball {BreakoutBall} -- Object to check for
+            t {float} -- Time the ball moves for
+
+        Keyword Arguments:
+            out {list} -- List to reuse for the result, it gets cleared first
+            (default: {None})
+
+        Returns:
+            list -- Possible collision objects
+        """
+        start = time.perf_counter()
+        x = ball.x
+        y = ball.y
+        x1 = x + ball.dx * t
+        y1 = y + ball.dy * t
+        radius = ball.radius
+        left = min(x, x1) - radius
+        top = min(y, y1) - radius
+        right = max(x, x1) + radius
+        bottom = max(y, y1) + radius
+        out = self.query_box(left, top, right, bottom, out)
+        objects = self.objects
+        for i, obj_id in enumerate(out):
+            out[i] = objects[obj_id]
+        if self.dynamic_ids:
+            self.get_dynamic_in_box(left, top, right, bottom, out)
+        self.query_time += time.perf_counter() - start
+        self.query_count += 1
+        self.pair_count += len(out)
+        return out
+
+    def get_swept_pairs(self, x: np.ndarray, y: np.ndarray, dx: np.ndarray, dy: np.ndarray,
+                        radius: np.ndarray, t: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Batched version of get_swept_collisions
+
+        Arguments:
+            x {np.ndarray} -- X positions of the balls
+            y {np.ndarray} -- Y positions of the balls
+            dx {np.ndarray} -- X velocities of the balls
+            dy {np.ndarray} -- Y velocities of the balls
+            radius {np.ndarray} -- Radii of the balls
+            t {np.ndarray} -- Time every ball moves for
+
+        Returns:
+            tuple[np.ndarray, np.ndarray] -- Ball index and object id of every
+            candidate pair
+        """
+        start = time.perf_counter()
+        x1 = x + dx * t
+        y1 = y + dy * t
+        left = np.minimum(x, x1) - radius
+        top = np.minimum(y, y1) - radius
+        right = np.maximum(x, x1) + radius
+        bottom = np.maximum(y, y1) + radius
+        ball_idx, obj_idx = self.query_boxes(left, top, right, bottom)
+        keep = self.alive[obj_idx]
+        ball_idx, obj_idx = self._add_dynamic_pairs(ball_idx[keep], obj_idx[keep], left, top, right, bottom)
+        self.query_time += time.perf_counter() - start
+        self.query_count += 1
+        self.pair_count += ball_idx.size
+        return ball_idx, obj_idx
+
+    def _query_ball(self, ball: BreakoutBall, manhat_dist: int, out: list):
+        radius = ball.radius
+        self._query_box(ball.x - radius, ball.y - radius, ball.x + radius, ball.y + radius, out)
+        objects = self.objects
+        for i, obj_id in enumerate(out):
+            out[i] = objects[obj_id]
+        if self.dynamic_ids:
+            self.get_dynamic_in_box(ball.x - radius, ball.y - radius, ball.x + radius, ball.y + radius, out)
+
+    def _query_pairs(self, x: np.ndarray, y: np.ndarray, radius: np.ndarray,
+                     manhat_dist: int) -> tuple[np.ndarray, np.ndarray]:
+        left = x - radius
+        top = y - radius
+        right = x + radius
+        bottom = y + radius
+        ball_idx, obj_idx = self._query_boxes(left, top, right, bottom)
+        keep = self.alive[obj_idx]
+        ball_idx = ball_idx[keep]
+        obj_idx = obj_idx[keep]
+        return self._add_dynamic_pairs(ball_idx, obj_idx, left, top, right, bottom)
+
+    def get_dynamic_in_box(self, left: float, top: float, right: float, bottom: float,
+                           out: list = None) -> list:
+        """Gets the dynamic objects that overlap a box
+
+        Arguments:
+            left {float} -- Left
+            top {float} -- Top
+            right {float} -- Right
+            bottom {float} -- Bottom
+
+        Keyword Arguments:
+            out {list} -- List to append the objects to (default: {None})
+
+        Returns:
+            list -- Overlapping dynamic objects
+        """
+        if out is None:
+            out = []
+        aabb_list = self._aabb_list
+        for obj_id in self.dynamic_ids:
+            o_left, o_top, o_right, o_bottom = aabb_list[obj_id]
+            if o_left <= right and left <= o_right and o_top <= bottom and top <= o_bottom:
+                out.append(self.objects[obj_id])
+        return out
+
+    def _add_dynamic_pairs(self, ball_idx: np.ndarray, obj_idx: np.ndarray,
+                           left: np.ndarray, top: np.ndarray,
+                           right: np.ndarray, bottom: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        for obj_id in self.dynamic_ids:
+            o_left, o_top, o_right, o_bottom = self.aabbs[obj_id].tolist()
+            near = np.flatnonzero((top <= o_bottom) & (bottom >= o_top))
+            near = near[(left[near] <= o_right) & (right[near] >= o_left)]
+            if near.size:
+                ball_idx = np.concatenate((ball_idx, near))
+                obj_idx = np.concatenate((obj_idx, np.full(near.size, obj_id, dtype=np.intp)))
+        return ball_idx, obj_idx
+
+    def query_box(self, left: float, top: float, right: float, bottom: float, out: list = None) -> list:
+        """Gets the live static objects that could overlap a box
+
+        Arguments:
+            left {float} -- Left
+            top {float} -- Top
+            right {float} -- Right
+            bottom {float} -- Bottom
+
+        Keyword Arguments:
+            out {list} -- List to reuse for the result, it gets cleared first
+            (default: {None})
+
+        Returns:
+            list -- Ids of the objects
+        """
+        if self._needs_build:
+            self.build()
+        if out is None:
+            out = []
+        else:
+            out.clear()
+        return self._query_box(left, top, right, bottom, out)
+
+    def query_boxes(self, left: np.ndarray, top: np.ndarray,
+                    right: np.ndarray, bottom: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Batched version of query_box. Dead objects are not filtered out
+
+        Arguments:
+            left {np.ndarray} -- Left of every box
+            top {np.ndarray} -- Top of every box
+            right {np.ndarray} -- Right of every box
+            bottom {np.ndarray} -- Bottom of every box
+
+        Returns:
+            tuple[np.ndarray, np.ndarray] -- Box index and object id of every
+            candidate pair
+        """
+        if self._needs_build:
+            self.build()
+        return self._query_boxes(left, top, right, bottom)
+
+    def _build(self, static_ids: np.ndarray):
+        raise NotImplementedError
+
+    def _query_box(self, left: float, top: float, right: float, bottom: float, out: list) -> list:
+        raise NotImplementedError
+
+    def _query_boxes(self, left: np.ndarray, top: np.ndarray,
+                     right: np.ndarray, bottom: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        raise NotImplementedError
+
+class CollisionGrid(Broadphase):
+    name = "grid"
+
+    def __init__(self, collision_grid_shape: tuple[int], width: int, height: int):
+        """The collision grid is an optimization tool that removes the need to
+        check for collision between all objects. Instead, the object will look
+        to its nearest grid neighbors to check for collision.
+
+        Static objects are stored in flat CSR style arrays: the ids in cell c
+        are cell_items[cell_offsets[c]:cell_offsets[c + 1]], where cells are
+        numbered x * shape_y + y. A second set of arrays holds the ids within
+        one cell of every cell, so the default 3x3 lookup is a single slice
+
+        Arguments:
+            collision_grid_shape {tuple[int]} -- The shape of the grid (x, y)
+            width {int} -- Width of the screen
+            height {int} -- Height of the screen
+        """
+        super().__init__()
+        self.collision_grid_shape = collision_grid_shape
+        self.grid_dx = width / collision_grid_shape[0]
+        self.grid_dy = height / collision_grid_shape[1]
+        # Left, right, top, and bottom locations on the grid, all inclusive
+        self.bounds = np.zeros((0, 4), dtype=np.intp)
+        num_cells = collision_grid_shape[0] * collision_grid_shape[1]
+        self.cell_offsets = np.zeros(num_cells + 1, dtype=np.intp)
+        self.cell_items = np.zeros(0, dtype=np.intp)
+        self.neighbour_offsets = np.zeros(num_cells + 1, dtype=np.intp)
+        self.neighbour_items = np.zeros(0, dtype=np.intp)
+        # The same neighbourhoods as lists of live objects, plus a list copy of
+        # bounds, so that scalar queries don't have to allocate anything. A
+        # cell's list is only made the first time the cell is queried, so
+        # memory grows with the cells the balls actually visit
+        self._neighbour_cache = {}
+        self._bounds_list = []
+        # Reused by get_range_ids to skip ids that were already seen
+        self._query_stamp = 0
+        self._seen = np.zeros(0, dtype=np.int64)
+
+    def _add(self, rectangle: BreakoutRectangle, is_static: bool) -> int:
+        obj_id = super()._add(rectangle, is_static)
+        bounds = self.get_rect_bounds(rectangle)
+        self.bounds = np.vstack((self.bounds, bounds))
+        self._bounds_list.append(list(bounds))
+        self._seen = np.append(self._seen, 0)
+        return obj_id
+
+    def _moved(self, obj_id: int, rectangle: BreakoutRectangle):
+        super()._moved(obj_id, rectangle)
+        bounds = self.get_rect_bounds(rectangle)
+        self.bounds[obj_id] = bounds
+        self._bounds_list[obj_id][:] = bounds
+
+    def remove(self, rectangle: BreakoutRectangle):
+        obj_id = self.obj_ids.get(rectangle)
+        if obj_id is None or not self.alive[obj_id]:
+            return
+        super().remove(rectangle)
+        if self.is_static[obj_id] and not self._needs_build:
+            shape_x, shape_y = self.collision_grid_shape
+            left, right, top, bot = self._bounds_list[obj_id]
+            cache = self._neighbour_cache
+            for x in range(max(left - 1, 0), min(right + 1, shape_x - 1) + 1):
+                for y in range(max(top - 1, 0), min(bot + 1, shape_y - 1) + 1):
+                    cell_objects = cache.get(x * shape_y + y)
+                    if cell_objects is not None:
+                        cell_objects.remove(rectangle)
+
+    def restore(self, rectangle: BreakoutRectangle):
+        obj_id = self.obj_ids.get(rectangle)
+        if obj_id is None or self.alive[obj_id]:
+            return
+        super().restore(rectangle)
+        if self.is_static[obj_id] and not self._needs_build:
+            # Dropped neighbour lists get refilled from the CSR arrays, which
+            # still hold the id, so the objects keep the order they were built in
+            shape_x, shape_y = self.collision_grid_shape
+            left, right, top, bot = self._bounds_list[obj_id]
+            cache = self._neighbour_cache
+            for x in range(max(left - 1, 0), min(right + 1, shape_x - 1) + 1):
+                for y in range(max(top - 1, 0), min(bot + 1, shape_y - 1) + 1):
+                    cache.pop(x * shape_y + y, None)
+
+    def switch_static(self, ids: np.ndarray, alive: np.ndarray):
+        super().switch_static(ids, alive)
+        # Every neighbour list is remade from the alive flags the next time
+        # its cell is queried, so switching costs nothing up front
+        self._neighbour_cache.clear()
+
+    def _own_state(self):
+        super()._own_state()
+        self._bounds_list = list(self._bounds_list)
+        self._neighbour_cache = {}
+        self._query_stamp = 0
+        self._seen = np.zeros_like(self._seen)
+
+    def _fill_cell(self, cell: int) -> list:
+        offsets = self.neighbour_offsets
+        objects = self.objects
+        alive = self.alive
+        cell_objects = [objects[i] for i in self.neighbour_items[offsets[cell]:offsets[cell + 1]].tolist()
+                        if alive[i]]
+        self._neighbour_cache[cell] = cell_objects
+        return cell_objects
+
+    def _build_csr(self, ids: np.ndarray, expand: int) -> tuple[np.ndarray, np.ndarray]:
+        """Builds CSR cell arrays for the given ids, with each object's bounds
+        grown by expand cells
+
+        Returns:
+            tuple[np.ndarray, np.ndarray] -- Cell offsets, cell items
+        """
+        shape_x, shape_y = self.collision_grid_shape
+        cells = []
+        items = []
+        for obj_id in ids.tolist():
+            left, right, top, bot = self.bounds[obj_id].tolist()
+            xs = np.arange(max(left - expand, 0), min(right + expand, shape_x - 1) + 1)
+            ys = np.arange(max(top - expand, 0), min(bot + expand, shape_y - 1) + 1)
+            obj_cells = (xs[:, None] * shape_y + ys[None, :]).ravel()
+            cells.append(obj_cells)
+            items.append(np.full(obj_cells.size, obj_id, dtype=np.intp))
+        if not cells:
+            return np.zeros(shape_x * shape_y + 1, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        cells = np.concatenate(cells)
+        items = np.concatenate(items)
+        order = np.lexsort((items, cells))
+        offsets = np.zeros(shape_x * shape_y + 1, dtype=np.intp)
+        np.cumsum(np.bincount(cells, minlength=shape_x * shape_y), out=offsets[1:])
+        return offsets, items[order]
+
+    def _build(self, static_ids: np.ndarray):
+        self.cell_offsets, self.cell_items = self._build_csr(static_ids, 0)
+        self.neighbour_offsets, self.neighbour_items = self._build_csr(static_ids, 1)
+        self._neighbour_cache = {}
+
+    def _query_ball(self, ball: BreakoutBall, manhat_dist: int, out: list):
+        shape_x, shape_y = self.collision_grid_shape
+        ball_grid_x = min(max(int(ball.x // self.grid_dx), 0), shape_x - 1)
+        ball_grid_y = min(max(int(ball.y // self.grid_dy), 0), shape_y - 1)
+
+        objects = self.objects
+        if manhat_dist == 1:
+            # Precomputed neighbourhood of live objects, no duplicates to filter
+            cell = ball_grid_x * shape_y + ball_grid_y
+            cell_objects = self._neighbour_cache.get(cell)
+            if cell_objects is None:
+                cell_objects = self._fill_cell(cell)
+            out.extend(cell_objects)
+        else:
+            left = self.clamp_val(ball_grid_x - manhat_dist, True)
+            right = self.clamp_val(ball_grid_x + manhat_dist, True)
+            top = self.clamp_val(ball_grid_y - manhat_dist, False)
+            bot = self.clamp_val(ball_grid_y + manhat_dist, False)
+            self.get_range_ids(left, right, top, bot, out)
+            for i, obj_id in enumerate(out):
+                out[i] = objects[obj_id]
+        if self.dynamic_ids:
+            # Dynamic bounds are always inside the grid, so the unclamped range
+            # overlaps them exactly when the clamped one would
+            self.get_dynamic_in_range(ball_grid_x - manhat_dist, ball_grid_x + manhat_dist,
+                                      ball_grid_y - manhat_dist, ball_grid_y + manhat_dist, out)
+
+    def get_range_ids(self, left: int, right: int, top: int, bot: int, out: list) -> list:
+        """Appends the ids of the live static objects in a cell range (all
+        inclusive) to out, without duplicates
+
+        Arguments:
+            left {int} -- Left
+            right {int} -- Right
+            top {int} -- Top
+            bot {int} -- Bottom
+            out {list} -- List to append to
+
+        Returns:
+            list -- The out list
+        """
+        if self._needs_build:
+            self.build()
+        self._query_stamp += 1
+        stamp = self._query_stamp
+        seen = self._seen
+        alive = self.alive
+        offsets = self.cell_offsets
+        items = self.cell_items
+        shape_y = self.collision_grid_shape[1]
+        for x in range(left, right + 1):
+            row = x * shape_y
+            for obj_id in items[offsets[row + top]:offsets[row + bot + 1]].tolist():
+                if seen[obj_id] != stamp and alive[obj_id]:
+                    seen[obj_id] = stamp
+                    out.append(obj_id)
+        return out
+
+    def get_dynamic_in_range(self, left: int, right: int, top: int, bot: int, out: list = None) -> list:
+        """Gets the dynamic objects whose grid bounds overlap the given range
+        (all inclusive)
+
+        Arguments:
+            left {int} -- Left
+            right {int} -- Right
+            top {int} -- Top
+            bot {int} -- Bottom
+
+        Keyword Arguments:
+            out {list} -- List to append the objects to (default: {None})
+
+        Returns:
+            list -- Overlapping dynamic objects
+        """
+        if out is None:
+            out = []
+        bounds_list = self._bounds_list
+        for obj_id in self.dynamic_ids:
+            bounds = bounds_list[obj_id]
+            if bounds[0] <= right and left <= bounds[1] and bounds[2] <= bot and top <= bounds[3]:
+                out.append(self.objects[obj_id])
+        return out
+
+    def _query_pairs(self, x: np.ndarray, y: np.ndarray, radius: np.ndarray,
+                     manhat_dist: int) -> tuple[np.ndarray, np.ndarray]:
+        shape_x, shape_y = self.collision_grid_shape
+        # Multiplying and truncating is much cheaper than a float floor
+        # division, and both agree once negative values are clamped to 0
+        grid_x = np.clip((x * (1 / self.grid_dx)).astype(np.intp), 0, shape_x - 1)
+        grid_y = np.clip((y * (1 / self.grid_dy)).astype(np.intp), 0, shape_y - 1)
+
+        if manhat_dist == 1:
+            cell = grid_x * shape_y + grid_y
+            starts = self.neighbour_offsets[cell]
+            ends = self.neighbour_offsets[cell + 1]
+            # Most balls are in open space, so only the ones with anything
+            # nearby get expanded
+            near = np.flatnonzero(ends != starts)
+            ball_idx, obj_idx = _expand_ranges(starts[near], ends[near], near, self.neighbour_items)
+        else:
+            ball_idx, obj_idx = self.get_range_pairs(
+                np.maximum(grid_x - manhat_dist, 0), np.minimum(grid_x + manhat_dist, shape_x - 1),
+                np.maximum(grid_y - manhat_dist, 0), np.minimum(grid_y + manhat_dist, shape_y - 1))
+        keep = self.alive[obj_idx]
+        ball_idx = ball_idx[keep]
+        obj_idx = obj_idx[keep]
+
+        for obj_id in self.dynamic_ids:
+            left, right, top, bot = self.bounds[obj_id].tolist()
+            near = np.flatnonzero((grid_y >= top - manhat_dist) & (grid_y <= bot + manhat_dist))
+            near_x = grid_x[near]
+            near = near[(near_x >= left - manhat_dist) & (near_x <= right + manhat_dist)]
+            if near.size:
+                ball_idx = np.concatenate((ball_idx, near))
+                obj_idx = np.concatenate((obj_idx, np.full(near.size, obj_id, dtype=np.intp)))
+        return ball_idx, obj_idx
+
+    def get_range_pairs(self, left: np.ndarray, right: np.ndarray,
+                        top: np.ndarray, bot: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Gets the unique (ball, static object) pairs for a per-ball range of
+        cells (all inclusive). Dead objects are not filtered out
+
+        Arguments:
+            left {np.ndarray} -- Left cell of every ball
+            right {np.ndarray} -- Right cell of every ball
+            top {np.ndarray} -- Top cell of every ball
+            bot {np.ndarray} -- Bottom cell of every ball
+
+        Returns:
+            tuple[np.ndarray, np.ndarray] -- Ball index and object id of every
+            candidate pair
+        """
+        if self._needs_build:
+            self.build()
+        shape_y = self.collision_grid_shape[1]
+        # One entry per (ball, column), each covering the column's rows top..bot
+        widths = right - left + 1
+        col_ball = np.repeat(np.arange(left.size), widths)
+        col_x = np.arange(col_ball.size) - np.repeat(np.cumsum(widths) - widths, widths) + left[col_ball]
+        start = col_x * shape_y + top[col_ball]
+        end = col_x * shape_y + bot[col_ball] + 1
+        ball_idx, obj_idx = _expand_ranges(self.cell_offsets[start], self.cell_offsets[end],
+                                           col_ball, self.cell_items)
+        # Objects spanning several cells show up more than once
+        num_objects = max(len(self.objects), 1)
+        keys = np.unique(ball_idx * num_objects + obj_idx)
+        return keys // num_objects, keys % num_objects
+
+    def _query_box(self, left: float, top: float, right: float, bottom: float, out: list) -> list:
+        return self.get_range_ids(self.clamp_val(int(left // self.grid_dx), True),
+                                  self.clamp_val(int(right // self.grid_dx), True),
+                                  self.clamp_val(int(top // self.grid_dy), False),
+                                  self.clamp_val(int(bottom // self.grid_dy), False), out)
+
+    def _query_boxes(self, left: np.ndarray, top: np.ndarray,
+                     right: np.ndarray, bottom: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        shape_x, shape_y = self.collision_grid_shape
+        return self.get_range_pairs(np.clip((left // self.grid_dx).astype(np.intp), 0, shape_x - 1),
+                                    np.clip((right // self.grid_dx).astype(np.intp), 0, shape_x - 1),
+                                    np.clip((top // self.grid_dy).astype(np.intp), 0, shape_y - 1),
+                                    np.clip((bottom // self.grid_dy).astype(np.intp), 0, shape_y - 1))
+
+    def get_rect_bounds(self, rectangle: BreakoutRectangle) -> tuple[int, int, int, int]:
+        """Gets the clamped grid cells a rectangle covers (all inclusive)
+
+        Arguments:
+            rectangle {BreakoutRectangle} -- Rectangle to get the bounds of
+
+        Returns:
+            tuple[int, int, int, int] -- Left, right, top and bottom cells
+        """
+        left = self.clamp_val(int(rectangle.left // self.grid_dx), True)
+        right = self.clamp_val(math.ceil((rectangle.left + rectangle.width) / self.grid_dx), True)
+        top = self.clamp_val(int(rectangle.top // self.grid_dy), False)
+        bot = self.clamp_val(math.ceil((rectangle.top + rectangle.height) / self.grid_dy), False)
+        return left, right, top, bot
+
+    def clamp_val(self, val: int, is_x: bool) -> int:
+        """Clamps the value to be within the collision grid bounds
+
+        Arguments:
+            val {int} -- Value to clamp
+            is_x {bool} -- Whether or not it is an x coordinate
+
+        Returns:
+            int -- Clamped value
+        """
+        if is_x:
+            val = min(max(val, 0), self.collision_grid_shape[0] - 1)
+        else:
+            val = min(max(val, 0), self.collision_grid_shape[1] - 1)
+        return val
+
+class SweepAndPruneBroadphase(Broadphase):
+    name = "sweep"
+
+    def __init__(self):
+        """Sort-and-sweep on the x axis. Static objects are sorted by their left
+        edge, so a query only has to look at the objects whose left edge lies
+        between the query's left minus the widest object and the query's right.
+        Works well for sparse levels and doesn't depend on the ball size
+        """
+        super().__init__()
+        self.sorted_ids = np.zeros(0, dtype=np.intp)
+        self.sorted_left = np.zeros(0)
+        self.sorted_right = np.zeros(0)
+        self.sorted_top = np.zeros(0)
+        self.sorted_bottom = np.zeros(0)
+        self.max_width = 0.0
+        self._left_list = []
+        self._entries = []
+
+    def _build(self, static_ids: np.ndarray):
+        order = np.argsort(self.aabbs[static_ids, 0], kind="stable")
+        self.sorted_ids = static_ids[order]
+        boxes = self.aabbs[self.sorted_ids]
+        self.sorted_left = boxes[:, 0].copy()
+        self.sorted_top = boxes[:, 1].copy()
+        self.sorted_right = boxes[:, 2].copy()
+        self.sorted_bottom = boxes[:, 3].copy()
+        self.max_width = float((boxes[:, 2] - boxes[:, 0]).max()) if boxes.size else 0.0
+        # Plain python copies for the scalar query, indexing numpy arrays one
+        # element at a time is slow
+        self._left_list = self.sorted_left.tolist()
+        self._entries = list(zip(self.sorted_ids.tolist(), self.sorted_top.tolist(),
+                                 self.sorted_right.tolist(), self.sorted_bottom.tolist()))
+
+    def _query_box(self, left: float, top: float, right: float, bottom: float, out: list) -> list:
+        start = bisect.bisect_left(self._left_list, left - self.max_width)
+        end = bisect.bisect_right(self._left_list, right)
+        alive = self.alive
+        for obj_id, o_top, o_right, o_bottom in self._entries[start:end]:
+            if o_right >= left and o_top <= bottom and o_bottom >= top and alive[obj_id]:
+                out.append(obj_id)
+        return out
+
+    def _query_boxes(self, left: np.ndarray, top: np.ndarray,
+                     right: np.ndarray, bottom: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        starts = np.searchsorted(self.sorted_left, left - self.max_width, "left")
+        ends = np.searchsorted(self.sorted_left, right, "right")
+        near = np.flatnonzero(ends > starts)
+        box_idx, sorted_idx = _expand_ranges(starts[near], ends[near], near, np.arange(self.sorted_ids.size))
+        keep = ((self.sorted_right[sorted_idx] >= left[box_idx]) &
+                (self.sorted_top[sorted_idx] <= bottom[box_idx]) &
+                (self.sorted_bottom[sorted_idx] >= top[box_idx]))
+        return box_idx[keep], self.sorted_ids[sorted_idx[keep]]
+
+class AABBTreeBroadphase(Broadphase):
+    name = "bvh"
+
+    def __init__(self, leaf_size: int = 4):
+        """Static bounding volume hierarchy over the blocks. The tree is built
+        top down by splitting along the longer axis at the median, and queries
+        walk it breadth first. Query cost grows with the log of the number of
+        blocks, which suits dense levels
+
+        Keyword Arguments:
+            leaf_size {int} -- Maximum number of objects in a leaf (default: {4})
+        """
+        super().__init__()
+        self.leaf_size = leaf_size
+        self.node_boxes = np.zeros((0, 4))
+        # Children of internal nodes, -1 for leaves
+        self.node_children = np.zeros((0, 2), dtype=np.intp)
+        # Leaves own leaf_items[leaf_start:leaf_end]
+        self.node_start = np.zeros(0, dtype=np.intp)
+        self.node_end = np.zeros(0, dtype=np.intp)
+        self.leaf_items = np.zeros(0, dtype=np.intp)
+        self._nodes = []
+
+    def _build(self, static_ids: np.ndarray):
+        boxes = []
+        children = []
+        starts = []
+        ends = []
+        items = []
+
+        def build_node(ids: np.ndarray) -> int:
+            node = len(boxes)
+            node_aabbs = self.aabbs[ids]
+            boxes.append((node_aabbs[:, 0].min(), node_aabbs[:, 1].min(),
+                          node_aabbs[:, 2].max(), node_aabbs[:, 3].max()))
+            children.append([-1, -1])
+            starts.append(0)
+            ends.append(0)
+            if ids.size <= self.leaf_size:
+                starts[node] = len(items)
+                items.extend(ids.tolist())
+                ends[node] = len(items)
+                return node
+            centres = node_aabbs[:, :2] + node_aabbs[:, 2:]
+            axis = 0 if np.ptp(centres[:, 0]) >= np.ptp(centres[:, 1]) else 1
+            order = ids[np.argsort(centres[:, axis], kind="stable")]
+            half = order.size // 2
+            children[node][0] = build_node(order[:half])
+            children[node][1] = build_node(order[half:])
+            return node
+
+        if static_ids.size:
+            build_node(static_ids)
+        self.node_boxes = np.array(boxes, dtype=float).reshape(-1, 4)
+        self.node_children = np.array(children, dtype=np.intp).reshape(-1, 2)
+        self.node_start = np.array(starts, dtype=np.intp)
+        self.node_end = np.array(ends, dtype=np.intp)
+        self.leaf_items = np.array(items, dtype=np.intp)
+        # Plain python copy of the tree for the scalar query: the node box,
+        # the children and the leaf's objects with their boxes
+        self._nodes = [(tuple(box), tuple(child),
+                        [(obj_id, *self.aabbs[obj_id].tolist()) for obj_id in items[start:end]])
+                       for box, child, start, end in zip(boxes, children, starts, ends)]
+
+    def _query_box(self, left: float, top: float, right: float, bottom: float, out: list) -> list:
+        if not self._nodes:
+            return out
+        nodes = self._nodes
+        alive = self.alive
+        stack = [0]
+        while stack:
+            (n_left, n_top, n_right, n_bottom), (first, second), leaf = nodes[stack.pop()]
+            if n_left > right or n_right < left or n_top > bottom or n_bottom < top:
+                continue
+            if first >= 0:
+                stack.append(first)
+                stack.append(second)
+                continue
+            for obj_id, o_left, o_top, o_right, o_bottom in leaf:
+                if o_left <= right and o_right >= left and o_top <= bottom and o_bottom >= top and alive[obj_id]:
+                    out.append(obj_id)
+        return out
+
+    def _query_boxes(self, left: np.ndarray, top: np.ndarray,
+                     right: np.ndarray, bottom: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        empty = np.zeros(0, dtype=np.intp)
+        if not self.node_boxes.size:
+            return empty, empty
+        found_boxes = []
+        found_items = []
+        # Frontier of (query, node) pairs, all queries start at the root
+        box_idx = np.arange(left.size)
+        nodes = np.zeros(left.size, dtype=np.intp)
+        while box_idx.size:
+            n_boxes = self.node_boxes[nodes]
+            hit = ((n_boxes[:, 0] <= right[box_idx]) & (n_boxes[:, 2] >= left[box_idx]) &
+                   (n_boxes[:, 1] <= bottom[box_idx]) & (n_boxes[:, 3] >= top[box_idx]))
+            box_idx = box_idx[hit]
+            nodes = nodes[hit]
+            is_leaf = self.node_children[nodes, 0] < 0
+            leaf_boxes, leaf_items = _expand_ranges(self.node_start[nodes[is_leaf]], self.node_end[nodes[is_leaf]],
+                                                    box_idx[is_leaf], self.leaf_items)
+            found_boxes.append(leaf_boxes)
+            found_items.append(leaf_items)
+            inner = ~is_leaf
+            box_idx = np.repeat(box_idx[inner], 2)
+            nodes = self.node_children[nodes[inner]].ravel()
+        box_idx = np.concatenate(found_boxes)
+        obj_idx = np.concatenate(found_items)
+        o_boxes = self.aabbs[obj_idx]
+        keep = ((o_boxes[:, 0] <= right[box_idx]) & (o_boxes[:, 2] >= left[box_idx]) &
+                (o_boxes[:, 1] <= bottom[box_idx]) & (o_boxes[:, 3] >= top[box_idx]))
+        return box_idx[keep], obj_idx[keep]
+
+BROADPHASES = {
+    CollisionGrid.name: CollisionGrid,
+    SweepAndPruneBroadphase.name: SweepAndPruneBroadphase,
+    AABBTreeBroadphase.name: AABBTreeBroadphase,
+}
+
+def make_broadphase(name: str, collision_grid_shape: tuple[int], width: int, height: int) -> Broadphase:
+    """Creates a broadphase backend by name
+
+    Arguments:
+        name {str} -- One of the keys of BROADPHASES
+        collision_grid_shape {tuple[int]} -- Shape of the grid, used by the
+        grid backend
+        width {int} -- Width of the screen
+        height {int} -- Height of the screen
+
+    Returns:
+        Broadphase -- The backend
+    """
+    if name not in BROADPHASES:
+        raise ValueError(f"Unknown broadphase '{name}', expected one of {list(BROADPHASES)}")
+    if name == CollisionGrid.name:
+        return CollisionGrid(collision_grid_shape, width, height)
+    return BROADPHASES[name]()
+
+def _expand_ranges(starts: np.ndarray, ends: np.ndarray, owners: np.ndarray,
+                   items: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Expands a batch of [start, end) slices of items into flat arrays
+
+    Returns:
+        tuple[np.ndarray, np.ndarray] -- Owner of every element, the elements
+    """
+    lengths = ends - starts
+    owner_idx = np.repeat(owners, lengths)
+    within = np.arange(owner_idx.size) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return owner_idx, items[np.repeat(starts, lengths) + within]
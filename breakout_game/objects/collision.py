@@ -1,9 +1,17 @@
 from .breakout_ball import BreakoutBall
+from .ball_store import BallStore
+from .entity_list import EntityList
 from .breakout_block import BreakoutBlock
 from .breakout_player import BreakoutPlayer
 from .breakout_rectangle import BreakoutRectangle
 from ..constants import SCREEN_HEIGHT, SCREEN_WIDTH
+from .broadphase import Broadphase
+from .static_level import StaticLevel
+from .narrowphase import (BatchCollisionInfo, batch_rect_collisions, batch_swept_impacts, batch_wall_impacts,
+                          swept_impact, wall_impact, KIND_X, KIND_Y, KIND_CORNER,
+                          KIND_WALL_X, KIND_WALL_TOP, KIND_BOTTOM)
 from enum import Enum
+import numpy as np
 import math
 
 class CollisionType(Enum):
@@ -12,6 +20,8 @@ class CollisionType(Enum):
     CORNER = 2
 
 class CollisionInfo:
+    __slots__ = ("is_collision", "t_impact", "contact_point", "unit_vector", "collision_type")
+
     def __init__(self,
                  is_collision: bool = None,
                  t_impact: float = None,
@@ -24,204 +34,170 @@ class CollisionInfo:
         self.unit_vector = unit_vector
         self.collision_type = collision_type
 
-class CollisionGrid:
-    def __init__(self, collision_grid_shape: tuple[int], width: int, height: int):
-        """The collision grid is an optimization tool that removes the need to
-        check for collision between all objects. Instead, the object will look
-        to its nearest grid neighbors to check for collision
-
-        Arguments:
-            collision_grid_shape {tuple[int]} -- The shape of the grid (x, y)
-            width {int} -- Width of the screen
-            height {int} -- Height of the screen
-        """
-        self.collision_grid_shape = collision_grid_shape
-        self.collision_grid = [[set() for _ in range(collision_grid_shape[1])] for _ in range(collision_grid_shape[0])]
-        self.grid_dx = width / collision_grid_shape[0]
-        self.grid_dy = height / collision_grid_shape[1]
-        # Dictionary for holding object data of left, right, top, and bottom
-        # locations on the grid
-        self.obj_dict = {}
-
-    def is_obj_boundary_changed(self, rectangle: BreakoutRectangle,
-                                left: int, right: int,
-                                top: int, bot: int) -> bool:
-        """Checks whether the given object has a changed boundary in the collision
-        grid. Coordinates are all inclusive
-
-        Arguments:
-            rectangle {BreakoutRectangle} -- Rectangle object to check
-            left {int} -- left coordinate
-            right {int} -- right coordinate
-            top {int} -- top coordinate
-            bot {int} -- bottom coordinate
-
-        Returns:
-            bool -- Whether or not the boundary changed and needs to be updated
-        """
-        is_not_changed = \
-            self.obj_dict[rectangle][0] == left and \
-            self.obj_dict[rectangle][1] == right and \
-            self.obj_dict[rectangle][2] == top and \
-            self.obj_dict[rectangle][3] == bot
-        return not is_not_changed
-
-    def is_coord_in_range(self, coord: tuple[int],
-                                left: int, right: int,
-                                top: int, bot: int) -> bool:
-        """Checks if a coordinate is in a range (all inclusive)
-
-        Arguments:
-            coord {tuple[int]} -- Coordinate
-            left {int} -- Left
-            right {int} -- Right
-            top {int} -- Top
-            bot {int} -- Bottom
-
-        Returns:
-            bool -- In range or not
+    def reset(self):
+        """Clears the info so the object can be reused for another check. The
+        contact point and unit vector lists are kept and zeroed
         """
-        return left <= coord[0] <= right and top <= coord[1] <= bot
+        self.is_collision = None
+        self.t_impact = None
+        self.collision_type = None
+        self.contact_point[0] = 0
+        self.contact_point[1] = 0
+        self.unit_vector[0] = 0
+        self.unit_vector[1] = 0
 
-    def get_possible_collisions(self, ball: BreakoutBall, manhat_dist: int = 1) -> set:
-        """Gets a set of objects that the given ball could collide with
+class CollisionManager:
+    def __init__(self, player: BreakoutPlayer, balls: list[BreakoutBall] | BallStore,
+                 blocks: list[BreakoutBlock] | StaticLevel, collision_grid_shape: tuple[int],
+                 broadphase: str | Broadphase = "grid", continuous: bool = False):
+        """The collision manager is the main class for handling collision
 
         Arguments:
-            ball {BreakoutBall} -- Object to check for
+            player {BreakoutPlayer} -- Player
+            balls {list[BreakoutBall] | BallStore} -- List or store of balls
+            blocks {list[BreakoutBlock] | StaticLevel} -- List of blocks, or a
+            level shared with other collision managers, in which case only
+            which of its blocks are alive is kept here
+            collision_grid_shape {tuple[int]} -- Shape of the collision grid (x, y)
 
         Keyword Arguments:
-            manhat_dist {int} -- Distance around the grid to search (1 means it
-            searches in a 3x3 grid) (default: {1})
-
-        Returns:
-            set -- Set of possible collision objects
-        """
-        ball_grid_x = int(ball.x // self.grid_dx)
-        ball_grid_y = int(ball.y // self.grid_dy)
-        # Clamps them to the expected bounds
-        left = self.clamp_val(ball_grid_x - manhat_dist, True)
-        right = self.clamp_val(ball_grid_x + manhat_dist, True)
-        top = self.clamp_val(ball_grid_y - manhat_dist, False)
-        bot = self.clamp_val(ball_grid_y + manhat_dist, False)
-
-        possible_collisions = set()
-        for x in range(left, right + 1):
-            for y in range(top, bot + 1):
-                possible_collisions.update(self.collision_grid[x][y])
-
-        return possible_collisions
-
-    def remove(self, rectangle: BreakoutRectangle):
-        """Removes a given rectangle from the collision grid
-
-        Arguments:
-            rectangle {BreakoutRectangle} -- Rectangle to remove
+            broadphase {str | Broadphase} -- Broadphase backend or the name of
+            one, see broadphase.BROADPHASES (default: {"grid"})
+            continuous {bool} -- Whether the collision manager moves the balls
+            itself, from one time of impact to the next, instead of fixing up
+            collisions after the balls have moved. This stays exact however
+            large dt gets (default: {False})
         """
-        if rectangle in self.obj_dict:
-            for x in range(self.obj_dict[rectangle][0], self.obj_dict[rectangle][1] + 1):
-                for y in range(self.obj_dict[rectangle][2], self.obj_dict[rectangle][3] + 1):
-                    self.collision_grid[x][y].remove(rectangle)
+        self.player = player
+        # Blocks and ball lists are kept in EntityLists so that removing one is
+        # constant time
+        if not isinstance(balls, BallStore):
+            balls = EntityList.wrap(balls)
+        self.balls = balls
+        if isinstance(blocks, StaticLevel):
+            self.level = blocks
+            self.blocks = EntityList(blocks.blocks)
+        else:
+            self.blocks = EntityList.wrap(blocks)
+            self.level = StaticLevel(self.blocks.entities, collision_grid_shape)
+        self.collision_grid_shape = collision_grid_shape
+        # Reused per recursion depth so that steady state collision checks
+        # don't allocate
+        self._candidate_buffers = []
+        self._collision_infos = []
+        self._collision_depth = 0
+        # Array kept at 1 for live blocks and 0 for destroyed ones, indexed by
+        # block id, see track_block_state
+        self.block_state = None
+        self.continuous = continuous
+        if isinstance(balls, BallStore):
+            if continuous:
+                self._handle_balls: function = self._advance_ball_store
+            else:
+                self._handle_balls: function = self._handle_ball_store_collisions
+        else:
+            if continuous:
+                self._handle_balls: function = self._advance_ball_list
+            else:
+                self._handle_balls: function = self._handle_ball_list_collisions
+        self.set_broadphase(broadphase)
 
-    def clamp_val(self, val: int, is_x: bool) -> int:
-        """Clamps the value to be within the collision grid bounds
+    def set_broadphase(self, broadphase: str | Broadphase):
+        """Switches to a different broadphase backend, registering the current
+        blocks and player with it. A backend given by name comes from the
+        level, with the blocks already in its shared static layer
 
         Arguments:
-            val {int} -- Value to clamp
-            is_x {bool} -- Whether or not it is an x coordinate
-
-        Returns:
-            int -- Clamped value
+            broadphase {str | Broadphase} -- Backend or the name of one
         """
-        if is_x:
-            val = min(max(val, 0), self.collision_grid_shape[0] - 1)
+        # Blocks never move, so they are registered once in the static layer
+        # and only touched again when they get removed or restored. Removed
+        # blocks are registered too, so that they can be restored later
+        blocks = self.blocks
+        if isinstance(broadphase, str):
+            broadphase = self.level.get_broadphase(broadphase)
         else:
-            val = min(max(val, 0), self.collision_grid_shape[1] - 1)
-        return val
-
-    def update_grid_for_rect(self, rectangle: BreakoutRectangle):
-        """Updates the grid with the given rectangle, adding it to any corresponding
-        grid spaces
+            for block in blocks.entities:
+                broadphase.add_static(block)
+            broadphase.build()
+        self.broadphase = broadphase
+        broadphase.add_dynamic(self.player)
+        for block_id in np.flatnonzero(~blocks.alive[:len(blocks.entities)]).tolist():
+            broadphase.remove(blocks.entities[block_id])
+        # Broadphase id of every block, by block id
+        self._block_rect_ids = np.array([broadphase.obj_ids[block] for block in blocks.entities],
+                                        dtype=np.intp)
+        self._edge_table = self.level.edge_table
+        self._corner_table = self.level.corner_table
+        self._player_left = self.player.left
+        self._player_top = self.player.top
+
+        if isinstance(self.balls, BallStore):
+            # The batched narrowphase works on arrays of rectangle bounds,
+            # indexed by the ids the broadphase gave the rectangles
+            self._rects = broadphase.objects
+            self._player_id = broadphase.obj_ids[self.player]
+            self._rect_left = broadphase.aabbs[:, 0].copy()
+            self._rect_top = broadphase.aabbs[:, 1].copy()
+            self._rect_right = broadphase.aabbs[:, 2].copy()
+            self._rect_bottom = broadphase.aabbs[:, 3].copy()
+
+    def set_blocks_alive(self, alive: np.ndarray):
+        """Removes and restores blocks so that exactly the ones flagged in
+        alive are live, without rebuilding the broadphase. The block list and
+        the broadphase both switch in bulk
 
         Arguments:
-            rectangle {BreakoutRectangle} -- Rectangle to update the grid for
+            alive {np.ndarray} -- Alive flag of every block, indexed by block id
         """
-        left = int(rectangle.left // self.grid_dx)
-        right = math.ceil((rectangle.left + rectangle.width) / self.grid_dx)
-        top = int(rectangle.top // self.grid_dy)
-        bot = math.ceil((rectangle.top + rectangle.height) / self.grid_dy)
-        left = self.clamp_val(left, True)
-        right = self.clamp_val(right, True)
-        top = self.clamp_val(top, False)
-        bot = self.clamp_val(bot, False)
-
-        # If it is already in the dictionary, check if it needs to be updated
-        if rectangle in self.obj_dict:
-            if self.is_obj_boundary_changed(rectangle, left, right, top, bot):
-                left_min = min(left, self.obj_dict[rectangle][0])
-                right_max = max(right, self.obj_dict[rectangle][1])
-                top_min = min(top, self.obj_dict[rectangle][2])
-                bot_max = max(bot, self.obj_dict[rectangle][3])
-            else:
-                return
-        else:
-            left_min = left
-            right_max = right
-            top_min = top
-            bot_max = bot
-            self.obj_dict[rectangle] = [0, 0, 0, 0]
-
-        # Add/remove the object from the affected area
-        for x in range(left_min, right_max + 1):
-            for y in range(top_min, bot_max + 1):
-                # Goes through the whole affected area and adds rectangles to
-                # the new area while removing them from the old area
-                if self.is_coord_in_range((x, y), left, right, top, bot):
-                    self.collision_grid[x][y].add(rectangle)
-                elif rectangle in self.collision_grid[x][y]:
-                    self.collision_grid[x][y].remove(rectangle)
-
-        self.obj_dict[rectangle][0] = left
-        self.obj_dict[rectangle][1] = right
-        self.obj_dict[rectangle][2] = top
-        self.obj_dict[rectangle][3] = bot
-
-class CollisionManager:
-    def __init__(self, player: BreakoutPlayer, balls: list[BreakoutBall],
-                 blocks: list[BreakoutBlock], collision_grid_shape: tuple[int]):
-        """The collision manager is the main class for handling collision
+        changed = self.blocks.set_alive(alive)
+        if changed.size == 0:
+            return
+        if self.block_state is not None:
+            self.block_state[changed] = alive[changed]
+        self.broadphase.switch_static(self._block_rect_ids[changed], alive[changed])
+
+    def track_block_state(self, out: np.ndarray):
+        """Starts keeping out up to date with which blocks are alive: 1 for a
+        live block and 0 for a destroyed one, indexed by block id, which is
+        the order the blocks were given in. It is filled once here and after
+        that only written to when a block is destroyed or restored, so it can
+        be part of an observation without costing anything per step
 
         Arguments:
-            player {BreakoutPlayer} -- Player
-            balls {list[BreakoutBall]} -- List of balls
-            blocks {list[BreakoutBlock]} -- List of blocks
-            collision_grid_shape {tuple[int]} -- Shape of the collision grid (x, y)
+            out {np.ndarray} -- Array with room for every block
         """
-        self.player = player
-        self.balls = balls
-        self.blocks = blocks
-        self.collision_grid = CollisionGrid(collision_grid_shape, SCREEN_WIDTH, SCREEN_HEIGHT)
-        for block in blocks:
-            self.collision_grid.update_grid_for_rect(block)
-
-    def _find_corner_collision(self, p0: list[float], v: list[float],
-                               corner: list[float], radius: float, dt: float) -> tuple[float, tuple[float], tuple[float]]:
-        """Finds the time, location, and relative angle of collision
+        out[:] = self.blocks.alive[:len(self.blocks.entities)]
+        self.block_state = out
+
+    def _remove_block(self, block: BreakoutBlock):
+        block_id = self.blocks.remove(block)
+        self.broadphase.remove(block)
+        if self.block_state is not None:
+            self.block_state[block_id] = 0
+
+    def _find_corner_collision(self, x0: float, y0: float, dx: float, dy: float,
+                               xc: float, yc: float, radius: float, dt: float,
+                               out: CollisionInfo) -> float:
+        """Finds the time, location, and relative angle of collision. The
+        location and angle are written to the contact_point and unit_vector of
+        out
 
         Arguments:
-            p0 {list[float]} -- Start point to check from
-            v {list[float]} -- Velocity of the point
-            corner {list[float]} -- Corner to check collision with
+            x0 {float} -- X of the start point to check from
+            y0 {float} -- Y of the start point to check from
+            dx {float} -- X velocity of the point
+            dy {float} -- Y velocity of the point
+            xc {float} -- X of the corner to check collision with
+            yc {float} -- Y of the corner to check collision with
             radius {float} -- Radius of the ball
             dt {float} -- Change in time from starting point to ending point
+            out {CollisionInfo} -- Info to write the contact point and unit
+            vector to
 
         Returns:
-            tuple[float, tuple[float], tuple[float]] -- Time, location, relative
-            angle towards the collision point
+            float -- Time of the collision, None if there isn't one
         """
-        x0, y0 = p0
-        dx, dy = v
-        xc, yc = corner
-
         # Compute coefficients for: ‖(p0 + v·t) – corner‖^2 = r^2
         xn = x0 - xc
         yn = y0 - yc
@@ -235,11 +211,11 @@ class CollisionManager:
 
         if a == 0:
             # The ball is not moving (or moving zero speed) – no “sweep”
-            return None, None, None
+            return None
 
         if discriminant < 0:
             # no real roots → no time when centre is exactly radius away from corner
-            return None, None, None
+            return None
 
         sqrtD = math.sqrt(discriminant)
         t1 = (-b - sqrtD) / (2*a)
@@ -251,20 +227,17 @@ class CollisionManager:
             t2 = dt
 
         # We want the **earliest** t in [0, dt]
-        t_candidates = [t for t in (t1, t2) if 0 <= t <= dt]
-        if not t_candidates:
-            return None, None, None
-
-        t_impact = min(t_candidates)
-
-        # Centre position at impact
-        cx_imp = x0 + dx * t_impact
-        cy_imp = y0 + dy * t_impact
-        # centre_imp = (cx_imp, cy_imp)
+        t_impact = None
+        if 0 <= t1 <= dt:
+            t_impact = t1
+        if 0 <= t2 <= dt and (t_impact is None or t2 < t_impact):
+            t_impact = t2
+        if t_impact is None:
+            return None
 
         # Normal vector from corner to centre at impact
-        nx = cx_imp - xc
-        ny = cy_imp - yc
+        nx = x0 + dx * t_impact - xc
+        ny = y0 + dy * t_impact - yc
         length_n = math.hypot(nx, ny)
         if length_n == 0:
             # Exactly overlapping corner centre (rare edge‐case) — normal undefined
@@ -274,14 +247,14 @@ class CollisionManager:
         # Unit normal
         unx = nx / length_n
         uny = ny / length_n
-        unit_vector = (unx, uny)
+        out.unit_vector[0] = unx
+        out.unit_vector[1] = uny
 
         # Contact point on the ball/wall boundary: corner + radius * unit‐normal
-        contact_x = xc + unx * radius
-        contact_y = yc + uny * radius
-        contact_point = (contact_x, contact_y)
+        out.contact_point[0] = xc + unx * radius
+        out.contact_point[1] = yc + uny * radius
 
-        return t_impact, contact_point, unit_vector
+        return t_impact
 
     def _handle_corner_collision(self, ball: BreakoutBall, collision_info: CollisionInfo, dt: float):
         """Updates a ball based on the given collision info from a corner
@@ -309,8 +282,8 @@ class CollisionManager:
         time_left = dt - collision_info.t_impact
         ball.update(time_left)
 
-    def _handle_block_collision(self, ball: BreakoutBall,
-                                block: BreakoutBlock, dt: float) -> bool:
+    def _handle_block_collision(self, ball: BreakoutBall, block: BreakoutBlock,
+                                dt: float, out: CollisionInfo = None) -> bool:
         """Handles general collisions between and given ball and block
 
         Arguments:
@@ -318,11 +291,14 @@ class CollisionManager:
             block {BreakoutBlock} -- Block to handle
             dt {float} -- Change in time since x0, y0 of the ball
 
+        Keyword Arguments:
+            out {CollisionInfo} -- Info to reuse for the check (default: {None})
+
         Returns:
             bool -- Whether or not there was a collision and the block should be
             deleted
         """
-        collision_info = self._check_rect_collision(ball, block, dt)
+        collision_info = self._check_rect_collision(ball, block, dt, out=out)
         delete_block = False
         if collision_info.is_collision:
             time_left = dt - collision_info.t_impact
@@ -358,15 +334,19 @@ class CollisionManager:
                 self.handle_ball_collisions(ball, time_left)
         return delete_block
 
-    def _handle_player_collision(self, ball: BreakoutBall, player: BreakoutPlayer, dt: float):
+    def _handle_player_collision(self, ball: BreakoutBall, player: BreakoutPlayer,
+                                 dt: float, out: CollisionInfo = None):
         """Handles collision between a ball and the player
 
         Arguments:
             ball {BreakoutBall} -- Ball to check for collision
             player {BreakoutPlayer} -- Player to check for collision
             dt {float} -- Change in time
+
+        Keyword Arguments:
+            out {CollisionInfo} -- Info to reuse for the check (default: {None})
         """
-        collision_info = self._check_rect_collision(ball, player, dt, True)
+        collision_info = self._check_rect_collision(ball, player, dt, True, out)
         # We only care about vertical collisions
         if collision_info.is_collision:
             player.collisions += 1
@@ -393,72 +373,85 @@ class CollisionManager:
                 player.last_left_collision = player.left
                 player.last_top_collision = player.top
 
-    def _get_collision_type(self, ball: BreakoutBall, rect: BreakoutRectangle,
-                            dt: float, is_player: bool = False) -> tuple[CollisionType, tuple[float], float]:
-        """Gets the specific type of collision between a ball and rectangle
+    def _get_collision_type(self, ball: BreakoutBall, left: float, top: float,
+                            right: float, bottom: float, dt: float,
+                            is_player: bool, out: CollisionInfo):
+        """Gets the specific type of collision between a ball and rectangle.
+        The type is written to out, along with the contact point and exact time
+        of collision relative to x0, y0 for planar collisions
 
         Arguments:
             ball {BreakoutBall} -- Ball to get collision type for
-            rect {BreakoutRectangle} -- Rectangle
+            left {float} -- Left of the rectangle
+            top {float} -- Top of the rectangle
+            right {float} -- Right of the rectangle
+            bottom {float} -- Bottom of the rectangle
             dt {float} -- Change in time
-
-        Keyword Arguments:
             is_player {bool} -- Whether or not the rectangle is a player
-            (default: {False})
-
-        Returns:
-            tuple[CollisionType, tuple[float], float] -- Collision type, contact
-            point if applicable, exact time of collision relative to x0, y0 if
-            applicable
+            out {CollisionInfo} -- Info to write to
         """
-        if ball.dx == 0:
+        x0 = ball.x0
+        y0 = ball.y0
+        dx = ball.dx
+        dy = ball.dy
+        radius = ball.radius
+        if dx == 0:
             dtx = -1
         else:
-            if ball.x0 < rect.left:
-                x_contact = rect.left - ball.radius
+            if x0 < left:
+                x_contact = left - radius
             else:
-                x_contact = (rect.left + rect.width) + ball.radius
+                x_contact = right + radius
             # Gets the relative time at which the ball would get to that point
-            dtx = (x_contact - ball.x0) / (ball.dx)
+            dtx = (x_contact - x0) / dx
 
-        if ball.dy == 0:
+        if dy == 0:
             dty = -1
         else:
-            if ball.y0 < rect.top:
-                y_contact = rect.top - ball.radius
+            if y0 < top:
+                y_contact = top - radius
             else:
-                y_contact = (rect.top + rect.height) + ball.radius
+                y_contact = bottom + radius
             # Gets the relative time at which the ball would get to that point
-            dty = (y_contact - ball.y0) / (ball.dy)
+            dty = (y_contact - y0) / dy
 
         if is_player:
+            out.collision_type = CollisionType.Y
+            out.is_collision = True
             if dty >= 0 and ((dtx >= 0 and dty < dtx) or dtx < 0):
-                x_contact = ball.x0 + ball.dx * dty
-                return CollisionType.Y, (x_contact, y_contact), dty
-            return CollisionType.Y, (ball.x, rect.top - ball.radius), dt
+                out.contact_point[0] = x0 + dx * dty
+                out.contact_point[1] = y_contact
+                out.t_impact = dty
+            else:
+                out.contact_point[0] = ball.x
+                out.contact_point[1] = top - radius
+                out.t_impact = dt
+            return
 
+        out.collision_type = CollisionType.CORNER
         if 0 <= dty <= dt or 0 <= dtx <= dt:
             # The x collision happened first
             if dty < 0 or (dtx < dty and dtx >= 0):
-                y_contact = ball.y0 + ball.dy * dtx
-                if rect.top <= y_contact <= rect.top + rect.height:
-                    return CollisionType.X, (x_contact, y_contact), dtx
-                else:
-                    return CollisionType.CORNER, (x_contact, y_contact), None
+                y_contact = y0 + dy * dtx
+                if top <= y_contact <= bottom:
+                    out.collision_type = CollisionType.X
+                    out.is_collision = True
+                    out.contact_point[0] = x_contact
+                    out.contact_point[1] = y_contact
+                    out.t_impact = dtx
             # The y collision happened first
             elif dty >= 0:
-                x_contact = ball.x0 + ball.dx * dty
-                if rect.left <= x_contact <= rect.left + rect.width:
-                    return CollisionType.Y, (x_contact, y_contact), dty
-                else:
-                    return CollisionType.CORNER, (x_contact, y_contact), None
-            else:
-                return CollisionType.CORNER, (None, None), None
-        else:
-            return CollisionType.CORNER, (None, None), None
+                x_contact = x0 + dx * dty
+                if left <= x_contact <= right:
+                    out.collision_type = CollisionType.Y
+                    out.is_collision = True
+                    out.contact_point[0] = x_contact
+                    out.contact_point[1] = y_contact
+                    out.t_impact = dty
 
     def _check_rect_collision(self, ball: BreakoutBall, rect: BreakoutRectangle,
-                              dt: float, is_player: bool = False) -> CollisionInfo:
+                              dt: float, is_player: bool = False,
+                              out: CollisionInfo = None) -> CollisionInfo:
         """Checks for a collision between ball and rectangle and returns
         CollisionInfo if there is one
 
@@ -470,45 +463,59 @@ class CollisionManager:
         Keyword Arguments:
             is_player {bool} -- Whether or not the rectangle is a player
             (default: {False})
+            out {CollisionInfo} -- Info to reuse, it gets reset first
+            (default: {None})
 
         Returns:
             CollisionInfo -- Info to return
         """
-        ball_in_x_range = ball.x + ball.radius >= rect.left and ball.x - ball.radius <= rect.left + rect.width
-        ball_in_y_range = ball.y + ball.radius >= rect.top and ball.y - ball.radius <= rect.top + rect.height
-        collision_result = CollisionInfo(contact_point=[0, 0])
+        if out is None:
+            out = CollisionInfo(contact_point=[0, 0], unit_vector=[0, 0])
+        else:
+            out.reset()
+        edges = self._edge_table.get(rect)
+        if edges is None:
+            left = rect.left
+            top = rect.top
+            right = left + rect.width
+            bottom = top + rect.height
+        else:
+            left, top, right, bottom = edges
+        x = ball.x
+        y = ball.y
+        radius = ball.radius
+        ball_in_x_range = x + radius >= left and x - radius <= right
+        ball_in_y_range = y + radius >= top and y - radius <= bottom
         # Gets relative collision point on the ball
         if ball_in_x_range and ball_in_y_range:
-            coll_type, coll_coord, t_impact = self._get_collision_type(ball, rect, dt, is_player)
-            collision_result.collision_type = coll_type
-            if coll_type == CollisionType.X:
-                collision_result.is_collision = True
-                collision_result.t_impact = t_impact
-                collision_result.contact_point = coll_coord
-            elif coll_type == CollisionType.Y:
-                collision_result.is_collision = True
-                collision_result.t_impact = t_impact
-                collision_result.contact_point = coll_coord
-            else:
+            self._get_collision_type(ball, left, top, right, bottom, dt, is_player, out)
+            if out.collision_type == CollisionType.CORNER:
+                corners = self._corner_table.get(rect)
+                if corners is None:
+                    corners = ((right, top), (right, bottom), (left, top), (left, bottom))
+                x0 = ball.x0
+                y0 = ball.y0
+                dx = ball.dx
+                dy = ball.dy
                 # Loops through each corner of the rectangle to check for
                 # collision within time
-                top_right = (rect.left + rect.width, rect.top)
-                bottom_right = (rect.left + rect.width, rect.top + rect.height)
-                top_left = (rect.left, rect.top)
-                bottom_left = (rect.left, rect.top + rect.height)
-                for corner in [top_right, bottom_right, top_left, bottom_left]:
-                    t_impact, contact_point, unit_vector = self._find_corner_collision((ball.x0, ball.y0), (ball.dx, ball.dy), corner, ball.radius, dt)
+                for xc, yc in corners:
+                    t_impact = self._find_corner_collision(x0, y0, dx, dy, xc, yc, radius, dt, out)
                     if t_impact is not None:
                         # Saves and checks the previous collision corner. Due to the
                         # collision recursion, this can get triggered again
-                        if [corner[0], corner[1]] != ball.last_collision_point:
-                            ball.last_collision_point = [corner[0], corner[1]]
-                            collision_result.is_collision = True
-                            collision_result.t_impact = t_impact
-                            collision_result.contact_point = contact_point
-                            collision_result.unit_vector = unit_vector
-                            return collision_result
-        return collision_result
+                        last_point = ball.last_collision_point
+                        if xc != last_point[0] or yc != last_point[1]:
+                            ball.last_collision_point = [xc, yc]
+                            out.is_collision = True
+                            out.t_impact = t_impact
+                            return out
+        return out
+
+    def _reserve_depth(self, depth: int):
+        if depth == len(self._candidate_buffers):
+            self._candidate_buffers.append([])
+            self._collision_infos.append(CollisionInfo(contact_point=[0, 0], unit_vector=[0, 0]))
 
     def handle_ball_collisions(self, ball: BreakoutBall, dt: float):
         """Handles all possible collisions with a given ball, removing blocks
@@ -518,15 +525,24 @@ class CollisionManager:
             ball {BreakoutBall} -- Ball to handle
             dt {float} -- Change in time
         """
-        possible_collisions = self.collision_grid.get_possible_collisions(ball)
-        for possible_collision in possible_collisions:
-            if isinstance(possible_collision, BreakoutPlayer):
-                self._handle_player_collision(ball, possible_collision, dt)
-            else:
-                result = self._handle_block_collision(ball, possible_collision, dt)
-                if result:
-                    self.blocks.remove(possible_collision)
-                    self.collision_grid.remove(possible_collision)
+        # Corner hits recurse back into here, so every recursion depth gets its
+        # own reused candidate list and collision info
+        depth = self._collision_depth
+        self._reserve_depth(depth)
+        possible_collisions = self.broadphase.get_possible_collisions(ball, out=self._candidate_buffers[depth])
+        info = self._collision_infos[depth]
+        player = self.player
+        self._collision_depth += 1
+        try:
+            for possible_collision in possible_collisions:
+                if possible_collision is player:
+                    self._handle_player_collision(ball, possible_collision, dt, info)
+                else:
+                    result = self._handle_block_collision(ball, possible_collision, dt, info)
+                    if result:
+                        self._remove_block(possible_collision)
+        finally:
+            self._collision_depth -= 1
 
     def update(self, dt: float):
         """Updates all collision related objects from the given change in time
@@ -534,9 +550,423 @@ class CollisionManager:
         Arguments:
             dt {float} -- Change in time
         """
-        for block in self.blocks:
-            self.collision_grid.update_grid_for_rect(block)
-        self.collision_grid.update_grid_for_rect(self.player)
+        player = self.player
+        if player.left != self._player_left or player.top != self._player_top:
+            self._player_left = player.left
+            self._player_top = player.top
+            self.broadphase.mark_dirty(player)
+        self.broadphase.update_dynamic()
+
+        self._handle_balls(dt)
 
+    def _handle_ball_list_collisions(self, dt: float):
         for ball in self.balls:
-            self.handle_ball_collisions(ball, dt)
\ No newline at end of file
+            self.handle_ball_collisions(ball, dt)
+
+    def _handle_ball_store_collisions(self, dt: float, max_iterations: int = 8):
+        """Handles collisions for every ball in a BallStore at once. Each pass
+        resolves the earliest impact of every ball that hit something, then
+        checks those balls again over the time they have left
+
+        Arguments:
+            dt {float} -- Change in time
+
+        Keyword Arguments:
+            max_iterations {int} -- Maximum number of collisions handled per
+            ball in a single step (default: {8})
+        """
+        balls = self.balls
+        player_id = self._player_id
+        self._sync_player_rect()
+
+        active = np.arange(len(balls))
+        time_left = np.full(len(balls), float(dt))
+        for _ in range(max_iterations):
+            if active.size == 0:
+                break
+            pair_balls, pair_rects = self.broadphase.get_candidate_pairs(
+                balls.x[active], balls.y[active], balls.radius[active])
+            if pair_balls.size == 0:
+                break
+            impacts = batch_rect_collisions(balls, active[pair_balls], pair_rects,
+                                            self._rect_left, self._rect_top,
+                                            self._rect_right, self._rect_bottom,
+                                            time_left, player_id)
+            if len(impacts) == 0:
+                break
+            self._apply_batch_responses(impacts)
+            remaining = time_left[impacts.ball] - impacts.t_impact
+            balls._update_slice(impacts.ball, remaining)
+            time_left[impacts.ball] = remaining
+            active = impacts.ball[remaining > 0]
+
+    def _sync_player_rect(self):
+        player = self.player
+        player_id = self._player_id
+        self._rect_left[player_id] = player.left
+        self._rect_top[player_id] = player.top
+        self._rect_right[player_id] = player.left + player.width
+        self._rect_bottom[player_id] = player.top + player.height
+
+    def _find_next_event(self, ball: BreakoutBall, t_max: float) -> tuple:
+        """Finds the first thing the ball runs into within the given time
+
+        Arguments:
+            ball {BreakoutBall} -- Ball to check
+            t_max {float} -- Time the ball has left
+
+        Returns:
+            tuple -- (t_impact, kind, rectangle or None, normal_x, normal_y),
+            kind is None if nothing gets hit
+        """
+        x = ball.x
+        y = ball.y
+        dx = ball.dx
+        dy = ball.dy
+        radius = ball.radius
+        t_wall, wall_kind = wall_impact(x, y, dx, dy, radius, SCREEN_WIDTH, SCREEN_HEIGHT)
+        if t_wall <= t_max:
+            event = (t_wall, wall_kind, None, 0.0, 0.0)
+            t_max = t_wall
+        else:
+            event = (t_max, None, None, 0.0, 0.0)
+
+        depth = self._collision_depth
+        self._reserve_depth(depth)
+        candidates = self.broadphase.get_swept_collisions(ball, t_max, out=self._candidate_buffers[depth])
+        for rect in candidates:
+            impact = swept_impact(x, y, dx, dy, radius, rect.left, rect.top,
+                                  rect.left + rect.width, rect.top + rect.height,
+                                  t_max, rect is self.player)
+            if impact is not None and impact[0] <= t_max:
+                t_max = impact[0]
+                event = (impact[0], impact[1], rect, impact[2], impact[3])
+        return event
+
+    def advance_ball(self, ball: BreakoutBall, dt: float, max_events: int = 16):
+        """Moves a ball through the given time, stopping at every wall, block
+        and player it touches on the way to bounce off it. Blocks that get hit
+        are removed
+
+        Arguments:
+            ball {BreakoutBall} -- Ball to move
+            dt {float} -- Change in time
+
+        Keyword Arguments:
+            max_events {int} -- Maximum number of impacts handled for the ball
+            in a single step, any time left after that is integrated without
+            checking blocks (default: {16})
+        """
+        ball.x0 = ball.x
+        ball.y0 = ball.y
+        time_left = dt
+        for _ in range(max_events):
+            t, kind, rect, nx, ny = self._find_next_event(ball, time_left)
+            ball.x += ball.dx * t
+            ball.y += ball.dy * t
+            time_left -= t
+            if kind is None or not self._apply_event(ball, kind, rect, nx, ny):
+                return
+            if time_left <= 0:
+                return
+        ball.update(time_left)
+
+    def _apply_event(self, ball: BreakoutBall, kind: int, rect: BreakoutRectangle,
+                     nx: float, ny: float) -> bool:
+        """Bounces a ball that was moved up to an event off whatever it hit,
+        removing the block if it was one
+
+        Returns:
+            bool -- Whether the ball keeps moving, False once it fell out
+        """
+        if kind == KIND_BOTTOM:
+            ball.dead = True
+            return False
+        if kind == KIND_WALL_X:
+            ball.dx = abs(ball.dx) if ball.x < SCREEN_WIDTH / 2 else -abs(ball.dx)
+        elif kind == KIND_WALL_TOP:
+            ball.dy = abs(ball.dy)
+        elif rect is self.player:
+            self._bounce_off_player(ball)
+        else:
+            # Reflects the velocity around the surface normal
+            dot = ball.dx * nx + ball.dy * ny
+            ball.dx -= 2 * dot * nx
+            ball.dy -= 2 * dot * ny
+            self._remove_block(rect)
+        return True
+
+    def _bounce_off_player(self, ball: BreakoutBall):
+        player = self.player
+        player.collisions += 1
+        ball_speed = ball.get_speed()
+        rel_x = ball.x - (player.left + player.width / 2)
+        x_scalar = rel_x / (player.width / 2)
+        new_angle = (-math.pi / 2) + (math.pi / 4) * x_scalar
+        ball.dx = math.cos(new_angle) * ball_speed
+        ball.dy = math.sin(new_angle) * ball_speed
+        player.last_left_collision = player.left
+        player.last_top_collision = player.top
+
+    def _advance_ball_list(self, dt: float, max_events: int = 16):
+        """advance_ball over every ball of a list, one event at a time in the
+        order the events happen over all balls. A block is always hit by the
+        ball that reaches it first, however large dt is
+
+        Arguments:
+            dt {float} -- Change in time
+
+        Keyword Arguments:
+            max_events {int} -- Maximum number of impacts handled per ball in a
+            single step (default: {16})
+        """
+        balls = list(self.balls)
+        for ball in balls:
+            ball.x0 = ball.x
+            ball.y0 = ball.y
+        # Time every ball has left, the events it has left and its next event,
+        # None once it is done for this step
+        time_left = [dt] * len(balls)
+        events_left = [max_events] * len(balls)
+        next_events = [self._find_next_event(ball, dt) for ball in balls]
+        while True:
+            i = -1
+            first_time = math.inf
+            for j, event in enumerate(next_events):
+                if event is not None and dt - time_left[j] + event[0] < first_time:
+                    i = j
+                    first_time = dt - time_left[j] + event[0]
+            if i < 0:
+                return
+            ball = balls[i]
+            t, kind, rect, nx, ny = next_events[i]
+            ball.x += ball.dx * t
+            ball.y += ball.dy * t
+            time_left[i] -= t
+            next_events[i] = None
+            if kind is None or not self._apply_event(ball, kind, rect, nx, ny):
+                continue
+            if rect is not None and rect is not self.player:
+                # Balls that were heading for the block look again
+                for j, event in enumerate(next_events):
+                    if event is not None and event[2] is rect:
+                        next_events[j] = self._find_next_event(balls[j], time_left[j])
+            events_left[i] -= 1
+            if time_left[i] <= 0:
+                continue
+            if events_left[i] == 0:
+                # Out of events, the rest of the step is integrated without blocks
+                ball.update(time_left[i])
+                continue
+            next_events[i] = self._find_next_event(ball, time_left[i])
+
+    def _advance_ball_store(self, dt: float, max_events: int = 16):
+        """Batched version of advance_ball over every ball in a BallStore, with
+        events applied in the order they happen over all balls like
+        _advance_ball_list. Each pass finds the next event of every ball that
+        still has time left, moves the balls up to it and applies the bounces.
+        Only a block hit can depend on the order, when another ball gets to
+        the block first, so a block hit waits for a later pass while a ball
+        with an earlier event could still reach the block before it. The
+        earliest event never waits, so every pass makes progress
+
+        Arguments:
+            dt {float} -- Change in time
+
+        Keyword Arguments:
+            max_events {int} -- Maximum number of impacts handled per ball in a
+            single step (default: {16})
+        """
+        balls = self.balls
+        player = self.player
+        player_id = self._player_id
+        self._sync_player_rect()
+        n = len(balls)
+        balls.x0[:n] = balls.x[:n]
+        balls.y0[:n] = balls.y[:n]
+
+        active = np.arange(n)
+        time_left = np.full(n, float(dt))
+        events_left = np.full(n, max_events)
+        while active.size:
+            x = balls.x[active]
+            y = balls.y[active]
+            dx = balls.dx[active]
+            dy = balls.dy[active]
+            r = balls.radius[active]
+            t_max = time_left[active]
+
+            t_event, kind = batch_wall_impacts(x, y, dx, dy, r, SCREEN_WIDTH, SCREEN_HEIGHT)
+            kind[t_event > t_max] = -1
+            t_event = np.minimum(t_event, t_max)
+            pair_balls, pair_rects = self.broadphase.get_swept_pairs(x, y, dx, dy, r, t_event)
+            impacts = batch_swept_impacts(x, y, dx, dy, r, t_event, pair_balls, pair_rects,
+                                          self._rect_left, self._rect_top,
+                                          self._rect_right, self._rect_bottom, player_id)
+            hit = impacts.ball
+            is_player = impacts.rect == player_id
+            rect = np.full(active.size, -1)
+            t_event[hit] = impacts.t_impact
+            kind[hit] = impacts.kind
+            rect[hit] = impacts.rect
+            wait = self._late_block_hits(hit[~is_player], rect, x + dx * t_event, y + dy * t_event,
+                                         np.hypot(dx, dy), r, dt - t_max + t_event, kind)
+            if wait.any():
+                keep = ~wait[hit]
+                impacts = BatchCollisionInfo(*(v[keep] for v in vars(impacts).values()))
+                hit = impacts.ball
+                is_player = is_player[keep]
+                t_event[wait] = 0
+                kind[wait] = -1
+                rect[wait] = -1
+
+            x += dx * t_event
+            y += dy * t_event
+            t_max -= t_event
+
+            wall_x = kind == KIND_WALL_X
+            dx[wall_x] = np.where(x[wall_x] < SCREEN_WIDTH / 2, 1, -1) * np.abs(dx[wall_x])
+            wall_top = kind == KIND_WALL_TOP
+            dy[wall_top] = np.abs(dy[wall_top])
+            bottom = kind == KIND_BOTTOM
+            balls.dead[active[bottom]] = True
+            t_max[bottom] = 0
+
+            # Reflects the velocity around the surface normal
+            block_hit = hit[~is_player]
+            nx = impacts.normal_x[~is_player]
+            ny = impacts.normal_y[~is_player]
+            dot = dx[block_hit] * nx + dy[block_hit] * ny
+            dx[block_hit] -= 2 * dot * nx
+            dy[block_hit] -= 2 * dot * ny
+
+            # Player hits send the ball off at an angle set by where it landed
+            player_hit = hit[is_player]
+            if player_hit.size:
+                speed = np.hypot(dx[player_hit], dy[player_hit])
+                rel_x = x[player_hit] - (player.left + player.width / 2)
+                x_scalar = rel_x / (player.width / 2)
+                new_angle = (-math.pi / 2) + (math.pi / 4) * x_scalar
+                dx[player_hit] = np.cos(new_angle) * speed
+                dy[player_hit] = np.sin(new_angle) * speed
+                player.collisions += int(player_hit.size)
+                player.last_left_collision = player.left
+                player.last_top_collision = player.top
+
+            balls.x[active] = x
+            balls.y[active] = y
+            balls.dx[active] = dx
+            balls.dy[active] = dy
+            time_left[active] = t_max
+
+            for rect_id in rect[block_hit].tolist():
+                self._remove_block(self._rects[rect_id])
+
+            moved = kind >= 0
+            events_left[active[moved]] -= 1
+            going = moved & (t_max > 0)
+            # Out of events, the rest of the step is integrated without blocks
+            done = active[going & (events_left[active] == 0)]
+            if done.size:
+                balls._update_slice(done, time_left[done])
+            active = active[(going & (events_left[active] > 0)) | wait]
+
+    def _late_block_hits(self, block_hit: np.ndarray, rect: np.ndarray, event_x: np.ndarray,
+                         event_y: np.ndarray, speed: np.ndarray, r: np.ndarray, elapsed: np.ndarray,
+                         kind: np.ndarray) -> np.ndarray:
+        """Finds the block hits of a pass of _advance_ball_store that have to
+        wait: those of a block another ball hits earlier in the pass, and
+        those of a block some ball with an earlier event could still reach
+        first. Bounces keep the speed, so a ball can't get to a block sooner
+        than its distance from where its event happens over its speed
+
+        Arguments:
+            block_hit {np.ndarray} -- Balls of the pass that hit a block
+            rect {np.ndarray} -- Rectangle every ball of the pass hits, -1 for none
+            event_x {np.ndarray} -- x position of every ball at its event
+            event_y {np.ndarray} -- y position of every ball at its event
+            speed {np.ndarray} -- Speed of every ball
+            r {np.ndarray} -- Radius of every ball
+            elapsed {np.ndarray} -- Time into the step of every ball's event
+            kind {np.ndarray} -- Kind of every ball's event, -1 for none
+
+        Returns:
+            np.ndarray -- Whether every ball of the pass waits
+        """
+        wait = np.zeros(elapsed.size, dtype=bool)
+        if block_hit.size == 0 or elapsed.size == 1:
+            return wait
+        hit_rect = rect[block_hit]
+        hit_time = elapsed[block_hit]
+        # Only the earliest hit of a block counts
+        order = np.lexsort((hit_time, hit_rect))
+        first = np.ones(order.size, dtype=bool)
+        first[1:] = hit_rect[order[1:]] != hit_rect[order[:-1]]
+        wait[block_hit[order[~first]]] = True
+
+        # Balls that keep going after an event before the last block hit
+        movers = np.flatnonzero((kind >= 0) & (kind != KIND_BOTTOM) & (elapsed < hit_time.max()))
+        if movers.size == 0:
+            return wait
+        # Earliest time every mover could touch every block that gets hit
+        mover_r = r[movers]
+        gap_x = np.maximum(np.maximum(self._rect_left[hit_rect][:, None] - mover_r - event_x[movers],
+                                      event_x[movers] - mover_r - self._rect_right[hit_rect][:, None]), 0)
+        gap_y = np.maximum(np.maximum(self._rect_top[hit_rect][:, None] - mover_r - event_y[movers],
+                                      event_y[movers] - mover_r - self._rect_bottom[hit_rect][:, None]), 0)
+        with np.errstate(divide="ignore"):
+            reach = elapsed[movers] + np.hypot(gap_x, gap_y) / speed[movers]
+        could_steal = (elapsed[movers] < hit_time[:, None]) & (reach <= hit_time[:, None])
+        could_steal &= movers != block_hit[:, None]
+        wait[block_hit[could_steal.any(axis=1)]] = True
+        return wait
+
+    def _apply_batch_responses(self, impacts):
+        """Sets the position and velocity of every ball in the batch to what it
+        is right after its impact, and removes the blocks that were hit
+
+        Arguments:
+            impacts {BatchCollisionInfo} -- Impacts to apply
+        """
+        balls = self.balls
+        b = impacts.ball
+        balls.x[b] = impacts.contact_x
+        balls.y[b] = impacts.contact_y
+        dx = balls.dx[b]
+        dy = balls.dy[b]
+
+        # Planar hits bounce away from the side the ball came from
+        is_x = impacts.kind == KIND_X
+        dx = np.where(is_x, np.where(balls.x0[b] < impacts.contact_x, -np.abs(dx), np.abs(dx)), dx)
+        is_player = impacts.rect == self._player_id
+        is_y = (impacts.kind == KIND_Y) & ~is_player
+        dy = np.where(is_y, np.where(balls.y0[b] < impacts.contact_y, -np.abs(dy), np.abs(dy)), dy)
+
+        speed = np.hypot(dx, dy)
+        # Corner hits mirror the incoming direction around the corner normal
+        is_corner = impacts.kind == KIND_CORNER
+        if is_corner.any():
+            angle = np.arctan2(impacts.normal_y, impacts.normal_x)
+            ball_angle = np.arctan2(dy, dx) + math.pi
+            new_angle = 2 * angle - ball_angle
+            dx = np.where(is_corner, np.cos(new_angle) * speed, dx)
+            dy = np.where(is_corner, np.sin(new_angle) * speed, dy)
+
+        # Player hits send the ball off at an angle set by where it landed
+        if is_player.any():
+            player = self.player
+            rel_x = impacts.contact_x - (player.left + player.width / 2)
+            x_scalar = rel_x / (player.width / 2)
+            new_angle = (-math.pi / 2) + (math.pi / 4) * x_scalar
+            dx = np.where(is_player, np.cos(new_angle) * speed, dx)
+            dy = np.where(is_player, np.sin(new_angle) * speed, dy)
+            player.collisions += int(np.count_nonzero(is_player))
+            player.last_left_collision = player.left
+            player.last_top_collision = player.top
+
+        balls.dx[b] = dx
+        balls.dy[b] = dy
+
+        for rect_id in np.unique(impacts.rect[~is_player]).tolist():
+            block = self._rects[rect_id]
+            self._remove_block(block)
\ No newline at end of file
@@ -0,0 +1,226 @@
+import numpy as np
+
+class EntityList:
+    def __init__(self, entities=()):
+        """List-like container that gives every entity a stable integer id, its
+        index in the order it was added. Removing an entity only clears its
+        slot and its alive flag, so removal is constant time, ids never change
+        and removing entities while iterating is safe. Iterating and len only
+        see live entities, in id order. Iterating walks a list of ids that is
+        compacted once more than half of it are removed entities, so it costs
+        time in the number of live entities rather than every entity ever added
+
+        Keyword Arguments:
+            entities {iterable} -- Entities to start with (default: {()})
+        """
+        self.items = []
+        # Every entity ever added, including removed ones, so they can be
+        # restored under their old ids
+        self.entities = []
+        self.ids = {}
+        self.alive = np.zeros(0, dtype=bool)
+        self.count = 0
+        # Ids iterated over, in order once sorted, which can still hold ids
+        # removed since the last compaction, and whether each id is in it
+        self._slots = []
+        self._listed = np.zeros(0, dtype=bool)
+        self._dead = 0
+        self._sorted = True
+        self.extend(entities)
+
+    @classmethod
+    def wrap(cls, entities) -> "EntityList":
+        """Gets the given entities as an EntityList, without copying them if
+        they already are one
+
+        Arguments:
+            entities {iterable} -- Entities
+
+        Returns:
+            EntityList -- Container of the entities
+        """
+        if isinstance(entities, cls):
+            return entities
+        return cls(entities)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self):
+        if not self._sorted:
+            # A new list, so iterators that are already running keep theirs
+            self._slots = sorted(self._slots)
+            self._sorted = True
+        items = self.items
+        for i in self._slots:
+            entity = items[i]
+            if entity is not None:
+                yield entity
+
+    def _compact(self):
+        items = self.items
+        slots = []
+        for i in self._slots:
+            if items[i] is None:
+                self._listed[i] = False
+            else:
+                slots.append(i)
+        self._slots = slots
+        self._dead = 0
+
+    def __contains__(self, entity) -> bool:
+        return entity in self.ids
+
+    def __getitem__(self, index: int):
+        """Gets the index-th live entity. This is a scan past the removed
+        slots, use get to look an entity up by id
+
+        Arguments:
+            index {int} -- Position among the live entities
+
+        Returns:
+            object -- Entity
+        """
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("entity index out of range")
+        for entity in self:
+            if index == 0:
+                return entity
+            index -= 1
+
+    def get(self, entity_id: int):
+        """Gets an entity by its id
+
+        Arguments:
+            entity_id {int} -- Id of the entity
+
+        Returns:
+            object -- Entity, None if it was removed
+        """
+        return self.items[entity_id]
+
+    def id_of(self, entity) -> int:
+        """Gets the id of a live entity
+
+        Arguments:
+            entity {object} -- Entity
+
+        Returns:
+            int -- Id of the entity
+        """
+        return self.ids[entity]
+
+    def append(self, entity) -> int:
+        """Adds an entity
+
+        Arguments:
+            entity {object} -- Entity to add
+
+        Returns:
+            int -- Id of the entity
+        """
+        entity_id = len(self.items)
+        self.items.append(entity)
+        self.entities.append(entity)
+        self.ids[entity] = entity_id
+        if entity_id == self.alive.size:
+            self.alive = np.concatenate((self.alive, np.zeros(max(entity_id, 8), dtype=bool)))
+            self._listed = np.concatenate((self._listed, np.zeros(max(entity_id, 8), dtype=bool)))
+        self.alive[entity_id] = True
+        self.count += 1
+        # The largest id yet, so the ids stay in order
+        self._slots.append(entity_id)
+        self._listed[entity_id] = True
+        return entity_id
+
+    def extend(self, entities):
+        for entity in entities:
+            self.append(entity)
+
+    def remove(self, entity):
+        """Removes an entity in constant time
+
+        Arguments:
+            entity {object} -- Entity to remove
+
+        Returns:
+            int -- Id the entity had
+        """
+        entity_id = self.ids.pop(entity)
+        self.items[entity_id] = None
+        self.alive[entity_id] = False
+        self.count -= 1
+        self._dead += 1
+        if self._dead > len(self._slots) // 2:
+            self._compact()
+        return entity_id
+
+    def restore(self, entity_id: int):
+        """Adds a removed entity back under its old id in constant time
+
+        Arguments:
+            entity_id {int} -- Id of the entity
+
+        Returns:
+            object -- Entity
+        """
+        entity = self.entities[entity_id]
+        if self.items[entity_id] is None:
+            self.items[entity_id] = entity
+            self.ids[entity] = entity_id
+            self.alive[entity_id] = True
+            self.count += 1
+            if self._listed[entity_id]:
+                # Its id was never compacted away
+                self._dead -= 1
+            else:
+                if self._slots and entity_id < self._slots[-1]:
+                    self._sorted = False
+                self._slots.append(entity_id)
+                self._listed[entity_id] = True
+        return entity
+
+    def set_alive(self, alive: np.ndarray) -> np.ndarray:
+        """Removes and restores entities in bulk so that exactly the ones
+        flagged in alive are live, rebuilding the lookups once instead of
+        once per entity. Entities with an id past the end of alive keep their
+        state
+
+        Arguments:
+            alive {np.ndarray} -- Alive flag of every entity, indexed by id
+
+        Returns:
+            np.ndarray -- Ids of the entities that were removed or restored
+        """
+        n = len(alive)
+        changed = np.flatnonzero(self.alive[:n] != alive)
+        if changed.size == 0:
+            return changed
+        entities = self.entities
+        items = self.items
+        ids = self.ids
+        for i in changed.tolist():
+            entity = entities[i]
+            if items[i] is None:
+                items[i] = entity
+                ids[entity] = i
+            else:
+                items[i] = None
+                del ids[entity]
+        self.alive[:n] = alive
+        # Ids past alive stay live and come after every id before it
+        tail = [i for i in self._slots if i >= n]
+        slots = np.flatnonzero(alive).tolist()
+        if tail:
+            self._listed[tail] = False
+            tail = [i for i in tail if items[i] is not None]
+            self._listed[tail] = True
+            slots += tail
+        self._listed[:n] = alive
+        self._slots = slots
+        self.count = len(ids)
+        self._dead = 0
+        self._sorted = True
+        return changed
@@ -0,0 +1,485 @@
+import numpy as np
+import math
+from .ball_store import BallStore
+
+# Collision kinds, matching the values of collision.CollisionType
+KIND_X = 0
+KIND_Y = 1
+KIND_CORNER = 2
+
+class BatchCollisionInfo:
+    def __init__(self, ball: np.ndarray, rect: np.ndarray, t_impact: np.ndarray,
+                 kind: np.ndarray, contact_x: np.ndarray, contact_y: np.ndarray,
+                 normal_x: np.ndarray, normal_y: np.ndarray):
+        """Array version of CollisionInfo. Entry i describes the earliest impact
+        of ball[i], every ball appears at most once
+
+        Arguments:
+            ball {np.ndarray} -- Ball indices
+            rect {np.ndarray} -- Index of the rectangle each ball hits
+            t_impact {np.ndarray} -- Time of impact relative to x0, y0
+            kind {np.ndarray} -- KIND_X, KIND_Y or KIND_CORNER
+            contact_x {np.ndarray} -- X of the ball centre at impact
+            contact_y {np.ndarray} -- Y of the ball centre at impact
+            normal_x {np.ndarray} -- X of the corner normal (corner hits only)
+            normal_y {np.ndarray} -- Y of the corner normal (corner hits only)
+        """
+        self.ball = ball
+        self.rect = rect
+        self.t_impact = t_impact
+        self.kind = kind
+        self.contact_x = contact_x
+        self.contact_y = contact_y
+        self.normal_x = normal_x
+        self.normal_y = normal_y
+
+    def __len__(self) -> int:
+        return self.ball.size
+
+def _axis_contacts(p0: np.ndarray, v: np.ndarray, r: np.ndarray,
+                   lo: np.ndarray, hi: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Gets the contact coordinate and time on one axis for every pair. The
+    near face is picked from which side of the rectangle the ball started on
+
+    Returns:
+        tuple[np.ndarray, np.ndarray] -- Contact coordinate, time of contact
+        (-1 when the ball doesn't move on the axis)
+    """
+    contact = np.where(p0 < lo, lo - r, hi + r)
+    moving = v != 0
+    t = np.full(p0.shape, -1.0)
+    np.divide(contact - p0, v, out=t, where=moving)
+    return contact, t
+
+def _corner_impacts(x0: np.ndarray, y0: np.ndarray, dx: np.ndarray, dy: np.ndarray,
+                    r: np.ndarray, dt: np.ndarray, xc: np.ndarray, yc: np.ndarray,
+                    skip: np.ndarray) -> np.ndarray:
+    """Solves ‖(p0 + v·t) – corner‖^2 = r^2 for every pair and corner
+
+    Arguments:
+        x0, y0, dx, dy, r, dt {np.ndarray} -- Ball state per pair, shape (P,)
+        xc, yc {np.ndarray} -- Corner coordinates, shape (P, 4)
+        skip {np.ndarray} -- Corners that must be ignored, shape (P, 4)
+
+    Returns:
+        np.ndarray -- Earliest time in [0, dt] per pair and corner, inf if none
+    """
+    xn = x0[:, None] - xc
+    yn = y0[:, None] - yc
+    a = (dx * dx + dy * dy)[:, None]
+    b = 2 * (dx[:, None] * xn + dy[:, None] * yn)
+    c = xn * xn + yn * yn - (r * r)[:, None]
+    disc = b * b - 4 * a * c
+    solvable = (a != 0) & (disc >= 0)
+    sqrt_d = np.sqrt(np.where(solvable, disc, 0))
+    denom = np.where(a != 0, 2 * a, 1)
+    t1 = (-b - sqrt_d) / denom
+    t2 = (-b + sqrt_d) / denom
+
+    # Same zero-root handling as the scalar solver
+    dt2 = np.broadcast_to(dt[:, None], t1.shape)
+    t1_zero = np.abs(t1) <= 1e-13
+    t2_zero = ~t1_zero & (np.abs(t2) <= 1e-13)
+    t1 = np.where(t1_zero, dt2, t1)
+    t2 = np.where(t2_zero, dt2, t2)
+
+    t1 = np.where((t1 >= 0) & (t1 <= dt2), t1, np.inf)
+    t2 = np.where((t2 >= 0) & (t2 <= dt2), t2, np.inf)
+    t = np.minimum(t1, t2)
+    t[~solvable | skip] = np.inf
+    return t
+
+def batch_rect_collisions(balls: BallStore, ball_idx: np.ndarray, rect_idx: np.ndarray,
+                          rect_left: np.ndarray, rect_top: np.ndarray,
+                          rect_right: np.ndarray, rect_bottom: np.ndarray,
+                          dt, player_rect: int = -1) -> BatchCollisionInfo:
+    """Vectorized equivalent of CollisionManager._check_rect_collision over a
+    batch of candidate (ball, rectangle) pairs. Axis contact times and the
+    corner quadratics are solved for every pair at once and the earliest
+    impact of each ball is returned
+
+    Arguments:
+        balls {BallStore} -- Store holding the balls
+        ball_idx {np.ndarray} -- Ball index of every candidate pair
+        rect_idx {np.ndarray} -- Rectangle index of every candidate pair
+        rect_left, rect_top, rect_right, rect_bottom {np.ndarray} -- Rectangle
+        bounds, indexed by rectangle index
+        dt {float or np.ndarray} -- Change in time, per ball if an array
+
+    Keyword Arguments:
+        player_rect {int or np.ndarray} -- Index of the rectangle that is the
+        player, which only takes vertical hits, or a boolean mask over the
+        rectangle indices when there are several players (default: {-1})
+
+    Returns:
+        BatchCollisionInfo -- Earliest impact per ball that hits anything
+    """
+    x = balls.x[ball_idx]
+    y = balls.y[ball_idx]
+    r = balls.radius[ball_idx]
+    left = rect_left[rect_idx]
+    right = rect_right[rect_idx]
+    top = rect_top[rect_idx]
+    bot = rect_bottom[rect_idx]
+
+    # Only pairs that overlap at the end of the step can collide
+    overlap = (x + r >= left) & (x - r <= right) & (y + r >= top) & (y - r <= bot)
+    sel = np.flatnonzero(overlap)
+    ball_idx = ball_idx[sel]
+    rect_idx = rect_idx[sel]
+    r = r[sel]
+    left = left[sel]
+    right = right[sel]
+    top = top[sel]
+    bot = bot[sel]
+    x = x[sel]
+    x0 = balls.x0[ball_idx]
+    y0 = balls.y0[ball_idx]
+    dx = balls.dx[ball_idx]
+    dy = balls.dy[ball_idx]
+    if np.ndim(dt):
+        dt = np.asarray(dt, dtype=float)[ball_idx]
+    else:
+        dt = np.full(ball_idx.size, float(dt))
+
+    x_contact, dtx = _axis_contacts(x0, dx, r, left, right)
+    y_contact, dty = _axis_contacts(y0, dy, r, top, bot)
+
+    n = ball_idx.size
+    kind = np.full(n, KIND_CORNER, dtype=np.int8)
+    t = np.full(n, np.inf)
+    cx = np.zeros(n)
+    cy = np.zeros(n)
+
+    # Planar hits on blocks
+    in_time = ((dty >= 0) & (dty <= dt)) | ((dtx >= 0) & (dtx <= dt))
+    x_first = in_time & ((dty < 0) | ((dtx < dty) & (dtx >= 0)))
+    y_first = in_time & ~x_first & (dty >= 0)
+    y_at_dtx = y0 + dy * dtx
+    x_at_dty = x0 + dx * dty
+    is_x = x_first & (top <= y_at_dtx) & (y_at_dtx <= bot)
+    is_y = y_first & (left <= x_at_dty) & (x_at_dty <= right)
+
+    # The player only takes vertical hits, and any overlap counts as one
+    if np.ndim(player_rect):
+        is_player = player_rect[rect_idx]
+    else:
+        is_player = rect_idx == player_rect
+    if is_player.any():
+        player_sweep = (dty >= 0) & (((dtx >= 0) & (dty < dtx)) | (dtx < 0))
+        is_x &= ~is_player
+        is_y &= ~is_player
+        p = np.flatnonzero(is_player)
+        swept = player_sweep[p]
+        kind[p] = KIND_Y
+        t[p] = np.where(swept, dty[p], dt[p])
+        cx[p] = np.where(swept, x_at_dty[p], x[p])
+        cy[p] = np.where(swept, y_contact[p], top[p] - r[p])
+
+    kind[is_x] = KIND_X
+    t[is_x] = dtx[is_x]
+    cx[is_x] = x_contact[is_x]
+    cy[is_x] = y_at_dtx[is_x]
+    kind[is_y] = KIND_Y
+    t[is_y] = dty[is_y]
+    cx[is_y] = x_at_dty[is_y]
+    cy[is_y] = y_contact[is_y]
+
+    # Everything else is tried against the four corners
+    nx = np.zeros(n)
+    ny = np.zeros(n)
+    corner_x = np.zeros(n)
+    corner_y = np.zeros(n)
+    corner = np.flatnonzero(~(is_x | is_y | is_player))
+    if corner.size:
+        c_left = left[corner]
+        c_right = right[corner]
+        c_top = top[corner]
+        c_bot = bot[corner]
+        # top right, bottom right, top left, bottom left
+        xc = np.stack((c_right, c_right, c_left, c_left), axis=1)
+        yc = np.stack((c_top, c_bot, c_top, c_bot), axis=1)
+        b = ball_idx[corner]
+        # A corner that was just collided with can get triggered again by
+        # the collision iteration, so it is skipped
+        skip = (xc == balls.last_collision_x[b][:, None]) & (yc == balls.last_collision_y[b][:, None])
+        c_x0 = x0[corner]
+        c_y0 = y0[corner]
+        c_dx = dx[corner]
+        c_dy = dy[corner]
+        c_r = r[corner]
+        t_corner = _corner_impacts(c_x0, c_y0, c_dx, c_dy, c_r, dt[corner], xc, yc, skip)
+        best = np.argmin(t_corner, axis=1)
+        rows = np.arange(corner.size)
+        t_best = t_corner[rows, best]
+        hit_x = xc[rows, best]
+        hit_y = yc[rows, best]
+
+        # Normal from the corner to the centre at impact
+        t_safe = np.where(np.isfinite(t_best), t_best, 0)
+        ux = c_x0 + c_dx * t_safe - hit_x
+        uy = c_y0 + c_dy * t_safe - hit_y
+        length = np.hypot(ux, uy)
+        valid = np.isfinite(t_best) & (length > 0)
+        length[~valid] = 1
+        ux /= length
+        uy /= length
+
+        t[corner] = np.where(valid, t_best, np.inf)
+        nx[corner] = ux
+        ny[corner] = uy
+        corner_x[corner] = hit_x
+        corner_y[corner] = hit_y
+        cx[corner] = hit_x + ux * c_r
+        cy[corner] = hit_y + uy * c_r
+
+    # Earliest impact per ball
+    hit = np.flatnonzero(np.isfinite(t))
+    order = hit[np.lexsort((t[hit], ball_idx[hit]))]
+    sorted_balls = ball_idx[order]
+    first = np.ones(order.size, dtype=bool)
+    first[1:] = sorted_balls[1:] != sorted_balls[:-1]
+    pick = order[first]
+
+    if pick.size:
+        # Corner hits remember their corner so they aren't re-triggered
+        is_corner = kind[pick] == KIND_CORNER
+        corner_pick = pick[is_corner]
+        corner_balls = ball_idx[corner_pick]
+        balls.last_collision_x[corner_balls] = corner_x[corner_pick]
+        balls.last_collision_y[corner_balls] = corner_y[corner_pick]
+
+    return BatchCollisionInfo(ball_idx[pick], rect_idx[pick], t[pick], kind[pick],
+                              cx[pick], cy[pick], nx[pick], ny[pick])
+
+# Extra event kinds used by the continuous (time of impact) solver
+KIND_WALL_X = 3
+KIND_WALL_TOP = 4
+KIND_BOTTOM = 5
+
+def batch_swept_impacts(x: np.ndarray, y: np.ndarray, dx: np.ndarray, dy: np.ndarray,
+                        radius: np.ndarray, t_max: np.ndarray,
+                        ball_idx: np.ndarray, rect_idx: np.ndarray,
+                        rect_left: np.ndarray, rect_top: np.ndarray,
+                        rect_right: np.ndarray, rect_bottom: np.ndarray,
+                        player_rect: int = -1) -> BatchCollisionInfo:
+    """Exact time of impact of moving circles against rectangles, for a batch
+    of candidate pairs. Unlike batch_rect_collisions this sweeps from the
+    current position instead of testing the end position, so it can't tunnel
+    no matter how far the balls move. The first contact with a rectangle is
+    the earliest of its four face hits and its four corner hits
+
+    Arguments:
+        x, y, dx, dy, radius {np.ndarray} -- Ball state, indexed by ball index
+        t_max {np.ndarray} -- Time each ball has left, indexed by ball index
+        ball_idx {np.ndarray} -- Ball index of every candidate pair
+        rect_idx {np.ndarray} -- Rectangle index of every candidate pair
+        rect_left, rect_top, rect_right, rect_bottom {np.ndarray} -- Rectangle
+        bounds, indexed by rectangle index
+
+    Keyword Arguments:
+        player_rect {int} -- Index of the rectangle that is the player, which
+        can only be hit from above (default: {-1})
+
+    Returns:
+        BatchCollisionInfo -- Earliest impact per ball that hits anything
+        before its t_max. Contact is the ball centre at impact, the normal
+        points away from the rectangle
+    """
+    px = x[ball_idx]
+    py = y[ball_idx]
+    vx = dx[ball_idx]
+    vy = dy[ball_idx]
+    r = radius[ball_idx]
+    limit = t_max[ball_idx]
+    left = rect_left[rect_idx]
+    top = rect_top[rect_idx]
+    right = rect_right[rect_idx]
+    bot = rect_bottom[rect_idx]
+    n = ball_idx.size
+    is_player = rect_idx == player_rect
+
+    best_t = np.full(n, np.inf)
+    best_kind = np.full(n, KIND_CORNER, dtype=np.int8)
+    best_nx = np.zeros(n)
+    best_ny = np.zeros(n)
+
+    def take(t, valid, kind, nx, ny):
+        better = valid & (t >= 0) & (t <= limit) & (t < best_t)
+        best_t[better] = t[better]
+        best_kind[better] = kind
+        best_nx[better] = nx if np.ndim(nx) == 0 else nx[better]
+        best_ny[better] = ny if np.ndim(ny) == 0 else ny[better]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Face hits, only from outside the face and moving towards it
+        t = (left - r - px) / vx
+        y_at = py + vy * t
+        take(t, ~is_player & (vx > 0) & (px <= left - r) & (y_at >= top) & (y_at <= bot), KIND_X, -1.0, 0.0)
+        t = (right + r - px) / vx
+        y_at = py + vy * t
+        take(t, ~is_player & (vx < 0) & (px >= right + r) & (y_at >= top) & (y_at <= bot), KIND_X, 1.0, 0.0)
+        t = (top - r - py) / vy
+        x_at = px + vx * t
+        # The player only cares about vertical hits, its top corners count as
+        # part of its top face
+        reach = np.where(is_player, r, 0)
+        take(t, (vy > 0) & (py <= top - r) & (x_at >= left - reach) & (x_at <= right + reach), KIND_Y, 0.0, -1.0)
+        t = (bot + r - py) / vy
+        x_at = px + vx * t
+        take(t, ~is_player & (vy < 0) & (py >= bot + r) & (x_at >= left) & (x_at <= right), KIND_Y, 0.0, 1.0)
+
+        # Corner hits, the first root of ‖p + v·t – corner‖ = r while approaching
+        a = vx * vx + vy * vy
+        for xc, yc in ((right, top), (right, bot), (left, top), (left, bot)):
+            xn = px - xc
+            yn = py - yc
+            b = 2 * (vx * xn + vy * yn)
+            c = xn * xn + yn * yn - r * r
+            disc = b * b - 4 * a * c
+            t = (-b - np.sqrt(np.maximum(disc, 0))) / (2 * a)
+            valid = ~is_player & (a > 0) & (disc >= 0) & (b < 0)
+            cx = px + vx * t - xc
+            cy = py + vy * t - yc
+            length = np.hypot(cx, cy)
+            valid &= length > 0
+            length = np.where(valid, length, 1)
+            take(t, valid, KIND_CORNER, cx / length, cy / length)
+
+    hit = np.flatnonzero(np.isfinite(best_t))
+    order = hit[np.lexsort((best_t[hit], ball_idx[hit]))]
+    sorted_balls = ball_idx[order]
+    first = np.ones(order.size, dtype=bool)
+    first[1:] = sorted_balls[1:] != sorted_balls[:-1]
+    pick = order[first]
+    t = best_t[pick]
+    return BatchCollisionInfo(ball_idx[pick], rect_idx[pick], t, best_kind[pick],
+                              px[pick] + vx[pick] * t, py[pick] + vy[pick] * t,
+                              best_nx[pick], best_ny[pick])
+
+def batch_wall_impacts(x: np.ndarray, y: np.ndarray, dx: np.ndarray, dy: np.ndarray,
+                       radius: np.ndarray, width: float, height: float) -> tuple[np.ndarray, np.ndarray]:
+    """Time until every ball hits a side wall, the top wall or falls out of the
+    bottom of the screen
+
+    Arguments:
+        x, y, dx, dy, radius {np.ndarray} -- Ball state
+        width {float} -- Width of the screen
+        height {float} -- Height of the screen
+
+    Returns:
+        tuple[np.ndarray, np.ndarray] -- Time of the first wall event (inf if
+        the ball is not moving towards any), KIND_WALL_X, KIND_WALL_TOP or
+        KIND_BOTTOM
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_x = np.where(dx < 0, (radius - x) / dx, np.where(dx > 0, (width - radius - x) / dx, np.inf))
+        t_y = np.where(dy < 0, (radius - y) / dy, np.where(dy > 0, (height - radius - y) / dy, np.inf))
+    # Balls pushed slightly past a wall bounce straight away
+    t_x = np.maximum(t_x, 0)
+    t_y = np.maximum(t_y, 0)
+    kind_y = np.where(dy < 0, KIND_WALL_TOP, KIND_BOTTOM).astype(np.int8)
+    x_first = t_x < t_y
+    return np.where(x_first, t_x, t_y), np.where(x_first, KIND_WALL_X, kind_y).astype(np.int8)
+
+def swept_impact(x: float, y: float, dx: float, dy: float, radius: float,
+                 left: float, top: float, right: float, bottom: float,
+                 t_max: float, is_player: bool = False) -> tuple | None:
+    """Scalar version of batch_swept_impacts for a single ball and rectangle
+
+    Arguments:
+        x, y, dx, dy, radius {float} -- Ball state
+        left, top, right, bottom {float} -- Rectangle bounds
+        t_max {float} -- Time the ball has left
+
+    Keyword Arguments:
+        is_player {bool} -- Whether the rectangle is the player, which can only
+        be hit from above (default: {False})
+
+    Returns:
+        tuple | None -- (t_impact, kind, normal_x, normal_y) of the first
+        contact, or None if there isn't one within t_max
+    """
+    best = None
+    best_t = t_max
+    if dy > 0 and y <= top - radius:
+        t = (top - radius - y) / dy
+        x_at = x + dx * t
+        reach = radius if is_player else 0
+        if 0 <= t <= best_t and left - reach <= x_at <= right + reach:
+            best_t = t
+            best = (t, KIND_Y, 0.0, -1.0)
+    if is_player:
+        return best
+
+    if dx > 0 and x <= left - radius:
+        t = (left - radius - x) / dx
+        y_at = y + dy * t
+        if 0 <= t <= best_t and top <= y_at <= bottom:
+            best_t = t
+            best = (t, KIND_X, -1.0, 0.0)
+    elif dx < 0 and x >= right + radius:
+        t = (right + radius - x) / dx
+        y_at = y + dy * t
+        if 0 <= t <= best_t and top <= y_at <= bottom:
+            best_t = t
+            best = (t, KIND_X, 1.0, 0.0)
+    if dy < 0 and y >= bottom + radius:
+        t = (bottom + radius - y) / dy
+        x_at = x + dx * t
+        if 0 <= t <= best_t and left <= x_at <= right:
+            best_t = t
+            best = (t, KIND_Y, 0.0, 1.0)
+
+    a = dx * dx + dy * dy
+    if a == 0:
+        return best
+    for xc, yc in ((right, top), (right, bottom), (left, top), (left, bottom)):
+        xn = x - xc
+        yn = y - yc
+        b = 2 * (dx * xn + dy * yn)
+        if b >= 0:
+            continue
+        disc = b * b - 4 * a * (xn * xn + yn * yn - radius * radius)
+        if disc < 0:
+            continue
+        t = (-b - math.sqrt(disc)) / (2 * a)
+        if 0 <= t <= best_t:
+            cx = x + dx * t - xc
+            cy = y + dy * t - yc
+            length = math.hypot(cx, cy)
+            if length > 0:
+                best_t = t
+                best = (t, KIND_CORNER, cx / length, cy / length)
+    return best
+
+def wall_impact(x: float, y: float, dx: float, dy: float, radius: float,
+                width: float, height: float) -> tuple[float, int]:
+    """Scalar version of batch_wall_impacts
+
+    Arguments:
+        x, y, dx, dy, radius {float} -- Ball state
+        width {float} -- Width of the screen
+        height {float} -- Height of the screen
+
+    Returns:
+        tuple[float, int] -- Time of the first wall event and its kind
+    """
+    if dx < 0:
+        t_x = max((radius - x) / dx, 0)
+    elif dx > 0:
+        t_x = max((width - radius - x) / dx, 0)
+    else:
+        t_x = math.inf
+    if dy < 0:
+        t_y = max((radius - y) / dy, 0)
+        kind_y = KIND_WALL_TOP
+    elif dy > 0:
+        t_y = max((height - radius - y) / dy, 0)
+        kind_y = KIND_BOTTOM
+    else:
+        t_y = math.inf
+        kind_y = KIND_BOTTOM
+    if t_x < t_y:
+        return t_x, KIND_WALL_X
+    return t_y, kind_y
@@ -0,0 +1,55 @@
+from .breakout_block import BreakoutBlock
+from .broadphase import Broadphase, make_broadphase
+from ..constants import SCREEN_HEIGHT, SCREEN_WIDTH
+
+class StaticLevel:
+    def __init__(self, blocks: list[BreakoutBlock], collision_grid_shape: tuple[int]):
+        """The parts of a level that never change: the blocks, their edges and
+        corners, and a broadphase over them for every backend that gets asked
+        for. All of it is built once and shared read only by every collision
+        manager made from the level, each of which only keeps which blocks are
+        alive. Sharing stops at the process: with the forkserver and spawn
+        start methods every worker process builds its own level, shared by the
+        games in that process. The blocks must not be moved or resized once
+        the level exists
+
+        Arguments:
+            blocks {list[BreakoutBlock]} -- Blocks of the level
+            collision_grid_shape {tuple[int]} -- Shape of the collision grid (x, y)
+        """
+        self.blocks = list(blocks)
+        self.collision_grid_shape = collision_grid_shape
+        # Edges and corners of the blocks, looked up instead of recomputed on
+        # every check
+        self.edge_table = {}
+        self.corner_table = {}
+        for block in self.blocks:
+            left = block.left
+            top = block.top
+            right = left + block.width
+            bottom = top + block.height
+            self.edge_table[block] = (left, top, right, bottom)
+            self.corner_table[block] = ((right, top), (right, bottom), (left, top), (left, bottom))
+        # Built broadphase of every backend asked for so far, holding only the
+        # blocks
+        self._broadphases = {}
+
+    def get_broadphase(self, name: str) -> Broadphase:
+        """Gets a broadphase over the blocks that shares its static layer with
+        every other one of the same backend made from this level, see
+        Broadphase.share_static. The first call for a backend builds it
+
+        Arguments:
+            name {str} -- Name of the backend, see broadphase.BROADPHASES
+
+        Returns:
+            Broadphase -- Broadphase with every block registered and alive
+        """
+        broadphase = self._broadphases.get(name)
+        if broadphase is None:
+            broadphase = make_broadphase(name, self.collision_grid_shape, SCREEN_WIDTH, SCREEN_HEIGHT)
+            for block in self.blocks:
+                broadphase.add_static(block)
+            broadphase.build()
+            self._broadphases[name] = broadphase
+        return broadphase.share_static()
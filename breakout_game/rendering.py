@@ -0,0 +1,129 @@
+import pygame
+from .constants import SCREEN_WIDTH, SCREEN_HEIGHT
+from .objects.ball_store import BallStore
+
+# Everything that needs pygame lives in this module, so the simulation itself
+# can run without ever importing it
+
+BALL_COLOR = pygame.Color(0, 255, 0)
+BLOCK_COLOR = pygame.Color(255, 0, 0)
+PLAYER_COLOR = pygame.Color(0, 0, 255)
+BACKGROUND_COLOR = pygame.Color("white")
+
+def init_display() -> pygame.Surface:
+    """Initializes pygame and opens the game window
+
+    Returns:
+        pygame.Surface -- Surface of the window
+    """
+    pygame.init()
+    return pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+
+def make_clock() -> pygame.time.Clock:
+    """Creates a clock for limiting the frame rate
+
+    Returns:
+        pygame.time.Clock -- Clock
+    """
+    pygame.init()
+    return pygame.time.Clock()
+
+def draw_rectangle(surface: pygame.Surface, left: float, top: float, width: float,
+                   height: float, color: pygame.Color = BLOCK_COLOR):
+    """Draws a rectangle to the surface
+
+    Arguments:
+        surface {pygame.Surface} -- Surface to draw to
+        left {float} -- Left coordinate
+        top {float} -- Top coordinate
+        width {float} -- Width
+        height {float} -- Height
+
+    Keyword Arguments:
+        color {pygame.Color} -- Fill color (default: {BLOCK_COLOR})
+    """
+    pygame.draw.rect(surface, color, pygame.Rect(left, top, width, height))
+
+def draw_ball(surface: pygame.Surface, x: float, y: float, radius: float):
+    """Draws a ball to the surface
+
+    Arguments:
+        surface {pygame.Surface} -- Surface to draw to
+        x {float} -- X pos
+        y {float} -- Y pos
+        radius {float} -- Radius of the ball
+    """
+    pygame.draw.circle(surface, BALL_COLOR, (x, y), radius)
+
+def draw_game(surface: pygame.Surface, game):
+    """Draws every object of a game and puts the frame on screen
+
+    Arguments:
+        surface {pygame.Surface} -- Surface to draw to
+        game {BreakoutGame} -- Game to draw
+    """
+    draw_frame(surface, game)
+
+    # flip() the display to put your work on screen
+    pygame.display.flip()
+
+def draw_frame(surface: pygame.Surface, game):
+    """Draws every object of a game without touching the display
+
+    Arguments:
+        surface {pygame.Surface} -- Surface to draw to
+        game {BreakoutGame} -- Game to draw
+    """
+    # fill the screen with a color to wipe away anything from last frame
+    surface.fill(BACKGROUND_COLOR)
+
+    for block in game.blocks:
+        block.draw(surface)
+
+    game.player.draw(surface)
+
+    if isinstance(game.balls, BallStore):
+        game.balls.draw(surface)
+    else:
+        for ball in game.balls:
+            ball.draw(surface)
+
+def save_frame(game, path: str):
+    """Draws a game to an image file, without needing a window
+
+    Arguments:
+        game {BreakoutGame} -- Game to draw
+        path {str} -- Image file to write, the format follows the extension
+    """
+    surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    draw_frame(surface, game)
+    pygame.image.save(surface, path)
+
+def quit_requested() -> bool:
+    """Polls the window events
+
+    Returns:
+        bool -- Whether the user closed the window
+    """
+    # pygame.QUIT event means the user clicked X to close your window
+    quit_event = False
+    for event in pygame.event.get():
+        if event.type == pygame.QUIT:
+            quit_event = True
+    return quit_event
+
+def read_keyboard_action() -> int:
+    """Reads the player action from the keyboard
+
+    Returns:
+        int -- 0 to stay, 1 to move left or 2 to move right
+    """
+    keys = pygame.key.get_pressed()
+    if keys[pygame.K_a] or keys[pygame.K_LEFT]:
+        return 1
+    elif keys[pygame.K_d] or keys[pygame.K_RIGHT]:
+        return 2
+    return 0
+
+def close():
+    pygame.quit()
@@ -2,17 +2,62 @@ import gymnasium as gym
 import numpy as np
 import math
 from gymnasium import spaces
-from breakout_game import SCREEN_WIDTH, SCREEN_HEIGHT, BreakoutGame, BreakoutBall, BreakoutBlock, BreakoutPlayer, CollisionManager
+from breakout_game import SCREEN_WIDTH, SCREEN_HEIGHT, BreakoutGame, BreakoutBall, BreakoutBlock, BreakoutPlayer, CollisionManager, StaticLevel, StepResults, LevelGenerator
 
 class BreakoutEnv(gym.Env):
-    def __init__(self, display_graphics: bool = False):
+    # Every environment plays the same layout, so its blocks and broadphase
+    # are built by the first one in the process and shared by the rest
+    _static_level = None
+
+    def __init__(self, display_graphics: bool = False, macro_step: bool = False,
+                 decision_height: float = SCREEN_HEIGHT / 4, frame_skip: int | tuple[int, int] = 1,
+                 observe_blocks: bool = False, random_levels: bool = False):
+        """Gymnasium environment for the breakout game
+
+        Keyword Arguments:
+            display_graphics {bool} -- Whether to draw the game (default: {False})
+            macro_step {bool} -- Whether each step skips ahead to the next
+            point where the action can matter, instead of running a single
+            game step. The skipped game steps still count towards the step
+            limit (default: {False})
+            decision_height {float} -- Height of the band above the paddle in
+            which a ball needs the agent's attention, only used with
+            macro_step (default: {SCREEN_HEIGHT / 4})
+            frame_skip {int | tuple[int, int]} -- Number of times each action
+            is repeated, or the inclusive (low, high) range it is drawn from
+            every step. Rewards of the repeats are summed and repeating stops
+            as soon as the episode ends (default: {1})
+            observe_blocks {bool} -- Whether the observation also holds a 1
+            for every live block and a 0 for every destroyed one, in layout
+            order, written by the collision manager only when a block is
+            destroyed (default: {False})
+            random_levels {bool} -- Whether every episode plays a generated
+            level, a random subset of the blocks with the ball served at a
+            random speed and angle. The seed given to reset picks the
+            sequence of levels that follows (default: {False})
+
+        The info returned by step holds the number of game steps run and
+        whether the game was won. The observations returned by step are
+        reused arrays that get overwritten by the next step, except that the
+        last observation of an episode stays valid through the following
+        reset. Copy them to keep them
+        """
         super().__init__()
+        self.macro_step = macro_step
+        self.decision_height = decision_height
+        if isinstance(frame_skip, int):
+            frame_skip = (frame_skip, frame_skip)
+        if frame_skip[0] < 1 or frame_skip[1] < frame_skip[0]:
+            raise Exception("The frame skip must be at least 1")
+        self.frame_skip = frame_skip
+        # Reused by every non macro step
+        self._step_results = StepResults(frame_skip[1])
 
         # Observe the following:
         #   x position of the paddle,
         #   last ball collision x of the player
         #   x, y position of ball,
-        #   ball dx/dy, and TODO: Add every position of the Breakout blocks.
+        #   ball dx/dy, and optionally whether every block is still alive.
         # We'll normalize observations (positions -> [0,1], velocities -> [-1,1])
         self.ball_start_speed = 200
         low_bounds = np.array([0.0, 0.0, 0.0, 0.0, -1.0, -1.0], dtype=np.float32)
@@ -26,8 +71,29 @@ class BreakoutEnv(gym.Env):
         # approximately a minute
         self.step_limit = 10000
         self.simulation_state = self._setup_simulation(display_graphics)
+        self.observe_blocks = observe_blocks
+        if observe_blocks:
+            self.observation_space = spaces.Box(low=np.append(low_bounds, np.zeros(self.total_blocks, dtype=np.float32)),
+                                                high=np.append(high_bounds, np.ones(self.total_blocks, dtype=np.float32)),
+                                                dtype=np.float32)
+        # Each episode writes into one of two arrays, swapped on reset so that
+        # the last observation of an episode isn't overwritten by the reset
+        # that comes right after it, as in vectorized envs
+        self._observations = np.zeros((2,) + self.observation_space.shape, dtype=np.float32)
+        self._buffer_index = 0
+        self._observation = self._observations[0]
+        if observe_blocks:
+            # Only changes when a block is destroyed or the game is reset
+            self.simulation_state.collision_manager.track_block_state(self._observation[6:])
+        # Levels are generated ahead of time on a background thread
+        self.levels = LevelGenerator(self.simulation_state) if random_levels else None
         # maximum expected ball speed for velocity normalization
         self._max_ball_speed = 800.0
+        # Normalization constants of _get_observation
+        self._half_paddle_width = self.simulation_state.player.width / 2
+        self._width_scale = float(SCREEN_WIDTH)
+        self._height_scale = float(SCREEN_HEIGHT)
+        self._speed_scale = max(self._max_ball_speed, 1.0)
 
     def _setup_simulation(self, display_graphics: bool = False):
         set_dt = 0.008
@@ -40,7 +106,6 @@ class BreakoutEnv(gym.Env):
         dx = (SCREEN_WIDTH - (block_cols * block_width)) / (block_cols + 1)
         dx_width = dx + block_width
         dy = block_height + 30
-        blocks = [BreakoutBlock(dy + y * dy, dx + x * dx_width, block_width, block_height) for x in range(block_cols) for y in range(block_rows)]
 
         player_width = 100
         player_height = 5
@@ -57,9 +122,15 @@ class BreakoutEnv(gym.Env):
         balls = [BreakoutBall(ball_x, ball_y, ball_dx, ball_dy, ball_radius)]
 
         collision_grid_shape = (math.ceil(SCREEN_WIDTH / (ball_radius * 2)), math.ceil(SCREEN_HEIGHT / (ball_radius * 2)))
-        collision_manager = CollisionManager(player, balls, blocks, collision_grid_shape)
-
-        game = BreakoutGame(False, blocks, balls, player, collision_manager, set_dt=set_dt)
+        level = BreakoutEnv._static_level
+        if level is None:
+            blocks = [BreakoutBlock(dy + y * dy, dx + x * dx_width, block_width, block_height) for x in range(block_cols) for y in range(block_rows)]
+            level = BreakoutEnv._static_level = StaticLevel(blocks, collision_grid_shape)
+        # Fast forwarding relies on exact time of impact collisions
+        collision_manager = CollisionManager(player, balls, level, collision_grid_shape,
+                                             continuous=self.macro_step)
+
+        game = BreakoutGame(False, level.blocks, balls, player, collision_manager, set_dt=set_dt)
         if display_graphics:
             game.display_graphics = True
             game.fps_limit = 120
@@ -72,69 +143,91 @@ class BreakoutEnv(gym.Env):
     def reset(self, seed=None, options=None):
         super().reset(seed=seed)
 
-        display_graphics = self.simulation_state.display_graphics
-        self.simulation_state = self._setup_simulation(display_graphics)
+        self._buffer_index = 1 - self._buffer_index
+        self._observation = self._observations[self._buffer_index]
+        if self.observe_blocks:
+            self.simulation_state.collision_manager.track_block_state(self._observation[6:])
+
+        # The game is built once and put back to its starting state, or the
+        # starting state of a generated level, in place
+        if self.levels is not None:
+            if seed is not None:
+                self.levels.seed(seed)
+            level = self.levels.get()
+            self.simulation_state.restore(level.state)
+        else:
+            self.simulation_state.reset()
         observation = self._get_observation()
         info = {}
         return observation, info
 
-    def step(self, action: int):
-        self.simulation_state.run_step(action)
-        observation = self._get_observation()
-        reward = self._calculate_reward()
-        terminated = self._is_terminated()
-        truncated = self._is_truncated()
-        info = {}
-
-        return observation, reward, terminated, truncated, info
+    def _get_repeats(self) -> int:
+        low, high = self.frame_skip
+        if low == high:
+            return low
+        return int(self.np_random.integers(low, high + 1))
 
-    def _get_observation(self):
-        paddle_x = float(self.simulation_state.player.left + self.simulation_state.player.width / 2)
-        last_x_hit = float(self.simulation_state.player.last_left_collision + self.simulation_state.player.width / 2)
-        ball_x = 0.0
-        ball_y = 0.0
-        ball_dx = 0.0
-        ball_dy = 0.0
-        if len(self.simulation_state.balls) > 0:
-            b = self.simulation_state.balls[0]
-            ball_x = float(b.x)
-            ball_y = float(b.y)
-            ball_dx = float(b.dx)
-            ball_dy = float(b.dy)
-
-        # Normalize positions to [0,1], velocities to [-1,1]
-        norm_paddle_x = paddle_x / float(SCREEN_WIDTH)
-        norm_last_x_hit = last_x_hit / float(SCREEN_WIDTH)
-        norm_ball_x = ball_x / float(SCREEN_WIDTH)
-        norm_ball_y = ball_y / float(SCREEN_HEIGHT)
-        maxs = max(self._max_ball_speed, 1.0)
-        norm_dx = ball_dx / maxs
-        norm_dy = ball_dy / maxs
-
-        return np.array([norm_paddle_x, norm_last_x_hit, norm_ball_x, norm_ball_y, norm_dx, norm_dy], dtype=np.float32)
-
-    def _calculate_reward(self):
-        # Reward for breaking blocks
-        broken_blocks = self.simulation_state.last_steps_block_count - len(self.simulation_state.blocks)
-        reward = float(broken_blocks * 2)
-
-        # Small negative per-step penalty to discourage inaction
-        reward += -0.001
-        # Penalize distance between paddle center and ball x (encourages tracking)
-        # if len(self.simulation_state.balls) > 0:
-        #     paddle_center = self.simulation_state.player.left + self.simulation_state.player.width / 2
-        #     ball_x = self.simulation_state.balls[0].x
-        #     dist = abs(paddle_center - ball_x)
-        #     reward += -0.0005 * dist
+    def step(self, action: int):
+        game = self.simulation_state
+        block_count = len(game.blocks)
+        repeats = self._get_repeats()
+        if self.macro_step:
+            steps = 0
+            for _ in range(repeats):
+                game.run_step(action)
+                steps += 1
+                if not self._is_terminated():
+                    steps += game.fast_forward(self.step_limit - game.game_step, self.decision_height)
+                if self._is_terminated() or self._is_truncated():
+                    break
+        elif repeats == 1:
+            game.run_step(action)
+            steps = 1
+        else:
+            # The reward is linear in the blocks broken and steps taken, so the
+            # repeats only need to be summed up once at the end
+            repeats = max(min(repeats, self.step_limit - game.game_step), 1)
+            steps = game.run_steps(repeats, action, self._step_results).steps
+
+        # Reward and end of episode checks in a single pass over the game,
+        # matching _is_terminated and _is_truncated. Breaking blocks is
+        # rewarded, with a small negative per-step penalty to discourage
+        # inaction
+        game_over = game.game_over
+        game_win = game.game_win
+        reward = float((block_count - len(game.blocks)) * 2) + -0.001 * steps
         # TODO try one last reward of whenever the ball hits the paddle
 
         # Terminal rewards
-        if self.simulation_state.game_over:
+        if game_over:
             reward += -20.0
-        elif self.simulation_state.game_win:
+        elif game_win:
             reward += 20.0
 
-        return reward
+        return (self._get_observation(), reward, game_over or game_win,
+                game.game_step >= self.step_limit, {"steps": steps, "game_win": game_win})
+
+    def _get_observation(self):
+        """Writes the normalized observation into the reused observation array,
+        positions to [0,1] and velocities to [-1,1]
+        """
+        game = self.simulation_state
+        player = game.player
+        observation = self._observation
+        width = self._width_scale
+        observation[0] = (player.left + self._half_paddle_width) / width
+        observation[1] = (player.last_left_collision + self._half_paddle_width) / width
+        balls = game.balls
+        if len(balls) > 0:
+            b = balls[0]
+            speed = self._speed_scale
+            observation[2] = b.x / width
+            observation[3] = b.y / self._height_scale
+            observation[4] = b.dx / speed
+            observation[5] = b.dy / speed
+        else:
+            observation[2:6] = 0.0
+        return observation
 
     def _is_terminated(self):
         return self.simulation_state.game_over or self.simulation_state.game_win
@@ -144,4 +237,6 @@ class BreakoutEnv(gym.Env):
         return self.simulation_state.game_step >= self.step_limit
 
     def close(self):
+        if self.levels is not None:
+            self.levels.close()
         self.simulation_state.close()
\ No newline at end of file
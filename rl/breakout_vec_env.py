@@ -0,0 +1,297 @@
+import numpy as np
+import math
+from stable_baselines3.common.vec_env import VecEnv
+from breakout_game import SCREEN_WIDTH, SCREEN_HEIGHT, BallStore
+from breakout_game.objects.narrowphase import batch_rect_collisions, KIND_X, KIND_Y, KIND_CORNER
+from .breakout_environment import BreakoutEnv
+
+class BreakoutVecEnv(VecEnv):
+    def __init__(self, num_envs: int, max_iterations: int = 8):
+        """Steps many breakout games at once. Instead of a BreakoutGame per
+        environment, the state of every game lives in shared arrays: one row
+        per game for the paddle and ball, and an alive mask over a shared block
+        layout. Paddles, balls, collisions, rewards and resets of all games are
+        each done in a handful of vectorized operations.
+
+        Every game follows the same rules and layout as BreakoutEnv, with the
+        ball of game i at index i of a BallStore and the rectangles numbered
+        game * num_blocks + block for blocks followed by one paddle per game.
+        Given the same actions, game i gives bit for bit the observations,
+        rewards and dones of a BreakoutEnv
+
+        Arguments:
+            num_envs {int} -- Number of games
+
+        Keyword Arguments:
+            max_iterations {int} -- Maximum number of collisions handled per
+            ball in a single step (default: {8})
+        """
+        template = BreakoutEnv()
+        game = template.simulation_state
+        self.render_mode = None
+        super().__init__(num_envs, template.observation_space, template.action_space)
+        self.dt = game.set_dt
+        self.step_limit = template.step_limit
+        self.max_iterations = max_iterations
+        self._max_ball_speed = template._max_ball_speed
+
+        # Layout shared by every game
+        blocks = list(game.blocks)
+        self.num_blocks = len(blocks)
+        block_left = np.array([block.left for block in blocks], dtype=float)
+        block_top = np.array([block.top for block in blocks], dtype=float)
+        block_right = block_left + [block.width for block in blocks]
+        block_bottom = block_top + [block.height for block in blocks]
+        player = game.player
+        self.paddle_top = float(player.top)
+        self.paddle_width = float(player.width)
+        self.paddle_height = float(player.height)
+        self.paddle_speed = float(player.speed)
+        self._start_paddle_left = float(player.left)
+        ball = game.balls[0]
+        self._start_ball = (ball.x, ball.y, ball.dx, ball.dy)
+
+        n = num_envs
+        num_rects = n * self.num_blocks
+        self._first_paddle = num_rects
+        self.rect_left = np.concatenate((np.tile(block_left, n), np.zeros(n)))
+        self.rect_top = np.concatenate((np.tile(block_top, n), np.full(n, self.paddle_top)))
+        self.rect_right = np.concatenate((np.tile(block_right, n), np.zeros(n)))
+        self.rect_bottom = np.concatenate((np.tile(block_bottom, n),
+                                           np.full(n, self.paddle_top + self.paddle_height)))
+        self.rect_is_paddle = np.arange(num_rects + n) >= num_rects
+        self._block_left = block_left
+        self._block_top = block_top
+        self._block_right = block_right
+        self._block_bottom = block_bottom
+
+        # Per game state
+        self.balls = BallStore.from_arrays(np.zeros(n), np.zeros(n), np.zeros(n), np.zeros(n), ball.radius)
+        self.block_alive = np.ones((n, self.num_blocks), dtype=bool)
+        self.block_count = np.full(n, self.num_blocks)
+        self.paddle_left = np.zeros(n)
+        self.last_left_collision = np.zeros(n)
+        self.collisions = np.zeros(n, dtype=np.int64)
+        self.game_step = np.zeros(n, dtype=np.int64)
+        # Whether the ball of a game is gone, which only happens when the
+        # ball leaves the screen while moving
+        self.ball_removed = np.zeros(n, dtype=bool)
+        self._actions = np.zeros(n, dtype=np.int64)
+        self._observations = np.zeros((n,) + self.observation_space.shape, dtype=np.float32)
+        self._reset_games(np.arange(n))
+
+    def _reset_games(self, games: np.ndarray):
+        balls = self.balls
+        x, y, dx, dy = self._start_ball
+        balls.x[games] = x
+        balls.y[games] = y
+        balls.x0[games] = x
+        balls.y0[games] = y
+        balls.dx[games] = dx
+        balls.dy[games] = dy
+        balls.dead[games] = False
+        balls.last_collision_x[games] = -1
+        balls.last_collision_y[games] = -1
+        self.block_alive[games] = True
+        self.block_count[games] = self.num_blocks
+        self.paddle_left[games] = self._start_paddle_left
+        self.last_left_collision[games] = self._start_paddle_left
+        self.collisions[games] = 0
+        self.game_step[games] = 0
+        self.ball_removed[games] = False
+
+    def reset(self) -> np.ndarray:
+        self._reset_games(np.arange(self.num_envs))
+        self.reset_infos = [{} for _ in range(self.num_envs)]
+        return self._get_observations().copy()
+
+    def step_async(self, actions: np.ndarray):
+        self._actions[:] = np.asarray(actions).reshape(-1)
+
+    def step_wait(self):
+        n = self.num_envs
+        dt = self.dt
+        balls = self.balls
+
+        # Paddles, which only get clamped when they move
+        direction = np.array([0.0, -1.0, 1.0])[self._actions]
+        moving = direction != 0
+        left = self.paddle_left + self.paddle_speed * direction * dt
+        left = np.where(left <= 0, 0.0, np.where(left >= SCREEN_WIDTH - self.paddle_width,
+                                                 SCREEN_WIDTH - self.paddle_width, left))
+        self.paddle_left = np.where(moving, left, self.paddle_left)
+
+        # Balls, then the end of game checks and collisions like BreakoutGame.run_updates
+        balls.enforce_min_velocity()
+        balls.update(dt)
+        game_over = balls.dead[:n].copy()
+        self.ball_removed[:] = game_over
+        game_win = self.block_count == 0
+        last_block_count = self.block_count.copy()
+        self._handle_collisions(dt)
+
+        self.game_step += 1
+        broken_blocks = last_block_count - self.block_count
+        rewards = (broken_blocks * 2 - 0.001).astype(np.float32)
+        rewards[game_over] += -20.0
+        rewards[game_win & ~game_over] += 20.0
+        terminated = game_over | game_win
+        truncated = self.game_step >= self.step_limit
+        dones = terminated | truncated
+
+        observations = self._get_observations()
+        infos = [{} for _ in range(n)]
+        done_games = np.flatnonzero(dones)
+        if done_games.size:
+            for i in done_games.tolist():
+                infos[i]["terminal_observation"] = observations[i].copy()
+                infos[i]["TimeLimit.truncated"] = bool(truncated[i] and not terminated[i])
+                infos[i]["game_win"] = bool(game_win[i] and not game_over[i])
+            self._reset_games(done_games)
+            observations = self._get_observations()
+        return observations.copy(), rewards, dones, infos
+
+    def _handle_collisions(self, dt: float):
+        """Batched CollisionManager._handle_ball_store_collisions over every
+        game, with every ball only checked against its own game's blocks and
+        paddle
+
+        Arguments:
+            dt {float} -- Change in time
+        """
+        n = self.num_envs
+        balls = self.balls
+        num_blocks = self.num_blocks
+        first_paddle = self._first_paddle
+        self.rect_left[first_paddle:] = self.paddle_left
+        self.rect_right[first_paddle:] = self.paddle_left + self.paddle_width
+
+        active = np.flatnonzero(~balls.dead[:n])
+        time_left = np.full(n, float(dt))
+        for _ in range(self.max_iterations):
+            if active.size == 0:
+                break
+            x = balls.x[active]
+            y = balls.y[active]
+            r = balls.radius[active]
+            # Live blocks of the same game that overlap the ball
+            near = ((x + r)[:, None] >= self._block_left) & ((x - r)[:, None] <= self._block_right) & \
+                   ((y + r)[:, None] >= self._block_top) & ((y - r)[:, None] <= self._block_bottom)
+            near &= self.block_alive[active]
+            pair_balls, pair_blocks = np.nonzero(near)
+            pair_rects = active[pair_balls] * num_blocks + pair_blocks
+            paddle_rects = first_paddle + active
+            on_paddle = np.flatnonzero((x + r >= self.rect_left[paddle_rects]) &
+                                       (x - r <= self.rect_right[paddle_rects]) &
+                                       (y + r >= self.paddle_top) &
+                                       (y - r <= self.paddle_top + self.paddle_height))
+            ball_idx = np.concatenate((active[pair_balls], active[on_paddle]))
+            rect_idx = np.concatenate((pair_rects, paddle_rects[on_paddle]))
+            if ball_idx.size == 0:
+                break
+            impacts = batch_rect_collisions(balls, ball_idx, rect_idx,
+                                            self.rect_left, self.rect_top,
+                                            self.rect_right, self.rect_bottom,
+                                            time_left, self.rect_is_paddle)
+            if len(impacts) == 0:
+                break
+            self._apply_responses(impacts)
+            remaining = time_left[impacts.ball] - impacts.t_impact
+            balls._update_slice(impacts.ball, remaining)
+            time_left[impacts.ball] = remaining
+            active = impacts.ball[remaining > 0]
+
+    def _apply_responses(self, impacts):
+        """Batched CollisionManager._apply_batch_responses, where every game
+        has its own paddle
+
+        Arguments:
+            impacts {BatchCollisionInfo} -- Impacts to apply
+        """
+        balls = self.balls
+        b = impacts.ball
+        balls.x[b] = impacts.contact_x
+        balls.y[b] = impacts.contact_y
+        dx = balls.dx[b]
+        dy = balls.dy[b]
+
+        # Planar hits bounce away from the side the ball came from
+        is_x = impacts.kind == KIND_X
+        dx = np.where(is_x, np.where(balls.x0[b] < impacts.contact_x, -np.abs(dx), np.abs(dx)), dx)
+        is_paddle = self.rect_is_paddle[impacts.rect]
+        is_y = (impacts.kind == KIND_Y) & ~is_paddle
+        dy = np.where(is_y, np.where(balls.y0[b] < impacts.contact_y, -np.abs(dy), np.abs(dy)), dy)
+
+        # Corner and paddle hits keep the speed and change the direction. They
+        # are rare, so they go through the same math functions as
+        # BreakoutGame, whose rounding numpy's vectorized atan2 and hypot
+        # don't always match
+        is_corner = impacts.kind == KIND_CORNER
+        speed = np.zeros(len(b))
+        for i in np.flatnonzero(is_corner | is_paddle).tolist():
+            speed[i] = math.hypot(dx[i], dy[i])
+        # Corner hits mirror the incoming direction around the corner normal
+        for i in np.flatnonzero(is_corner).tolist():
+            angle = math.atan2(impacts.normal_y[i], impacts.normal_x[i])
+            ball_angle = math.atan2(dy[i], dx[i]) + math.pi
+            new_angle = angle + (angle - ball_angle)
+            dx[i] = math.cos(new_angle) * speed[i]
+            dy[i] = math.sin(new_angle) * speed[i]
+
+        # Paddle hits send the ball off at an angle set by where it landed
+        if is_paddle.any():
+            paddle_left = self.paddle_left[b]
+            rel_x = impacts.contact_x - (paddle_left + self.paddle_width / 2)
+            x_scalar = rel_x / (self.paddle_width / 2)
+            new_angle = (-math.pi / 2) + (math.pi / 4) * x_scalar
+            dx = np.where(is_paddle, np.cos(new_angle) * speed, dx)
+            dy = np.where(is_paddle, np.sin(new_angle) * speed, dy)
+            hit_games = b[is_paddle]
+            self.collisions[hit_games] += 1
+            self.last_left_collision[hit_games] = self.paddle_left[hit_games]
+
+        balls.dx[b] = dx
+        balls.dy[b] = dy
+
+        hit_blocks = impacts.rect[~is_paddle]
+        self.block_alive.reshape(-1)[hit_blocks] = False
+        np.subtract.at(self.block_count, hit_blocks // self.num_blocks, 1)
+
+    def _get_observations(self) -> np.ndarray:
+        """Vectorized BreakoutEnv._get_observation, written into a reused array
+
+        Returns:
+            np.ndarray -- Observation of every game
+        """
+        n = self.num_envs
+        balls = self.balls
+        obs = self._observations
+        half_width = self.paddle_width / 2
+        maxs = max(self._max_ball_speed, 1.0)
+        # BreakoutGame removes a ball that dies while moving, leaving zeros,
+        # but one that dies bouncing off something is only removed on the
+        # next step, until then it is observed where it is
+        alive = ~self.ball_removed
+        obs[:, 0] = (self.paddle_left + half_width) / float(SCREEN_WIDTH)
+        obs[:, 1] = (self.last_left_collision + half_width) / float(SCREEN_WIDTH)
+        obs[:, 2] = np.where(alive, balls.x[:n], 0.0) / float(SCREEN_WIDTH)
+        obs[:, 3] = np.where(alive, balls.y[:n], 0.0) / float(SCREEN_HEIGHT)
+        obs[:, 4] = np.where(alive, balls.dx[:n], 0.0) / maxs
+        obs[:, 5] = np.where(alive, balls.dy[:n], 0.0) / maxs
+        return obs
+
+    def close(self):
+        pass
+
+    def get_attr(self, attr_name: str, indices=None) -> list:
+        return [getattr(self, attr_name)] * len(self._get_indices(indices))
+
+    def set_attr(self, attr_name: str, value, indices=None):
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name: str, *method_args, indices=None, **method_kwargs) -> list:
+        method = getattr(self, method_name)
+        return [method(*method_args, **method_kwargs) for _ in self._get_indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None) -> list:
+        return [False] * len(self._get_indices(indices))
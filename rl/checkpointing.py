@@ -0,0 +1,238 @@
+import io
+import json
+import os
+import pickle
+import queue
+import threading
+import warnings
+import multiprocessing as mp
+from stable_baselines3.common.callbacks import BaseCallback
+from stable_baselines3.common.vec_env import DummyVecEnv, VecNormalize
+from .breakout_environment import BreakoutEnv
+from .evaluation import episodes_vary, run_evaluation
+
+def _write_atomic(path: str, data: bytes):
+    # Written under a temporary name so readers never see half written files
+    with open(path + ".tmp", "wb") as file:
+        file.write(data)
+    os.replace(path + ".tmp", path)
+
+def _evaluation_worker(tasks, results, model_class, num_episodes: int, num_envs: int,
+                       env_kwargs: dict, deterministic: bool):
+    """Evaluates the checkpoints it is sent, one at a time, until it gets None"""
+    env = DummyVecEnv([lambda: BreakoutEnv(**env_kwargs)] * num_envs)
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            step, model_path, normalize_path = task
+            model = model_class.load(model_path, device="cpu")
+            eval_env = env
+            if normalize_path is not None:
+                eval_env = VecNormalize.load(normalize_path, env)
+                eval_env.training = False
+                eval_env.norm_reward = False
+            evaluation = run_evaluation(model, eval_env, num_episodes, deterministic, seed=0)
+            # The per episode arrays stay here, only the summary goes back
+            results.put((step, {key: value for key, value in evaluation.items()
+                                if key not in ("rewards", "lengths", "wins")}))
+    finally:
+        env.close()
+
+class AsyncEvalCheckpointCallback(BaseCallback):
+    def __init__(self, save_path: str, save_freq: int = 500000, keep_best: int = 3,
+                 num_episodes: int = 100, num_envs: int = 16, env_kwargs: dict = None,
+                 deterministic: bool = False, max_pending: int = 2, start_method: str = None,
+                 verbose: int = 0):
+        """Checkpoints and evaluates the model while it trains, without
+        stalling rollout collection. Every save_freq steps the learner only
+        serializes the model and its VecNormalize statistics to memory. A
+        background thread writes them to disk atomically, and a separate
+        process evaluates them and reports back. Results are logged under
+        eval/ as they arrive, and only the keep_best checkpoints with the
+        highest mean reward are kept, listed in best.json
+
+        Every snapshot is written. If the evaluator falls max_pending
+        snapshots behind, the evaluation of new ones is skipped instead of
+        waited for, and only the latest snapshot that wasn't evaluated is kept
+        on disk next to the best ones
+
+        Arguments:
+            save_path {str} -- Directory to write the checkpoints to
+
+        Keyword Arguments:
+            save_freq {int} -- Steps, over all environments, between snapshots
+            (default: {500000})
+            keep_best {int} -- Number of checkpoints kept (default: {3})
+            num_episodes {int} -- Episodes per evaluation (default: {100})
+            num_envs {int} -- Environments the evaluation plays at once
+            (default: {16})
+            env_kwargs {dict} -- Keyword arguments for every evaluation
+            BreakoutEnv (default: {None})
+            deterministic {bool} -- Whether the model always takes its best
+            known action during evaluation, otherwise actions are sampled.
+            When evaluation episodes can't differ, see episodes_vary, each
+            evaluation plays a single episode (default: {False})
+            max_pending {int} -- Number of snapshots that can wait to be
+            evaluated (default: {2})
+            start_method {str} -- multiprocessing start method of the
+            evaluation process, forkserver when available and spawn otherwise
+            (default: {None})
+            verbose {int} -- Whether to print evaluation results (default: {0})
+        """
+        super().__init__(verbose)
+        self.save_path = save_path
+        self.save_freq = save_freq
+        self.keep_best = keep_best
+        self.num_episodes = num_episodes
+        self.num_envs = num_envs
+        self.env_kwargs = dict(env_kwargs or {})
+        self.env_kwargs["display_graphics"] = False
+        self.deterministic = deterministic
+        if num_episodes > 1 and not episodes_vary(deterministic, self.env_kwargs):
+            warnings.warn("Every evaluation episode would be the same, playing a single one. Sample "
+                          "actions, use random levels or a frame skip range to evaluate more")
+            self.num_episodes = 1
+        self.max_pending = max_pending
+        self.start_method = start_method
+        # Mean reward, step and evaluation of every checkpoint kept, best first
+        self.best = []
+        # Number of snapshots that were written without being evaluated
+        self.skipped = 0
+        self._unevaluated = None
+        self._pending = 0
+        self._error = None
+        self._next_save = save_freq
+        self._started = False
+
+    def _init_callback(self):
+        os.makedirs(self.save_path, exist_ok=True)
+        start_method = self.start_method
+        if start_method is None:
+            start_method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+        context = mp.get_context(start_method)
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        self._process = context.Process(target=_evaluation_worker, daemon=True,
+                                        args=(self._tasks, self._results, type(self.model),
+                                              self.num_episodes, self.num_envs, self.env_kwargs,
+                                              self.deterministic))
+        self._process.start()
+        self._writes = queue.Queue()
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+        self._started = True
+
+    def _on_step(self) -> bool:
+        if self._error is not None:
+            raise self._error
+        if not self._process.is_alive():
+            raise Exception("The evaluation process exited unexpectedly")
+        self._collect_results()
+        if self.num_timesteps >= self._next_save:
+            self._next_save += self.save_freq
+            self._snapshot()
+        return True
+
+    def _snapshot(self):
+        # Serializing to memory is the only part done on the learner
+        model_data = io.BytesIO()
+        self.model.save(model_data)
+        vec_normalize = self.model.get_vec_normalize_env()
+        normalize_data = pickle.dumps(vec_normalize) if vec_normalize is not None else None
+        evaluate = self._pending < self.max_pending
+        if evaluate:
+            self._pending += 1
+        else:
+            self.skipped += 1
+        self._writes.put(("save", self.num_timesteps, model_data.getvalue(), normalize_data, evaluate))
+
+    def _paths(self, step: int) -> tuple[str, str]:
+        return (os.path.join(self.save_path, f"model_{step}.zip"),
+                os.path.join(self.save_path, f"vecnormalize_{step}.pkl"))
+
+    def _write_loop(self):
+        while True:
+            item = self._writes.get()
+            if item is None:
+                return
+            if self._error is not None:
+                continue
+            try:
+                self._write(item)
+            except Exception as error:
+                self._error = error
+
+    def _write(self, item: tuple):
+        kind = item[0]
+        if kind == "save":
+            _, step, model_data, normalize_data, evaluate = item
+            model_path, normalize_path = self._paths(step)
+            _write_atomic(model_path, model_data)
+            if normalize_data is None:
+                normalize_path = None
+            else:
+                _write_atomic(normalize_path, normalize_data)
+            if evaluate:
+                # Only evaluated once it is completely on disk
+                self._tasks.put((step, model_path, normalize_path))
+            else:
+                # Replaces the previous snapshot that wasn't evaluated
+                if self._unevaluated is not None:
+                    self._write(("delete", self._paths(self._unevaluated)))
+                self._unevaluated = step
+        elif kind == "delete":
+            for path in item[1]:
+                if os.path.exists(path):
+                    os.remove(path)
+        elif kind == "index":
+            _write_atomic(os.path.join(self.save_path, "best.json"), item[1])
+
+    def _collect_results(self, block: bool = False):
+        while self._pending:
+            try:
+                step, evaluation = self._results.get(block, 1.0)
+            except queue.Empty:
+                # Waiting stops if nothing is coming anymore
+                if not block or self._error is not None or not self._process.is_alive():
+                    return
+                continue
+            self._pending -= 1
+            self._add_result(step, evaluation)
+
+    def _add_result(self, step: int, evaluation: dict):
+        for key in ("mean_reward", "std_reward", "win_rate", "mean_length"):
+            self.logger.record(f"eval/{key}", evaluation[key])
+        self.logger.record("eval/step", step)
+        if self.verbose:
+            print(f"Evaluation at step {step}: reward {evaluation['mean_reward']:.2f} "
+                  f"+/- {evaluation['std_reward']:.2f}, win rate {evaluation['win_rate']:.1%}")
+        self.best.append((evaluation["mean_reward"], step, evaluation))
+        self.best.sort(key=lambda entry: (-entry[0], entry[1]))
+        dropped = self.best[self.keep_best:]
+        del self.best[self.keep_best:]
+        if dropped:
+            self._writes.put(("delete", [path for _, dropped_step, _ in dropped
+                                         for path in self._paths(dropped_step)]))
+        index = [{"step": best_step, "model": self._paths(best_step)[0], **best_evaluation}
+                 for _, best_step, best_evaluation in self.best]
+        self._writes.put(("index", json.dumps(index, indent=2).encode()))
+
+    def _on_training_end(self):
+        self.close()
+
+    def close(self):
+        """Waits for the outstanding evaluations, then stops the writer thread
+        and the evaluation process
+        """
+        if not self._started:
+            return
+        self._started = False
+        self._collect_results(block=True)
+        self._writes.put(None)
+        self._thread.join()
+        self._tasks.put(None)
+        self._process.join()
+        if self._error is not None:
+            raise self._error
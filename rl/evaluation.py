@@ -0,0 +1,151 @@
+import time
+import warnings
+import numpy as np
+from stable_baselines3.common.vec_env import VecEnv, VecNormalize
+from .shared_memory_vec_env import SharedMemoryVecEnv
+
+def episodes_vary(deterministic: bool, env_kwargs: dict = None) -> bool:
+    """Tells whether episodes of BreakoutEnvs can differ from each other.
+    BreakoutEnv itself is deterministic, so they only differ with a
+    stochastic frame skip, random levels or a model that doesn't act
+    deterministically
+
+    Arguments:
+        deterministic {bool} -- Whether the model always takes its best known
+        action
+        env_kwargs {dict} -- Keyword arguments of the BreakoutEnvs
+        (default: {None})
+
+    Returns:
+        bool -- Whether episodes can differ
+    """
+    env_kwargs = env_kwargs or {}
+    frame_skip = env_kwargs.get("frame_skip", 1)
+    return (not deterministic or env_kwargs.get("random_levels", False)
+            or (not isinstance(frame_skip, int) and frame_skip[0] != frame_skip[1]))
+
+def run_evaluation(model, vec_env: VecEnv, num_episodes: int, deterministic: bool = False,
+                   seed: int = None) -> dict:
+    """Plays num_episodes episodes over the environments of vec_env. Every
+    step, the observations of all environments go through model.predict as a
+    single batch. Each environment plays a fixed share of the episodes,
+    otherwise short episodes, which finish first, would be overrepresented
+
+    Arguments:
+        model {BaseAlgorithm} -- Model to evaluate
+        vec_env {VecEnv} -- Environments to play in, with rewards that are not
+        normalized
+        num_episodes {int} -- Number of episodes
+
+    Keyword Arguments:
+        deterministic {bool} -- Whether the model always takes its best known
+        action, otherwise actions are sampled so that episodes can differ
+        (default: {False})
+        seed {int} -- Seed of the first environment, the others get the
+        following ones, None to leave the environments unseeded
+        (default: {None})
+
+    Returns:
+        dict -- Number of episodes, mean, standard deviation, min and max of
+        the episode rewards, win rate, mean episode length, the reward, length
+        and win of every episode, and the time taken
+    """
+    start = time.perf_counter()
+    n = vec_env.num_envs
+    targets = np.array([(num_episodes + i) // n for i in range(n)])
+    counts = np.zeros(n, dtype=np.int64)
+    episode_rewards = np.zeros(n)
+    episode_lengths = np.zeros(n, dtype=np.int64)
+    rewards = []
+    lengths = []
+    wins = []
+    if seed is not None:
+        vec_env.seed(seed)
+    observations = vec_env.reset()
+    while (counts < targets).any():
+        actions, _ = model.predict(observations, deterministic=deterministic)
+        observations, step_rewards, dones, infos = vec_env.step(actions)
+        episode_rewards += step_rewards
+        episode_lengths += 1
+        for i in np.flatnonzero(dones).tolist():
+            if counts[i] < targets[i]:
+                rewards.append(episode_rewards[i])
+                lengths.append(episode_lengths[i])
+                wins.append(infos[i].get("game_win", False))
+                counts[i] += 1
+            episode_rewards[i] = 0.0
+            episode_lengths[i] = 0
+
+    rewards = np.array(rewards)
+    lengths = np.array(lengths, dtype=np.int64)
+    wins = np.array(wins, dtype=bool)
+    return {
+        "episodes": len(rewards),
+        "mean_reward": float(rewards.mean()) if rewards.size else 0.0,
+        "std_reward": float(rewards.std()) if rewards.size else 0.0,
+        "min_reward": float(rewards.min()) if rewards.size else 0.0,
+        "max_reward": float(rewards.max()) if rewards.size else 0.0,
+        "win_rate": float(wins.mean()) if wins.size else 0.0,
+        "mean_length": float(lengths.mean()) if lengths.size else 0.0,
+        "rewards": rewards,
+        "lengths": lengths,
+        "wins": wins,
+        "time": time.perf_counter() - start,
+    }
+
+def evaluate_model(model, num_episodes: int = 1000, num_envs: int = 128, num_workers: int = None,
+                   env_path: str = None, env_kwargs: dict = None, deterministic: bool = False,
+                   seed: int = 0) -> dict:
+    """Evaluates a model on headless BreakoutEnvs spread over a pool of worker
+    processes, see SharedMemoryVecEnv and run_evaluation. When episodes can't
+    differ, see episodes_vary, a single episode is played with a warning,
+    since more would only repeat it
+
+    Arguments:
+        model {BaseAlgorithm} -- Model to evaluate
+
+    Keyword Arguments:
+        num_episodes {int} -- Number of episodes (default: {1000})
+        num_envs {int} -- Number of environments played at once, which is the
+        batch size of every prediction (default: {128})
+        num_workers {int} -- Number of worker processes (default: {number of cpus})
+        env_path {str} -- Saved VecNormalize statistics the model was trained
+        with, None if it was trained on raw observations (default: {None})
+        env_kwargs {dict} -- Keyword arguments for every BreakoutEnv
+        (default: {None})
+        deterministic {bool} -- Whether the model always takes its best known
+        action, otherwise actions are sampled (default: {False})
+        seed {int} -- Seed of the first environment (default: {0})
+
+    Returns:
+        dict -- Results, see run_evaluation
+    """
+    env_kwargs = dict(env_kwargs or {})
+    env_kwargs["display_graphics"] = False
+    if num_episodes > 1 and not episodes_vary(deterministic, env_kwargs):
+        warnings.warn("Every episode would be the same, playing a single one. Sample actions, "
+                      "use random levels or a frame skip range to evaluate more")
+        num_episodes = 1
+    vec_env = SharedMemoryVecEnv(min(num_envs, num_episodes), num_workers, env_kwargs=env_kwargs)
+    try:
+        if env_path is not None:
+            vec_env = VecNormalize.load(env_path, vec_env)
+            vec_env.training = False
+            vec_env.norm_reward = False
+        return run_evaluation(model, vec_env, num_episodes, deterministic, seed)
+    finally:
+        vec_env.close()
+
+def format_evaluation(results: dict) -> str:
+    """Describes the results of run_evaluation in a line
+
+    Arguments:
+        results {dict} -- Results
+
+    Returns:
+        str -- Description
+    """
+    return (f"{results['episodes']} episodes in {results['time']:.1f}s: "
+            f"reward {results['mean_reward']:.2f} +/- {results['std_reward']:.2f} "
+            f"(min {results['min_reward']:.2f}, max {results['max_reward']:.2f}), "
+            f"win rate {results['win_rate']:.1%}, mean length {results['mean_length']:.0f} steps")
@@ -1,25 +1,99 @@
 from stable_baselines3 import PPO
 from stable_baselines3.common.env_util import make_vec_env
-from stable_baselines3.common.vec_env import VecNormalize
+from stable_baselines3.common.vec_env import VecEnv, VecMonitor, VecNormalize
 from .breakout_environment import BreakoutEnv
-
-def train(model_path: str = "breakout_model", env_path: str = "breakout_env", num_environments: int = 1, total_timesteps: int = 10000):
-    vec_env = make_vec_env(BreakoutEnv, n_envs=num_environments, seed=0)
+from .breakout_vec_env import BreakoutVecEnv
+from .shared_memory_vec_env import SharedMemoryVecEnv
+from .trajectory_recorder import VecTrajectoryRecorder
+from .replay import ActionLog
+from .evaluation import evaluate_model, format_evaluation
+from .checkpointing import AsyncEvalCheckpointCallback
+
+# PPO settings used unless train is given others. A slightly higher entropy
+# bonus and modest learning rate discourage premature convergence to a
+# single action
+PPO_DEFAULTS = {
+    "learning_rate": 3e-4,
+    "ent_coef": 0.01,
+    "gamma": 0.9997,
+}
+
+def make_training_env(num_environments: int = 1, vectorized: bool = False, shared_memory: bool = False,
+                      env_kwargs: dict = None, record_path: str = None, normalize_path: str = None,
+                      seed: int = 0) -> VecNormalize:
+    """Builds the environments train learns in, so that anything else that
+    trains, like a sweep, learns in the same setup
+
+    Keyword Arguments:
+        num_environments {int} -- Number of environments (default: {1})
+        vectorized {bool} -- Whether every game is stepped in shared arrays
+        by a BreakoutVecEnv instead of one BreakoutEnv per game (default: {False})
+        shared_memory {bool} -- Whether the BreakoutEnvs are spread over
+        worker processes by a SharedMemoryVecEnv (default: {False})
+        env_kwargs {dict} -- Keyword arguments for every BreakoutEnv, not
+        supported by the vectorized env (default: {None})
+        record_path {str} -- Directory to record every transition to, see
+        VecTrajectoryRecorder, None to not record (default: {None})
+        normalize_path {str} -- Saved VecNormalize statistics to continue
+        from, None to start new ones (default: {None})
+        seed {int} -- Seed of the first environment (default: {0})
+
+    Returns:
+        VecNormalize -- Environments, with normalized observations
+    """
+    # The vectorized env steps every game in shared arrays instead of one
+    # BreakoutEnv per game, the shared memory env spreads BreakoutEnvs over
+    # worker processes
+    if vectorized or shared_memory:
+        if vectorized:
+            if env_kwargs:
+                raise Exception("The vectorized env only plays the default BreakoutEnv")
+            vec_env = BreakoutVecEnv(num_environments)
+        else:
+            vec_env = SharedMemoryVecEnv(num_environments, env_kwargs=env_kwargs)
+        # Seeded and monitored like the environments make_vec_env makes, so
+        # episode rewards and lengths get logged
+        vec_env.seed(seed)
+        vec_env = VecMonitor(vec_env)
+    else:
+        vec_env = make_vec_env(BreakoutEnv, n_envs=num_environments, seed=seed, env_kwargs=env_kwargs)
+    # Keeps every transition, with raw observations, for offline RL
+    if record_path is not None:
+        vec_env = VecTrajectoryRecorder(vec_env, record_path)
+    if normalize_path is not None:
+        return VecNormalize.load(normalize_path, vec_env)
     # Normalize observations to stabilize training
-    vec_env = VecNormalize(vec_env, norm_obs=True, norm_reward=False)
+    return VecNormalize(vec_env, norm_obs=True, norm_reward=False)
+
+def make_model(vec_env: VecEnv, ppo_kwargs: dict = None, **kwargs) -> PPO:
+    """Builds the PPO model train learns with
+
+    Arguments:
+        vec_env {VecEnv} -- Environments to learn in, see make_training_env
+
+    Keyword Arguments:
+        ppo_kwargs {dict} -- PPO settings used instead of PPO_DEFAULTS
+        (default: {None})
+        kwargs -- Other keyword arguments for PPO, like verbose or seed
 
-    # Use a slightly higher entropy bonus and modest learning rate to
-    # discourage premature convergence to a single action.
-    model = PPO(
-        "MlpPolicy",
-        vec_env,
-        verbose=1,
-        learning_rate=3e-4,
-        ent_coef=0.01,
-        gamma=0.9997
-    )
+    Returns:
+        PPO -- Model
+    """
+    return PPO("MlpPolicy", vec_env, **kwargs, **{**PPO_DEFAULTS, **(ppo_kwargs or {})})
 
-    model.learn(total_timesteps=total_timesteps)
+def train(model_path: str = "breakout_model", env_path: str = "breakout_env", num_environments: int = 1,
+          total_timesteps: int = 10000, vectorized: bool = False, shared_memory: bool = False,
+          record_path: str = None, checkpoint_path: str = None, checkpoint_freq: int = 500000,
+          ppo_kwargs: dict = None):
+    vec_env = make_training_env(num_environments, vectorized, shared_memory, record_path=record_path)
+    model = make_model(vec_env, ppo_kwargs, verbose=1)
+
+    # Checkpoints are written and evaluated off the learner, keeping the best
+    callback = None
+    if checkpoint_path is not None:
+        callback = AsyncEvalCheckpointCallback(checkpoint_path, checkpoint_freq, verbose=1)
+
+    model.learn(total_timesteps=total_timesteps, callback=callback)
 
     print("Training finished. Testing the model...")
 
@@ -30,7 +104,7 @@ def train(model_path: str = "breakout_model", env_path: str = "breakout_env", nu
 
     vec_env.close()
 
-def run_model(model, vec_env: VecNormalize):
+def run_model(model, vec_env: VecNormalize, action_log: ActionLog = None):
     done = False
     episode_reward = 0
 
@@ -40,6 +114,9 @@ def run_model(model, vec_env: VecNormalize):
         # Predict the action with the loaded model
         # 'deterministic=True' makes the agent always choose the best known action
         action, _states = model.predict(obs, deterministic=True)
+        # Lets the episode of the first environment be replayed headless
+        if action_log is not None:
+            action_log.append(action[0])
 
         # Take the action in the environment
         obs, rewards, dones, info = vec_env.step(action)
@@ -65,4 +142,13 @@ def test_model(model_path: str = "breakout_model", env_path: str = "breakout_env
     run_model(loaded_model, test_env)
 
     # Close the environment visualization
-    test_env.close()
\ No newline at end of file
+    test_env.close()
+
+def evaluate(model_path: str = "breakout_model", env_path: str = "breakout_env", num_episodes: int = 1000,
+             num_envs: int = 128, num_workers: int = None) -> dict:
+    # Many headless episodes at once instead of a single one with graphics,
+    # for a mean and spread rather than one noisy number
+    loaded_model = PPO.load(model_path)
+    results = evaluate_model(loaded_model, num_episodes, num_envs, num_workers, env_path=env_path)
+    print(format_evaluation(results))
+    return results
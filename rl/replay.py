@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+import time
+import numpy as np
+from .breakout_environment import BreakoutEnv
+
+def hash_state(game) -> str:
+    """Hashes everything about a game that changes while it runs
+
+    Arguments:
+        game {BreakoutGame} -- Game to hash
+
+    Returns:
+        str -- Hex digest of the game's snapshot
+    """
+    return hashlib.blake2b(game.snapshot().to_bytes(), digest_size=8).hexdigest()
+
+def first_divergence(hashes: dict, other_hashes: dict) -> int:
+    """Finds the first step at which two runs of the same action log hashed
+    differently, to bisect simulation regressions
+
+    Arguments:
+        hashes {dict} -- Step to state hash of one run
+        other_hashes {dict} -- Step to state hash of the other run
+
+    Returns:
+        int -- First step both runs hashed with different hashes, None if
+        they agree everywhere
+    """
+    for step in sorted(hashes.keys() & other_hashes.keys()):
+        if hashes[step] != other_hashes[step]:
+            return step
+    return None
+
+class ActionLog:
+    def __init__(self, actions=(), seed: int = None, env_kwargs: dict = None):
+        """Everything needed to play an episode again: the seed it was reset
+        with, the BreakoutEnv arguments and every action taken
+
+        Keyword Arguments:
+            actions {iterable} -- Actions taken (default: {()})
+            seed {int} -- Seed the environment was reset with (default: {None})
+            env_kwargs {dict} -- Keyword arguments of the BreakoutEnv
+            (default: {None})
+        """
+        self.actions = list(actions)
+        self.seed = seed
+        self.env_kwargs = dict(env_kwargs or {})
+
+    def append(self, action: int):
+        self.actions.append(int(action))
+
+    def save(self, path: str):
+        """Saves the log to a .npz file
+
+        Arguments:
+            path {str} -- File to write
+        """
+        np.savez_compressed(path, actions=np.asarray(self.actions, dtype=np.int8),
+                            seed=np.int64(-1 if self.seed is None else self.seed),
+                            env_kwargs=np.array(json.dumps(self.env_kwargs)))
+
+    @classmethod
+    def load(cls, path: str) -> "ActionLog":
+        """Loads a log written by save
+
+        Arguments:
+            path {str} -- File to read
+
+        Returns:
+            ActionLog -- Action log
+        """
+        with np.load(path) as data:
+            seed = int(data["seed"])
+            return cls(data["actions"].tolist(), None if seed < 0 else seed,
+                       json.loads(str(data["env_kwargs"])))
+
+class EpisodeReplay:
+    def __init__(self, log: ActionLog, hash_interval: int = 1000):
+        """Plays an action log back headless, as fast as the simulation runs.
+        Every hash_interval steps the state is hashed and a snapshot is kept,
+        so seeking anywhere in the episode, backwards too, only replays the
+        steps since the closest snapshot. Drawing only happens for the frames
+        asked for
+
+        Arguments:
+            log {ActionLog} -- Log to play
+
+        Keyword Arguments:
+            hash_interval {int} -- Steps between state hashes and snapshots
+            (default: {1000})
+        """
+        self.log = log
+        self.hash_interval = hash_interval
+        env_kwargs = dict(log.env_kwargs)
+        env_kwargs["display_graphics"] = False
+        self.env = BreakoutEnv(**env_kwargs)
+        self.env.reset(seed=log.seed)
+        self.step = 0
+        self.done = False
+        # Step to state hash, and step to the snapshot and random state of the
+        # environment, which stochastic frame skips draw from
+        self.hashes = {}
+        self._checkpoints = {}
+        self._checkpoint()
+
+    @property
+    def game(self):
+        return self.env.simulation_state
+
+    def _checkpoint(self):
+        self.hashes[self.step] = hash_state(self.game)
+        self._checkpoints[self.step] = (self.game.snapshot(), self.env.np_random.bit_generator.state, self.done)
+
+    def advance(self, step: int):
+        """Plays forward to the given step, or to the end of the episode
+
+        Arguments:
+            step {int} -- Number of actions to have been played
+        """
+        env = self.env
+        actions = self.log.actions
+        interval = self.hash_interval
+        end = min(step, len(actions))
+        while self.step < end and not self.done:
+            _, _, terminated, truncated, _ = env.step(actions[self.step])
+            self.step += 1
+            self.done = terminated or truncated
+            if self.step % interval == 0 or self.done:
+                self._checkpoint()
+
+    def run(self) -> dict:
+        """Plays the whole log
+
+        Returns:
+            dict -- Step to state hash, including the last step
+        """
+        self.advance(len(self.log.actions))
+        if self.step not in self.hashes:
+            self._checkpoint()
+        return self.hashes
+
+    def seek(self, step: int):
+        """Puts the replay at the given step, starting from the closest
+        snapshot at or before it
+
+        Arguments:
+            step {int} -- Number of actions to have been played
+        """
+        start = max(s for s in self._checkpoints if s <= step)
+        if step < self.step or start > self.step:
+            state, random_state, done = self._checkpoints[start]
+            self.game.restore(state)
+            self.env.np_random.bit_generator.state = random_state
+            self.step = start
+            self.done = done
+        self.advance(step)
+
+    def state_hash(self) -> str:
+        return hash_state(self.game)
+
+    def save_frames(self, steps, directory: str) -> list[str]:
+        """Draws the given steps to image files, without opening a window
+
+        Arguments:
+            steps {iterable} -- Steps to draw
+            directory {str} -- Directory to write frame_<step>.png files to
+
+        Returns:
+            list[str] -- Paths of the images
+        """
+        from breakout_game.rendering import save_frame
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for step in sorted(steps):
+            self.seek(step)
+            path = os.path.join(directory, f"frame_{self.step:07d}.png")
+            save_frame(self.game, path)
+            paths.append(path)
+        return paths
+
+    def show(self, steps, frame_time: float = 0.5):
+        """Shows the given steps in a window, one after the other
+
+        Arguments:
+            steps {iterable} -- Steps to show
+
+        Keyword Arguments:
+            frame_time {float} -- Seconds each frame is shown (default: {0.5})
+        """
+        from breakout_game.rendering import init_display, draw_game, quit_requested, close
+        screen = init_display()
+        try:
+            for step in sorted(steps):
+                self.seek(step)
+                draw_game(screen, self.game)
+                end = time.perf_counter() + frame_time
+                while time.perf_counter() < end:
+                    if quit_requested():
+                        return
+                    time.sleep(0.01)
+        finally:
+            close()
+
+    def close(self):
+        self.env.close()
@@ -0,0 +1,332 @@
+import numpy as np
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from stable_baselines3.common.vec_env import VecEnv
+from .breakout_environment import BreakoutEnv
+
+# Commands a worker can be given through the shared command array
+_STEP = 1
+_RESET = 2
+_CALL = 3
+_CLOSE = 4
+# Seconds waited on the workers between checks that they are still alive
+_POLL_INTERVAL = 1.0
+
+class _SharedArrays:
+    def __init__(self, specs: dict, names: dict = None):
+        """Numpy arrays backed by shared memory blocks, so that they can be read
+        and written from several processes without copying
+
+        Arguments:
+            specs {dict} -- Name to (shape, dtype) of every array
+
+        Keyword Arguments:
+            names {dict} -- Name of the existing shared memory block of every
+            array, None to create new blocks (default: {None})
+        """
+        self.blocks = {}
+        self.arrays = {}
+        for key, (shape, dtype) in specs.items():
+            size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+            if names is None:
+                block = shared_memory.SharedMemory(create=True, size=size)
+            else:
+                block = shared_memory.SharedMemory(name=names[key])
+            self.blocks[key] = block
+            self.arrays[key] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+            if names is None:
+                self.arrays[key][...] = 0
+
+    def names(self) -> dict:
+        return {key: block.name for key, block in self.blocks.items()}
+
+    def close(self, unlink: bool = False):
+        self.arrays.clear()
+        for block in self.blocks.values():
+            block.close()
+            if unlink:
+                block.unlink()
+
+def _worker(env_kwargs: dict, env_slice: tuple[int, int], specs: dict, names: dict,
+            start, finished, pipe):
+    """Runs the environments in env_slice, waiting on start for a command and
+    releasing finished once it is done. Steps read the actions from and write
+    their results to shared memory, the pipe is only used for calls and for
+    sending back the error of a command that failed
+    """
+    shared = _SharedArrays(specs, names)
+    arrays = shared.arrays
+    command = arrays["command"]
+    slot = arrays["slot"]
+    actions = arrays["actions"]
+    observations = arrays["observations"]
+    rewards = arrays["rewards"]
+    dones = arrays["dones"]
+    truncated = arrays["truncated"]
+    game_wins = arrays["game_wins"]
+    terminal_observations = arrays["terminal_observations"]
+    seeds = arrays["seeds"]
+    first, last = env_slice
+    envs = [BreakoutEnv(**env_kwargs) for _ in range(first, last)]
+    try:
+        while True:
+            start.acquire()
+            try:
+                cmd = int(command[0])
+                if cmd == _CLOSE:
+                    break
+                elif cmd == _STEP:
+                    obs = observations[int(slot[0])]
+                    for i, env in enumerate(envs, first):
+                        observation, reward, term, trunc, info = env.step(int(actions[i]))
+                        done = term or trunc
+                        if done:
+                            terminal_observations[i] = observation
+                            game_wins[i] = info["game_win"]
+                            observation, _ = env.reset()
+                        obs[i] = observation
+                        rewards[int(slot[0]), i] = reward
+                        dones[int(slot[0]), i] = done
+                        truncated[i] = trunc and not term
+                elif cmd == _RESET:
+                    obs = observations[int(slot[0])]
+                    for i, env in enumerate(envs, first):
+                        seed = int(seeds[i])
+                        obs[i], _ = env.reset(seed=seed if seed >= 0 else None)
+                elif cmd == _CALL:
+                    name, args, kwargs, indices = pipe.recv()
+                    results = []
+                    for i in indices:
+                        if first <= i < last:
+                            env = envs[i - first]
+                            if name == "__getattr__":
+                                results.append(getattr(env, args[0]))
+                            elif name == "__setattr__":
+                                setattr(env, args[0], args[1])
+                                results.append(None)
+                            else:
+                                results.append(getattr(env, name)(*args, **kwargs))
+                    pipe.send((None, results))
+            except Exception as error:
+                # Reported to the parent, which raises it
+                try:
+                    pipe.send((error, None))
+                except Exception:
+                    pipe.send((Exception(repr(error)), None))
+            finished.release()
+    finally:
+        for env in envs:
+            env.close()
+        shared.close()
+
+class SharedMemoryVecEnv(VecEnv):
+    def __init__(self, num_envs: int, num_workers: int = None, ring_size: int = 4,
+                 env_kwargs: dict = None, start_method: str = None):
+        """Runs BreakoutEnvs in a pool of worker processes that exchange
+        everything through shared memory. Actions go out through a shared
+        array, and every step's observations, rewards and done flags are
+        written by the workers straight into a slot of a shared ring buffer.
+        Workers are woken and waited on with semaphores, so a step pickles
+        nothing. Pipes are only used for the rarely used get_attr, set_attr and
+        env_method
+
+        Observations returned by step and reset are views into the ring
+        buffer. They stay valid for ring_size steps, copy them to keep them
+        longer
+
+        Arguments:
+            num_envs {int} -- Number of environments
+
+        Keyword Arguments:
+            num_workers {int} -- Number of worker processes, the environments
+            are split evenly between them (default: {number of cpus})
+            ring_size {int} -- Number of steps kept in the ring buffer
+            (default: {4})
+            env_kwargs {dict} -- Keyword arguments for every BreakoutEnv
+            (default: {None})
+            start_method {str} -- multiprocessing start method, forkserver when
+            available and spawn otherwise (default: {None})
+        """
+        env_kwargs = env_kwargs or {}
+        template = BreakoutEnv(**env_kwargs)
+        observation_space = template.observation_space
+        action_space = template.action_space
+        template.close()
+
+        if num_workers is None:
+            num_workers = mp.cpu_count()
+        num_workers = max(min(num_workers, num_envs), 1)
+        if start_method is None:
+            start_method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+        context = mp.get_context(start_method)
+
+        obs_shape = observation_space.shape
+        self._specs = {
+            "command": ((1,), np.int64),
+            "slot": ((1,), np.int64),
+            "actions": ((num_envs,), np.int64),
+            "seeds": ((num_envs,), np.int64),
+            "observations": ((ring_size, num_envs) + obs_shape, np.float32),
+            "rewards": ((ring_size, num_envs), np.float32),
+            "dones": ((ring_size, num_envs), bool),
+            "truncated": ((num_envs,), bool),
+            "game_wins": ((num_envs,), bool),
+            "terminal_observations": ((num_envs,) + obs_shape, np.float32),
+        }
+        self._shared = _SharedArrays(self._specs)
+        self._arrays = self._shared.arrays
+        self._arrays["seeds"][:] = -1
+        self.ring_size = ring_size
+        self._step_count = 0
+
+        bounds = np.linspace(0, num_envs, num_workers + 1).astype(int)
+        self._slices = [(int(bounds[i]), int(bounds[i + 1])) for i in range(num_workers)]
+        self._start = [context.Semaphore(0) for _ in range(num_workers)]
+        self._finished = context.Semaphore(0)
+        self._pipes = []
+        self._processes = []
+        for worker, env_slice in enumerate(self._slices):
+            parent_pipe, child_pipe = context.Pipe()
+            process = context.Process(target=_worker, daemon=True,
+                                      args=(env_kwargs, env_slice, self._specs, self._shared.names(),
+                                            self._start[worker], self._finished, child_pipe))
+            process.start()
+            child_pipe.close()
+            self._pipes.append(parent_pipe)
+            self._processes.append(process)
+        self.closed = False
+
+        super().__init__(num_envs, observation_space, action_space)
+
+    def _run(self, command: int, workers: list[int] = None):
+        """Gives the workers a command and waits until all of them are done"""
+        if workers is None:
+            workers = range(len(self._processes))
+        self._arrays["command"][0] = command
+        for worker in workers:
+            self._start[worker].release()
+        self._wait(workers)
+
+    def _check_alive(self, workers):
+        for worker in workers:
+            if not self._processes[worker].is_alive():
+                raise Exception(f"Worker {worker} exited unexpectedly")
+
+    def _recv(self, worker: int):
+        """Receives a message from a worker, raising the error it reports"""
+        pipe = self._pipes[worker]
+        while not pipe.poll(_POLL_INTERVAL):
+            self._check_alive([worker])
+        try:
+            error, result = pipe.recv()
+        except EOFError:
+            raise Exception(f"Worker {worker} exited unexpectedly")
+        if error is not None:
+            raise error
+        return result
+
+    def _wait(self, workers):
+        """Waits until the workers are done with a step or reset, then raises
+        the first error any of them reported. Waiting stops with an error if a
+        worker dies without reporting back
+        """
+        for _ in workers:
+            while not self._finished.acquire(timeout=_POLL_INTERVAL):
+                self._check_alive(workers)
+        # Only workers that failed send anything, every error is received so
+        # none is left behind for the next command
+        errors = []
+        for worker in workers:
+            if self._pipes[worker].poll():
+                try:
+                    self._recv(worker)
+                except Exception as error:
+                    errors.append(error)
+        if errors:
+            raise errors[0]
+
+    def _next_slot(self) -> int:
+        slot = self._step_count % self.ring_size
+        self._step_count += 1
+        self._arrays["slot"][0] = slot
+        return slot
+
+    def reset(self) -> np.ndarray:
+        seeds = self._arrays["seeds"]
+        seeds[:] = [-1 if seed is None else seed for seed in self._seeds]
+        slot = self._next_slot()
+        self._run(_RESET)
+        seeds[:] = -1
+        self._reset_seeds()
+        self.reset_infos = [{} for _ in range(self.num_envs)]
+        return self._arrays["observations"][slot]
+
+    def step_async(self, actions: np.ndarray):
+        self._arrays["actions"][:] = np.asarray(actions).reshape(-1)
+        self._pending_slot = self._next_slot()
+        self._arrays["command"][0] = _STEP
+        for start in self._start:
+            start.release()
+
+    def step_wait(self):
+        self._wait(range(len(self._processes)))
+        slot = self._pending_slot
+        dones = self._arrays["dones"][slot]
+        infos = [{} for _ in range(self.num_envs)]
+        for i in np.flatnonzero(dones).tolist():
+            infos[i]["terminal_observation"] = self._arrays["terminal_observations"][i].copy()
+            infos[i]["TimeLimit.truncated"] = bool(self._arrays["truncated"][i])
+            infos[i]["game_win"] = bool(self._arrays["game_wins"][i])
+        return (self._arrays["observations"][slot], self._arrays["rewards"][slot],
+                dones, infos)
+
+    def _call(self, name: str, args: tuple, kwargs: dict, indices) -> list:
+        indices = list(self._get_indices(indices))
+        workers = [w for w, (first, last) in enumerate(self._slices)
+                   if any(first <= i < last for i in indices)]
+        for worker in workers:
+            self._pipes[worker].send((name, args, kwargs, indices))
+        self._arrays["command"][0] = _CALL
+        for worker in workers:
+            self._start[worker].release()
+        # Every worker answers a call, received before waiting so that large
+        # results can't fill the pipe while the worker waits to finish
+        results = []
+        errors = []
+        for worker in workers:
+            try:
+                results.extend(self._recv(worker))
+            except Exception as error:
+                errors.append(error)
+        for _ in workers:
+            while not self._finished.acquire(timeout=_POLL_INTERVAL):
+                self._check_alive(workers)
+        if errors:
+            raise errors[0]
+        return results
+
+    def get_attr(self, attr_name: str, indices=None) -> list:
+        return self._call("__getattr__", (attr_name,), {}, indices)
+
+    def set_attr(self, attr_name: str, value, indices=None):
+        self._call("__setattr__", (attr_name, value), {}, indices)
+
+    def env_method(self, method_name: str, *method_args, indices=None, **method_kwargs) -> list:
+        return self._call(method_name, method_args, method_kwargs, indices)
+
+    def env_is_wrapped(self, wrapper_class, indices=None) -> list:
+        return [False] * len(list(self._get_indices(indices)))
+
+    def close(self):
+        if self.closed:
+            return
+        # Workers exit without reporting back
+        self._arrays["command"][0] = _CLOSE
+        for start in self._start:
+            start.release()
+        for process in self._processes:
+            process.join()
+        for pipe in self._pipes:
+            pipe.close()
+        self._shared.close(unlink=True)
+        self.closed = True
@@ -0,0 +1,276 @@
+import json
+import math
+import os
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, ALL_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+import torch
+from stable_baselines3 import PPO
+from stable_baselines3.common.env_util import make_vec_env
+from stable_baselines3.common.vec_env import VecNormalize
+from .breakout_environment import BreakoutEnv
+from .evaluation import run_evaluation
+from .reinforcement_model import make_model, make_training_env
+
+# Ranges searched by default: ("log", low, high) and ("uniform", low, high)
+# are sampled from, a list is chosen from
+DEFAULT_SPACE = {
+    "learning_rate": ("log", 1e-5, 1e-3),
+    "ent_coef": ("log", 1e-4, 1e-1),
+    "gamma": ("uniform", 0.99, 0.9999),
+}
+
+def sample_config(space: dict, rng: np.random.Generator) -> dict:
+    """Samples a configuration from a search space, see DEFAULT_SPACE
+
+    Arguments:
+        space {dict} -- Name to range or list of choices of every setting
+        rng {np.random.Generator} -- Random generator
+
+    Returns:
+        dict -- Name to value of every setting
+    """
+    config = {}
+    for name, values in space.items():
+        if isinstance(values, list):
+            value = values[rng.integers(len(values))]
+        elif values[0] == "log":
+            value = math.exp(rng.uniform(math.log(values[1]), math.log(values[2])))
+        elif values[0] == "uniform":
+            value = rng.uniform(values[1], values[2])
+        else:
+            raise Exception(f"Unknown range '{values[0]}' for {name}, expected 'log' or 'uniform'")
+        config[name] = value.item() if isinstance(value, np.generic) else value
+    return config
+
+def load_results(directory: str) -> list[dict]:
+    """Reads every record a sweep wrote to its results store
+
+    Arguments:
+        directory {str} -- Directory of the sweep
+
+    Returns:
+        list[dict] -- One record per evaluated rung of a trial, in the order
+        they finished
+    """
+    path = os.path.join(directory, "results.jsonl")
+    if not os.path.exists(path):
+        return []
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+def _pin_worker(cores):
+    # Every worker process gets a core of its own, and torch is kept to it
+    core = cores.get()
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {core})
+    torch.set_num_threads(1)
+
+def _run_trial(directory: str, config: dict, steps: int, num_envs: int, vectorized: bool,
+               shared_memory: bool, env_kwargs: dict, eval_episodes: int, seed: int) -> dict:
+    """Trains a trial up to the given number of steps in the setup train
+    uses, continuing from its last checkpoint if it has one, then saves and
+    evaluates it
+    """
+    os.makedirs(directory, exist_ok=True)
+    model_path = os.path.join(directory, "model.zip")
+    normalize_path = os.path.join(directory, "vecnormalize.pkl")
+    resume = os.path.exists(model_path)
+    vec_env = make_training_env(num_envs, vectorized, shared_memory, env_kwargs,
+                                normalize_path=normalize_path if resume else None, seed=seed)
+    if resume:
+        model = PPO.load(model_path, env=vec_env, device="cpu")
+    else:
+        model = make_model(vec_env, config, device="cpu", seed=seed)
+    model.learn(total_timesteps=max(steps - model.num_timesteps, 0), reset_num_timesteps=False)
+    # Written under temporary names so that a killed worker never leaves a
+    # half written checkpoint
+    model.save(model_path + ".tmp.zip")
+    os.replace(model_path + ".tmp.zip", model_path)
+    vec_env.save(normalize_path + ".tmp")
+    os.replace(normalize_path + ".tmp", normalize_path)
+    vec_env.close()
+
+    eval_env = VecNormalize.load(normalize_path, make_vec_env(BreakoutEnv, n_envs=min(num_envs, eval_episodes),
+                                                              env_kwargs=env_kwargs))
+    eval_env.training = False
+    eval_env.norm_reward = False
+    evaluation = run_evaluation(model, eval_env, eval_episodes, seed=seed)
+    eval_env.close()
+    return {key: value for key, value in evaluation.items() if key not in ("rewards", "lengths", "wins")}
+
+class SuccessiveHalvingSweep:
+    def __init__(self, directory: str, space: dict = None, num_trials: int = 27,
+                 min_steps: int = 100000, max_steps: int = 2700000, eta: int = 3,
+                 cores: list[int] = None, num_envs: int = 4, vectorized: bool = False,
+                 shared_memory: bool = False, env_kwargs: dict = None, eval_episodes: int = 16,
+                 seed: int = 0):
+        """Searches PPO settings with asynchronous successive halving. Every
+        trial starts with min_steps of training and an evaluation. Whenever a
+        trial is in the top 1/eta of the trials evaluated at its rung, it is
+        promoted: it continues from its checkpoint to eta times as many steps,
+        up to max_steps. The rest stop early, so most of the compute goes to
+        the most promising settings and no core waits for a rung to finish.
+
+        Trials run in a pool of worker processes, one per core, each pinned to
+        its core with torch limited to one thread. They learn in the same
+        environments and with the same model train builds, see
+        make_training_env and make_model, so the settings are measured in the
+        setup they'll be used in. Every evaluation is appended to
+        results.jsonl in the directory as soon as it finishes, and every trial
+        keeps its latest checkpoint in a directory of its own. If a worker
+        dies, the trials that were running get one more try in a new pool, a
+        trial that was running when two pools broke is recorded as failed
+
+        Arguments:
+            directory {str} -- Directory of the results store and checkpoints
+
+        Keyword Arguments:
+            space {dict} -- Search space, see sample_config. Settings that
+            aren't searched come from PPO_DEFAULTS (default: {DEFAULT_SPACE})
+            num_trials {int} -- Number of configurations tried (default: {27})
+            min_steps {int} -- Training steps of the first rung (default: {100000})
+            max_steps {int} -- Most training steps of any trial (default: {2700000})
+            eta {int} -- Promotion ratio between rungs (default: {3})
+            cores {list[int]} -- Cores to run trials on (default: {every
+            core the process may run on})
+            num_envs {int} -- Environments per trial, like the
+            num_environments given to train (default: {4})
+            vectorized {bool} -- Whether trials learn in a BreakoutVecEnv,
+            see train (default: {False})
+            shared_memory {bool} -- Whether trials learn in a
+            SharedMemoryVecEnv, see train (default: {False})
+            env_kwargs {dict} -- Keyword arguments for every BreakoutEnv
+            (default: {None})
+            eval_episodes {int} -- Episodes per evaluation (default: {16})
+            seed {int} -- Seed of the sampled configurations, trial i trains
+            with seed + i (default: {0})
+        """
+        if eta < 2:
+            raise Exception("The promotion ratio must be at least 2")
+        if min_steps > max_steps:
+            raise Exception("The first rung can't train for more than max_steps")
+        self.directory = directory
+        self.space = DEFAULT_SPACE if space is None else space
+        self.num_trials = num_trials
+        self.eta = eta
+        # Training steps of every rung
+        self.rung_steps = []
+        steps = min_steps
+        while steps <= max_steps:
+            self.rung_steps.append(steps)
+            steps *= eta
+        if cores is None:
+            cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else range(os.cpu_count())
+        self.cores = list(cores)
+        self.num_envs = num_envs
+        self.vectorized = vectorized
+        self.shared_memory = shared_memory
+        self.env_kwargs = dict(env_kwargs or {})
+        if not vectorized:
+            self.env_kwargs["display_graphics"] = False
+        self.eval_episodes = eval_episodes
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self.configs = [sample_config(self.space, rng) for _ in range(num_trials)]
+        # Mean reward of every trial evaluated at each rung, and the trials
+        # promoted out of it
+        self.rung_rewards = [{} for _ in self.rung_steps]
+        self.promoted = [set() for _ in self.rung_steps]
+        self._next_trial = 0
+
+    def _next_job(self) -> tuple[int, int]:
+        # Promotions first, from the highest rung down, then new trials
+        for rung in range(len(self.rung_steps) - 2, -1, -1):
+            rewards = self.rung_rewards[rung]
+            ranked = sorted(rewards, key=lambda trial: -rewards[trial])
+            for trial in ranked[:len(rewards) // self.eta]:
+                if trial not in self.promoted[rung]:
+                    self.promoted[rung].add(trial)
+                    return trial, rung + 1
+        if self._next_trial < self.num_trials:
+            self._next_trial += 1
+            return self._next_trial - 1, 0
+        return None
+
+    def _record(self, record: dict):
+        with open(os.path.join(self.directory, "results.jsonl"), "a") as file:
+            file.write(json.dumps(record) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+    def _start_pool(self, context) -> ProcessPoolExecutor:
+        cores = context.Queue()
+        for core in self.cores:
+            cores.put(core)
+        return ProcessPoolExecutor(len(self.cores), mp_context=context, initializer=_pin_worker,
+                                   initargs=(cores,))
+
+    def _submit(self, pool: ProcessPoolExecutor, trial: int, rung: int):
+        return pool.submit(_run_trial, os.path.join(self.directory, f"trial_{trial:04d}"),
+                           self.configs[trial], self.rung_steps[rung], self.num_envs, self.vectorized,
+                           self.shared_memory, self.env_kwargs, self.eval_episodes, self.seed + trial)
+
+    def run(self) -> list[dict]:
+        """Runs the sweep until no trial can be started or promoted anymore
+
+        Returns:
+            list[dict] -- Record of the furthest evaluated rung of every trial,
+            best first
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        context = mp.get_context("forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn")
+        furthest = {}
+        # Jobs to run again because their pool broke, and every job that was
+        # running when a pool broke
+        retry = []
+        broke = set()
+        pending = {}
+        pool = self._start_pool(context)
+        try:
+            while True:
+                broken = False
+                while len(pending) < len(self.cores):
+                    job = retry.pop(0) if retry else self._next_job()
+                    if job is None:
+                        break
+                    try:
+                        future = self._submit(pool, *job)
+                    except BrokenProcessPool:
+                        retry.insert(0, job)
+                        broken = True
+                        break
+                    pending[future] = job
+                if not pending and not broken:
+                    break
+                # Once the pool is broken every running trial fails, they are
+                # all collected before it is replaced
+                done, _ = wait(pending, return_when=ALL_COMPLETED if broken else FIRST_COMPLETED)
+                for future in done:
+                    trial, rung = job = pending.pop(future)
+                    record = {"trial": trial, "rung": rung, "steps": self.rung_steps[rung],
+                              "config": self.configs[trial]}
+                    try:
+                        record.update(future.result())
+                    except BrokenProcessPool as error:
+                        # A worker died, not necessarily this trial's
+                        broken = True
+                        if job not in broke:
+                            broke.add(job)
+                            retry.append(job)
+                            continue
+                        record["error"] = repr(error)
+                    except Exception as error:
+                        # A failed trial is recorded and never promoted
+                        record["error"] = repr(error)
+                    else:
+                        self.rung_rewards[rung][trial] = record["mean_reward"]
+                        furthest[trial] = record
+                    self._record(record)
+                if broken and not pending:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = self._start_pool(context)
+        finally:
+            pool.shutdown()
+        return sorted(furthest.values(), key=lambda record: (-record["rung"], -record["mean_reward"]))
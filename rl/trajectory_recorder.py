@@ -0,0 +1,269 @@
+import glob
+import json
+import os
+import queue
+import threading
+import numpy as np
+from stable_baselines3.common.vec_env import VecEnv, VecEnvWrapper
+
+# Fields of every recorded transition, one file per field per chunk
+FIELDS = ("observations", "actions", "rewards", "next_observations", "dones", "truncated", "env_ids")
+
+def _chunk_path(directory: str, index: int, field: str) -> str:
+    return os.path.join(directory, f"chunk_{index:06d}_{field}.npy")
+
+class TrajectoryWriter:
+    def __init__(self, directory: str, observation_shape: tuple[int], chunk_size: int = 65536,
+                 max_pending: int = 4):
+        """Streams transitions to disk in fixed size chunks. Transitions are
+        copied into a preallocated chunk, and full chunks are handed to a
+        background thread that saves every field as its own .npy file. Chunk
+        buffers are recycled once written, so memory stays bounded at
+        max_pending + 1 chunks however long the run is. Adding blocks only if
+        the disk falls max_pending chunks behind
+
+        Arguments:
+            directory {str} -- Directory to write the chunks to
+            observation_shape {tuple[int]} -- Shape of a single observation
+
+        Keyword Arguments:
+            chunk_size {int} -- Number of transitions per chunk (default: {65536})
+            max_pending {int} -- Number of full chunks that can wait to be
+            written (default: {4})
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.observation_shape = tuple(observation_shape)
+        self.chunk_size = chunk_size
+        self._specs = {
+            "observations": (self.observation_shape, np.float32),
+            "actions": ((), np.int64),
+            "rewards": ((), np.float32),
+            "next_observations": (self.observation_shape, np.float32),
+            "dones": ((), bool),
+            "truncated": ((), bool),
+            "env_ids": ((), np.int32),
+        }
+        self._free = queue.Queue()
+        for _ in range(max_pending + 1):
+            self._free.put({field: np.zeros((chunk_size,) + shape, dtype=dtype)
+                            for field, (shape, dtype) in self._specs.items()})
+        self._pending = queue.Queue(max_pending)
+        self._chunk = self._free.get()
+        self._size = 0
+        # Continues after the chunks already in the directory
+        existing = _find_chunks(directory)
+        self._chunk_index = existing[-1] + 1 if existing else 0
+        self._chunk_sizes = []
+        self._error = None
+        self.closed = False
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    def add(self, observations: np.ndarray, actions: np.ndarray, rewards: np.ndarray,
+            next_observations: np.ndarray, dones: np.ndarray, truncated: np.ndarray,
+            env_ids: np.ndarray):
+        """Adds a batch of transitions, one row per transition
+
+        Arguments:
+            observations {np.ndarray} -- Observations the actions were taken in
+            actions {np.ndarray} -- Actions
+            rewards {np.ndarray} -- Rewards
+            next_observations {np.ndarray} -- Observations after the actions,
+            the last observation of the episode for rows that are done
+            dones {np.ndarray} -- Whether the episode ended
+            truncated {np.ndarray} -- Whether the episode was cut off by a
+            time limit instead of ending
+            env_ids {np.ndarray} -- Environment each transition came from
+        """
+        values = (observations, actions, rewards, next_observations, dones, truncated, env_ids)
+        n = len(actions)
+        start = 0
+        while start < n:
+            count = min(self.chunk_size - self._size, n - start)
+            position = self._size
+            for field, value in zip(FIELDS, values):
+                self._chunk[field][position:position + count] = value[start:start + count]
+            self._size += count
+            start += count
+            if self._size == self.chunk_size:
+                self.flush()
+
+    def flush(self):
+        """Hands the current chunk to the writer thread, even if it isn't full"""
+        if self._error is not None:
+            raise self._error
+        if self._size == 0:
+            return
+        self._pending.put((self._chunk, self._size, self._chunk_index))
+        self._chunk_sizes.append(self._size)
+        self._chunk_index += 1
+        self._chunk = self._free.get()
+        self._size = 0
+
+    def _write_loop(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            chunk, size, index = item
+            if self._error is None:
+                try:
+                    for field in FIELDS:
+                        path = _chunk_path(self.directory, index, field)
+                        # Written under a temporary name so readers never see
+                        # half written files
+                        with open(path + ".tmp", "wb") as file:
+                            np.save(file, chunk[field][:size])
+                        os.replace(path + ".tmp", path)
+                except Exception as error:
+                    self._error = error
+            self._free.put(chunk)
+
+    def close(self):
+        """Writes what is left, waits for the writer thread and saves the
+        dataset description
+        """
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.flush()
+        finally:
+            self._pending.put(None)
+            self._thread.join()
+        if self._error is not None:
+            raise self._error
+        meta_path = os.path.join(self.directory, "meta.json")
+        chunk_sizes = []
+        if os.path.exists(meta_path):
+            with open(meta_path) as file:
+                chunk_sizes = json.load(file)["chunk_sizes"]
+        chunk_sizes += self._chunk_sizes
+        with open(meta_path, "w") as file:
+            json.dump({"observation_shape": list(self.observation_shape), "chunk_size": self.chunk_size,
+                       "chunk_sizes": chunk_sizes, "transitions": sum(chunk_sizes)}, file)
+
+def _find_chunks(directory: str) -> list[int]:
+    # The last field is written last, so only complete chunks are found
+    paths = glob.glob(os.path.join(directory, f"chunk_*_{FIELDS[-1]}.npy"))
+    return sorted(int(os.path.basename(path).split("_")[1]) for path in paths)
+
+class TrajectoryDataset:
+    def __init__(self, directory: str):
+        """Reads the chunks written by a TrajectoryWriter. Every file is memory
+        mapped, so opening a dataset is cheap and only the sampled rows get
+        read from disk. Chunks that were completely written are readable even
+        if the recording never got closed
+
+        Arguments:
+            directory {str} -- Directory the chunks were written to
+        """
+        self.directory = directory
+        self.chunks = []
+        for index in _find_chunks(directory):
+            self.chunks.append({field: np.load(_chunk_path(directory, index, field), mmap_mode="r")
+                                for field in FIELDS})
+        sizes = [len(chunk["actions"]) for chunk in self.chunks]
+        # Index of the first transition of every chunk, plus the total
+        self.offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=self.offsets[1:])
+
+    def __len__(self) -> int:
+        return int(self.offsets[-1])
+
+    def get(self, indices) -> dict:
+        """Gets the transitions at the given indices
+
+        Arguments:
+            indices {array-like} -- Indices of the transitions
+
+        Returns:
+            dict -- Array of every field, one row per index
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        if indices.size and (indices.min() < 0 or indices.max() >= len(self)):
+            raise IndexError("transition index out of range")
+        chunk_ids = np.searchsorted(self.offsets, indices, side="right") - 1
+        batch = {}
+        for field in FIELDS:
+            sample = self.chunks[0][field] if self.chunks else np.zeros(0)
+            batch[field] = np.empty(indices.shape + sample.shape[1:], dtype=sample.dtype)
+        for chunk_id in np.unique(chunk_ids).tolist():
+            rows = np.flatnonzero(chunk_ids == chunk_id)
+            local = indices[rows] - self.offsets[chunk_id]
+            chunk = self.chunks[chunk_id]
+            for field in FIELDS:
+                batch[field][rows] = chunk[field][local]
+        return batch
+
+    def sample(self, batch_size: int, rng: np.random.Generator = None) -> dict:
+        """Gets uniformly sampled transitions
+
+        Arguments:
+            batch_size {int} -- Number of transitions
+
+        Keyword Arguments:
+            rng {np.random.Generator} -- Random generator (default: {None})
+
+        Returns:
+            dict -- Array of every field, one row per transition
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+        return self.get(rng.integers(0, len(self), batch_size))
+
+class VecTrajectoryRecorder(VecEnvWrapper):
+    def __init__(self, venv: VecEnv, directory: str, chunk_size: int = 65536, max_pending: int = 4):
+        """Records every transition of the wrapped environments with a
+        TrajectoryWriter. Each step copies the batch into the current chunk,
+        the disk is only touched by the writer thread. Wrap the environments
+        before any normalization to record raw observations
+
+        Arguments:
+            venv {VecEnv} -- Environments to record
+            directory {str} -- Directory to write the chunks to
+
+        Keyword Arguments:
+            chunk_size {int} -- Number of transitions per chunk (default: {65536})
+            max_pending {int} -- Number of full chunks that can wait to be
+            written (default: {4})
+        """
+        super().__init__(venv)
+        shape = venv.observation_space.shape
+        self.writer = TrajectoryWriter(directory, shape, chunk_size, max_pending)
+        n = venv.num_envs
+        self._observations = np.zeros((n,) + shape, dtype=np.float32)
+        self._next_observations = np.zeros((n,) + shape, dtype=np.float32)
+        self._actions = np.zeros(n, dtype=np.int64)
+        self._truncated = np.zeros(n, dtype=bool)
+        self._env_ids = np.arange(n, dtype=np.int32)
+
+    def reset(self) -> np.ndarray:
+        observations = self.venv.reset()
+        self._observations[:] = observations
+        return observations
+
+    def step_async(self, actions: np.ndarray):
+        self._actions[:] = np.asarray(actions).reshape(-1)
+        self.venv.step_async(actions)
+
+    def step_wait(self):
+        observations, rewards, dones, infos = self.venv.step_wait()
+        next_observations = self._next_observations
+        next_observations[:] = observations
+        truncated = self._truncated
+        truncated[:] = False
+        # Done environments were already reset, their episode ended on the
+        # terminal observation
+        for i in np.flatnonzero(dones).tolist():
+            next_observations[i] = infos[i]["terminal_observation"]
+            truncated[i] = infos[i].get("TimeLimit.truncated", False)
+        self.writer.add(self._observations, self._actions, rewards, next_observations,
+                        dones, truncated, self._env_ids)
+        self._observations[:] = observations
+        return observations, rewards, dones, infos
+
+    def close(self):
+        self.writer.close()
+        self.venv.close()
@@ -0,0 +1,24 @@
+import numpy as np
+from rl.breakout_environment import BreakoutEnv
+from rl.breakout_vec_env import BreakoutVecEnv
+
+def test_games_match_breakout_env_step_for_step():
+    num_envs = 8
+    rng = np.random.default_rng(1)
+    vec_env = BreakoutVecEnv(num_envs)
+    vec_observations = vec_env.reset()
+    envs = [BreakoutEnv() for _ in range(num_envs)]
+    observations = np.stack([env.reset()[0] for env in envs])
+    for _ in range(8000):
+        actions = rng.integers(0, 3, num_envs)
+        vec_observations, vec_rewards, vec_dones, vec_infos = vec_env.step(actions)
+        for i, env in enumerate(envs):
+            observation, reward, terminated, truncated, info = env.step(int(actions[i]))
+            assert reward == np.float32(vec_rewards[i])
+            assert (terminated or truncated) == vec_dones[i]
+            if terminated or truncated:
+                assert np.array_equal(observation, vec_infos[i]["terminal_observation"])
+                assert info["game_win"] == vec_infos[i]["game_win"]
+                observation, _ = env.reset()
+            observations[i] = observation
+        assert np.array_equal(observations, vec_observations)
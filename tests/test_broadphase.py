@@ -0,0 +1,60 @@
+import math
+import numpy as np
+from breakout_game import (SCREEN_WIDTH, SCREEN_HEIGHT, BROADPHASES, BreakoutBlock, BreakoutPlayer)
+from breakout_game.objects.broadphase import make_broadphase
+
+def make_layout(name: str, rng: np.random.Generator):
+    broadphase = make_broadphase(name, (math.ceil(SCREEN_WIDTH / 14), math.ceil(SCREEN_HEIGHT / 14)),
+                                 SCREEN_WIDTH, SCREEN_HEIGHT)
+    # Blocks of mixed sizes, some spanning several grid cells, some touching
+    blocks = [BreakoutBlock(top, left, width, height) for left, top, width, height in zip(
+        rng.uniform(0, SCREEN_WIDTH - 100, 300), rng.uniform(0, SCREEN_HEIGHT - 200, 300),
+        rng.choice([5, 20, 100], 300), rng.choice([5, 14, 30], 300))]
+    for block in blocks:
+        broadphase.add_static(block)
+    player = BreakoutPlayer(SCREEN_HEIGHT - 15, SCREEN_WIDTH / 2 - 50, 100, 5, 500)
+    broadphase.add_dynamic(player)
+    broadphase.build()
+    for i in range(0, len(blocks), 7):
+        broadphase.remove(blocks[i])
+    return broadphase
+
+def overlapping(broadphase, ball_idx: np.ndarray, obj_idx: np.ndarray, left: np.ndarray, top: np.ndarray,
+                right: np.ndarray, bottom: np.ndarray) -> set:
+    # Narrows candidates down to the objects whose bounds really overlap the
+    # ball's box, which every backend has to agree on
+    aabbs = broadphase.aabbs[obj_idx]
+    keep = ((aabbs[:, 0] <= right[ball_idx]) & (left[ball_idx] <= aabbs[:, 2])
+            & (aabbs[:, 1] <= bottom[ball_idx]) & (top[ball_idx] <= aabbs[:, 3]))
+    return set(zip(ball_idx[keep].tolist(), obj_idx[keep].tolist()))
+
+def test_backends_find_the_same_pairs():
+    # The same layout and balls for every backend, so all of them have to
+    # find exactly the pairs a brute force check finds
+    rng = np.random.default_rng(0)
+    x = rng.uniform(-20, SCREEN_WIDTH + 20, 2000)
+    y = rng.uniform(-20, SCREEN_HEIGHT + 20, 2000)
+    dx = rng.uniform(-400, 400, 2000)
+    dy = rng.uniform(-400, 400, 2000)
+    # Up to a grid cell, the reach of the grid's candidate query
+    radius = rng.choice([2.0, 7.0, 13.0], 2000)
+    t = rng.uniform(0, 0.1, 2000)
+    x1 = x + dx * t
+    y1 = y + dy * t
+    boxes = {"candidate": (x - radius, y - radius, x + radius, y + radius),
+             "swept": (np.minimum(x, x1) - radius, np.minimum(y, y1) - radius,
+                       np.maximum(x, x1) + radius, np.maximum(y, y1) + radius)}
+    for name in BROADPHASES:
+        broadphase = make_layout(name, np.random.default_rng(1))
+        pairs = {"candidate": broadphase.get_candidate_pairs(x, y, radius),
+                 "swept": broadphase.get_swept_pairs(x, y, dx, dy, radius, t)}
+        # Every live object checked against every box
+        num_objects = len(broadphase.objects)
+        all_pairs = (np.repeat(np.arange(x.size), num_objects), np.tile(np.arange(num_objects), x.size))
+        for kind, (ball_idx, obj_idx) in pairs.items():
+            # Candidates are only ever live objects
+            assert broadphase.alive[obj_idx].all()
+            live = broadphase.alive[all_pairs[1]]
+            expected = overlapping(broadphase, all_pairs[0][live], all_pairs[1][live], *boxes[kind])
+            assert expected
+            assert overlapping(broadphase, ball_idx, obj_idx, *boxes[kind]) == expected
@@ -0,0 +1,41 @@
+import math
+import numpy as np
+from breakout_game import (SCREEN_WIDTH, SCREEN_HEIGHT, BreakoutGame, BreakoutBall, BreakoutBlock,
+                           BreakoutPlayer, BallStore, CollisionManager)
+
+def make_game(xs: list[float], dxs: list[float], dys: list[float], store: bool = False) -> BreakoutGame:
+    block_width = 100
+    block_height = 30
+    block_cols = 10
+    block_rows = 5
+    dx = (SCREEN_WIDTH - block_cols * block_width) / (block_cols + 1)
+    dy = block_height + 30
+    blocks = [BreakoutBlock(dy + y * dy, dx + x * (dx + block_width), block_width, block_height)
+              for x in range(block_cols) for y in range(block_rows)]
+    player = BreakoutPlayer(SCREEN_HEIGHT - 15, SCREEN_WIDTH / 2 - 50, 100, 5, 500)
+    if store:
+        balls = BallStore.from_arrays(xs, 500, dxs, dys, 7)
+    else:
+        balls = [BreakoutBall(x, 500, ball_dx, ball_dy, 7) for x, ball_dx, ball_dy in zip(xs, dxs, dys)]
+    collision_grid_shape = (math.ceil(SCREEN_WIDTH / 14), math.ceil(SCREEN_HEIGHT / 14))
+    collision_manager = CollisionManager(player, balls, blocks, collision_grid_shape, continuous=True)
+    return BreakoutGame(False, blocks, balls, player, collision_manager, set_dt=0.008)
+
+def blocks_left(xs: list[float], dxs: list[float], dys: list[float], dt: float, store: bool = False,
+                duration: float = 2.4) -> int:
+    game = make_game(xs, dxs, dys, store)
+    game.set_dt = dt
+    for _ in range(round(duration / dt)):
+        game.run_step(0)
+    return len(game.blocks)
+
+def test_balls_break_the_same_blocks_at_any_dt():
+    rng = np.random.default_rng(0)
+    for _ in range(40):
+        xs = rng.uniform(100, SCREEN_WIDTH - 100, 5).tolist()
+        dxs = rng.uniform(-300, 300, 5).tolist()
+        dys = (-rng.uniform(200, 400, 5)).tolist()
+        expected = blocks_left(xs, dxs, dys, 0.008)
+        assert blocks_left(xs, dxs, dys, 0.24) == expected
+        assert blocks_left(xs, dxs, dys, 0.008, store=True) == expected
+        assert blocks_left(xs, dxs, dys, 0.24, store=True) == expected
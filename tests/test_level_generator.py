@@ -0,0 +1,36 @@
+import math
+import time
+import numpy as np
+from breakout_game import (SCREEN_WIDTH, SCREEN_HEIGHT, BreakoutGame, BreakoutBall, BreakoutBlock,
+                           BreakoutPlayer, CollisionManager, Level, LevelGenerator)
+
+def make_game() -> BreakoutGame:
+    blocks = [BreakoutBlock(60 + y * 60, 10 + x * 115, 100, 30) for x in range(10) for y in range(5)]
+    player = BreakoutPlayer(SCREEN_HEIGHT - 15, SCREEN_WIDTH / 2 - 50, 100, 5, 500)
+    balls = [BreakoutBall(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2, 0, 200, 7)]
+    collision_grid_shape = (math.ceil(SCREEN_WIDTH / 14), math.ceil(SCREEN_HEIGHT / 14))
+    collision_manager = CollisionManager(player, balls, blocks, collision_grid_shape)
+    return BreakoutGame(False, blocks, balls, player, collision_manager, set_dt=0.008)
+
+def same_level(level: Level, expected: Level) -> bool:
+    return (level.index == expected.index and np.array_equal(level.block_alive, expected.block_alive)
+            and level.ball_speed == expected.ball_speed and level.ball_angle == expected.ball_angle
+            and level.state.to_bytes() == expected.state.to_bytes())
+
+def test_levels_follow_the_seed_sequence():
+    levels = LevelGenerator(make_game(), seed=3, prefetch=4)
+    try:
+        # More levels than are prefetched, so the thread has to keep up
+        for index in range(12):
+            assert same_level(levels.get(), levels.generate(3, index))
+        # Reseeding restarts the sequence, even with levels ready in the queue
+        time.sleep(0.1)
+        levels.seed(3)
+        for index in range(6):
+            assert same_level(levels.get(), levels.generate(3, index))
+        levels.seed(4)
+        first = levels.get()
+        assert same_level(first, levels.generate(4, 0))
+        assert not same_level(first, levels.generate(3, 0))
+    finally:
+        levels.close()
@@ -0,0 +1,46 @@
+import numpy as np
+from rl.breakout_environment import BreakoutEnv
+from rl.replay import ActionLog, EpisodeReplay, first_divergence, hash_state
+
+def record(env_kwargs: dict, seed: int, num_steps: int) -> tuple[ActionLog, dict]:
+    env = BreakoutEnv(**env_kwargs)
+    env.reset(seed=seed)
+    rng = np.random.default_rng(seed)
+    log = ActionLog(seed=seed, env_kwargs=env_kwargs)
+    hashes = {0: hash_state(env.simulation_state)}
+    for step in range(1, num_steps + 1):
+        action = int(rng.integers(3))
+        log.append(action)
+        _, _, terminated, truncated, _ = env.step(action)
+        hashes[step] = hash_state(env.simulation_state)
+        if terminated or truncated:
+            break
+    env.close()
+    return log, hashes
+
+def test_replay_reproduces_every_checkpoint(tmp_path):
+    # Stochastic frame skips and random levels draw from the environment's
+    # random state, which the replay has to follow too
+    for env_kwargs in ({}, {"frame_skip": (1, 4)}, {"random_levels": True, "frame_skip": (1, 3)}):
+        log, hashes = record(env_kwargs, 5, 3000)
+        log.save(str(tmp_path / "log.npz"))
+        replay = EpisodeReplay(ActionLog.load(str(tmp_path / "log.npz")), hash_interval=10)
+        try:
+            replayed = replay.run()
+            assert len(replayed) > 2
+            assert first_divergence(hashes, replayed) is None
+            assert all(replayed[step] == hashes[step] for step in replayed)
+            # Seeking backwards restores the closest checkpoint and replays
+            # from there
+            for step in (len(log.actions) // 2, 7, len(log.actions) - 3, 0):
+                replay.seek(step)
+                assert replay.state_hash() == hashes[step]
+        finally:
+            replay.close()
+
+def test_first_divergence_finds_the_first_differing_step():
+    hashes = {0: "a", 100: "b", 200: "c", 300: "d"}
+    assert first_divergence(hashes, dict(hashes)) is None
+    assert first_divergence(hashes, {0: "a", 100: "b", 200: "x", 300: "y"}) == 200
+    # Only steps hashed by both runs are compared
+    assert first_divergence(hashes, {0: "a", 150: "x", 300: "y"}) == 300
@@ -0,0 +1,53 @@
+import math
+import numpy as np
+from breakout_game import (SCREEN_WIDTH, SCREEN_HEIGHT, BreakoutGame, BreakoutBall, BreakoutBlock,
+                           BreakoutPlayer, BallStore, CollisionManager, GameState)
+
+def make_game(store: bool, continuous: bool) -> BreakoutGame:
+    blocks = [BreakoutBlock(60 + y * 60, 10 + x * 115, 100, 30) for x in range(10) for y in range(5)]
+    player = BreakoutPlayer(SCREEN_HEIGHT - 15, SCREEN_WIDTH / 2 - 50, 100, 5, 500)
+    xs, ys, dxs, dys = [640, 600, 700], [360, 400, 300], [50, -80, 120], [-200, -150, -180]
+    if store:
+        balls = BallStore.from_arrays(xs, ys, dxs, dys, 7)
+    else:
+        balls = [BreakoutBall(x, y, dx, dy, 7) for x, y, dx, dy in zip(xs, ys, dxs, dys)]
+    collision_grid_shape = (math.ceil(SCREEN_WIDTH / 14), math.ceil(SCREEN_HEIGHT / 14))
+    collision_manager = CollisionManager(player, balls, blocks, collision_grid_shape, continuous=continuous)
+    return BreakoutGame(False, blocks, balls, player, collision_manager, set_dt=0.008)
+
+def run(game: BreakoutGame, actions: np.ndarray) -> bytes:
+    for action in actions:
+        game.run_step(int(action))
+    return game.snapshot().to_bytes()
+
+def test_restored_game_runs_bit_for_bit_the_same():
+    actions = np.random.default_rng(0).integers(0, 3, 3000)
+    for store in (False, True):
+        for continuous in (False, True):
+            game = make_game(store, continuous)
+            run(game, actions[:500])
+            state = game.snapshot()
+            expected = run(game, actions[500:])
+            # A state can be restored any number of times
+            for _ in range(2):
+                game.restore(state)
+                assert run(game, actions[500:]) == expected
+            assert run(make_game(store, continuous), actions) == expected
+
+def test_state_survives_a_bytes_round_trip():
+    actions = np.random.default_rng(1).integers(0, 3, 800)
+    for store in (False, True):
+        game = make_game(store, False)
+        run(game, actions)
+        state = game.snapshot()
+        copy = GameState.from_bytes(state.to_bytes())
+        for name in GameState.__slots__:
+            expected = getattr(state, name)
+            if isinstance(expected, np.ndarray):
+                assert np.array_equal(getattr(copy, name), expected)
+                assert getattr(copy, name).dtype == expected.dtype
+            else:
+                assert getattr(copy, name) == expected
+        expected = run(game, actions)
+        game.restore(copy)
+        assert run(game, actions) == expected
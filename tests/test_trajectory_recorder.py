@@ -0,0 +1,37 @@
+import numpy as np
+from rl.breakout_vec_env import BreakoutVecEnv
+from rl.trajectory_recorder import TrajectoryDataset, VecTrajectoryRecorder
+
+def test_recorded_transitions_read_back_exactly(tmp_path):
+    num_envs = 8
+    num_steps = 2000
+    actions = np.random.default_rng(0).integers(0, 3, (num_steps, num_envs))
+    # A chunk size that splits steps, so transitions of one step land in two
+    # chunks, and the last chunk is only partly full
+    recorder = VecTrajectoryRecorder(BreakoutVecEnv(num_envs), str(tmp_path), chunk_size=1003)
+    observations = [recorder.reset().copy()]
+    rewards, dones, terminal_observations = [], [], {}
+    for step, step_actions in enumerate(actions):
+        step_observations, step_rewards, step_dones, infos = recorder.step(step_actions)
+        observations.append(step_observations.copy())
+        rewards.append(step_rewards.copy())
+        dones.append(step_dones.copy())
+        for i in np.flatnonzero(step_dones):
+            terminal_observations[step * num_envs + i] = infos[i]["terminal_observation"]
+    recorder.close()
+
+    dataset = TrajectoryDataset(str(tmp_path))
+    assert len(dataset) == num_steps * num_envs
+    assert len(dataset.chunks) == -(-num_steps * num_envs // 1003)
+    batch = dataset.get(np.arange(len(dataset)))
+    assert np.array_equal(batch["actions"], actions.reshape(-1))
+    assert np.array_equal(batch["rewards"], np.concatenate(rewards))
+    assert np.array_equal(batch["dones"], np.concatenate(dones))
+    assert np.array_equal(batch["env_ids"], np.tile(np.arange(num_envs), num_steps))
+    assert np.array_equal(batch["observations"], np.concatenate(observations[:-1]))
+    # Rows that are done hold the terminal observation, not the reset one
+    next_observations = np.concatenate(observations[1:])
+    for row, observation in terminal_observations.items():
+        next_observations[row] = observation
+    assert terminal_observations
+    assert np.array_equal(batch["next_observations"], next_observations)